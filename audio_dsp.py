@@ -0,0 +1,187 @@
+import wave
+import shutil
+import subprocess
+import numpy as np
+from vad import pcm_to_float
+
+# Speech rate in words per minute that corresponds to unmodified audio
+NORMAL_RATE = 150
+
+# WSOLA frame length and similarity search tolerance in milliseconds
+WSOLA_FRAME_MS = 40
+WSOLA_TOLERANCE_MS = 10
+
+# Rate MP3 audio is decoded to before processing or playback, the rate gTTS produces
+DECODE_RATE = 24000
+
+def rate_to_speed(rate):
+    """
+    Convert a speech rate in words per minute to a playback speed factor.
+
+    Args:
+        rate (int): Speech rate in words per minute
+
+    Returns:
+        float: Speed factor, 1.0 leaves the audio unchanged
+    """
+    if rate <= 0:
+        raise ValueError("Speech rate must be positive")
+    return rate / NORMAL_RATE
+
+def apply_gain(samples, volume):
+    """
+    Scale float samples by a volume factor and clip to [-1.0, 1.0].
+
+    Args:
+        samples (np.ndarray): float samples
+        volume (float): Linear gain, 1.0 leaves the audio unchanged
+
+    Returns:
+        np.ndarray: Scaled samples
+    """
+    if volume == 1.0:
+        return samples
+    return np.clip(samples * volume, -1.0, 1.0)
+
+def time_stretch(samples, speed, sample_rate, frame_ms=WSOLA_FRAME_MS, tolerance_ms=WSOLA_TOLERANCE_MS):
+    """
+    Change the duration of audio without changing its pitch using WSOLA.
+
+    Frames are read from the input every speed * hop samples and
+    overlap-added every hop samples. Each frame is shifted within the
+    tolerance to the position most similar to the natural continuation of
+    the previous frame, which keeps the waveform phase-coherent.
+
+    Args:
+        samples (np.ndarray): float samples
+        speed (float): Speed factor, above 1.0 shortens the audio
+        sample_rate (int): Sample rate of the audio in Hz
+        frame_ms (int): Frame length in milliseconds (default: WSOLA_FRAME_MS)
+        tolerance_ms (int): Maximum frame shift in milliseconds (default: WSOLA_TOLERANCE_MS)
+
+    Returns:
+        np.ndarray: Time-scaled float samples
+    """
+    if speed == 1.0 or len(samples) == 0:
+        return samples
+
+    frame_length = max(2, int(sample_rate * frame_ms / 1000)) // 2 * 2
+    synthesis_hop = frame_length // 2
+    analysis_hop = synthesis_hop * speed
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+
+    output_length = int(len(samples) / speed)
+    frame_count = output_length // synthesis_hop + 1
+
+    # Pad so every candidate frame lies inside the signal
+    padded = np.concatenate((np.zeros(tolerance), samples, np.zeros(frame_length + 2 * tolerance + synthesis_hop)))
+    limit = len(padded) - frame_length
+
+    # Choose the input position of every frame; each choice depends on the previous one
+    positions = np.empty(frame_count, dtype=np.int64)
+    positions[0] = tolerance
+    for k in range(1, frame_count):
+        natural = positions[k - 1] + synthesis_hop
+        template = padded[natural:natural + frame_length]
+        nominal = tolerance + int(round(k * analysis_hop))
+        start = min(max(nominal - tolerance, 0), limit - 2 * tolerance)
+        region = padded[start:start + frame_length + 2 * tolerance]
+        similarity = np.correlate(region, template, mode="valid")
+        positions[k] = start + int(np.argmax(similarity))
+
+    # Gather all frames at once and overlap-add them with a Hann window
+    window = np.hanning(frame_length)
+    frames = padded[positions[:, None] + np.arange(frame_length)] * window
+    output = np.zeros(frame_count * synthesis_hop + frame_length)
+    weights = np.zeros_like(output)
+    indices = (np.arange(frame_count) * synthesis_hop)[:, None] + np.arange(frame_length)
+    np.add.at(output, indices, frames)
+    np.add.at(weights, indices, np.broadcast_to(window, frames.shape))
+
+    output = output / np.maximum(weights, 1e-3)
+    return output[:output_length].astype(np.float32)
+
+def process_pcm(frame_data, sample_rate, sample_width, speed=1.0, volume=1.0):
+    """
+    Apply time-scale modification and gain to raw PCM.
+
+    Args:
+        frame_data (bytes): Raw mono PCM data
+        sample_rate (int): Sample rate in Hz
+        sample_width (int): Bytes per sample
+        speed (float): Speed factor (default: 1.0)
+        volume (float): Linear gain (default: 1.0)
+
+    Returns:
+        bytes: 16-bit little-endian mono PCM
+    """
+    samples = pcm_to_float(frame_data, sample_width)
+    samples = apply_gain(time_stretch(samples, speed, sample_rate), volume)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def process_wav(input_file, output_file, speed=1.0, volume=1.0):
+    """
+    Apply time-scale modification and gain to a mono WAV file.
+
+    Args:
+        input_file (str): Path of the source WAV file
+        output_file (str): Path of the processed 16-bit WAV file
+        speed (float): Speed factor (default: 1.0)
+        volume (float): Linear gain (default: 1.0)
+
+    Returns:
+        str: Path of the processed file
+    """
+    with wave.open(input_file, "rb") as reader:
+        if reader.getnchannels() != 1:
+            raise ValueError("Only mono audio can be post-processed")
+        sample_rate = reader.getframerate()
+        sample_width = reader.getsampwidth()
+        frame_data = reader.readframes(reader.getnframes())
+
+    return _write_wav(output_file, process_pcm(frame_data, sample_rate, sample_width, speed, volume), sample_rate)
+
+def decode_mp3(data, sample_rate=DECODE_RATE):
+    """
+    Decode MP3 data to 16-bit mono PCM with ffmpeg.
+
+    Args:
+        data (bytes): MP3 data
+        sample_rate (int): Output sample rate (default: DECODE_RATE)
+
+    Returns:
+        bytes: 16-bit little-endian mono PCM
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required to decode MP3 audio")
+    command = ["ffmpeg", "-v", "error", "-nostdin", "-f", "mp3", "-i", "pipe:0",
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+    result = subprocess.run(command, input=data, capture_output=True)
+    if result.returncode != 0:
+        raise ValueError(f"ffmpeg could not decode MP3 audio: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def process_mp3(input_file, output_file, speed=1.0, volume=1.0):
+    """
+    Decode an MP3 file and apply time-scale modification and gain.
+
+    Args:
+        input_file (str): Path of the source MP3 file
+        output_file (str): Path of the processed 16-bit WAV file
+        speed (float): Speed factor (default: 1.0)
+        volume (float): Linear gain (default: 1.0)
+
+    Returns:
+        str: Path of the processed file
+    """
+    with open(input_file, "rb") as f:
+        frame_data = decode_mp3(f.read())
+    return _write_wav(output_file, process_pcm(frame_data, DECODE_RATE, 2, speed, volume), DECODE_RATE)
+
+def _write_wav(path, frame_data, sample_rate):
+    with wave.open(path, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(frame_data)
+    return path
@@ -0,0 +1,398 @@
+import os
+import json
+import wave
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from math import gcd
+import numpy as np
+import speech_recognition as sr
+from metrics import metrics
+from file_cache import FileCache
+from vad import pcm_to_float
+from wav_reader import open_wav, downmix, to_float, to_pcm16
+
+# Format every recognizer receives: 16 kHz, mono, 16-bit PCM
+TARGET_RATE = 16000
+
+# Location and size limit of the normalized audio cache, overridable from the environment
+NORMALIZED_CACHE_DIR = os.getenv("NORMALIZED_CACHE_DIR", os.path.join("cache", "normalized"))
+NORMALIZED_CACHE_MAX_MB = int(os.getenv("NORMALIZED_CACHE_MAX_MB", "2048"))
+
+# Amount of audio decoded and resampled per step, in seconds
+BLOCK_SECONDS = 10.0
+
+# Zero crossings of the windowed sinc on each side of its centre, and the Kaiser window shape
+RESAMPLER_ZERO_CROSSINGS = 16
+RESAMPLER_KAISER_BETA = 8.6
+
+# Output samples computed per vectorized step, bounding the size of the gathered input
+RESAMPLER_CHUNK = 8192
+
+# Bytes read from each end of a file when fingerprinting it
+FINGERPRINT_BYTES = 1024 * 1024
+
+# Formats read by speech_recognition without an external decoder
+NATIVE_EXTENSIONS = (".aif", ".aiff", ".aifc", ".flac")
+
+def design_polyphase_filter(up, down, zero_crossings=RESAMPLER_ZERO_CROSSINGS, beta=RESAMPLER_KAISER_BETA):
+    """
+    Kaiser-windowed sinc low-pass filter split into polyphase components.
+
+    Row p holds the weights applied to the input samples around an output
+    sample that falls p / up of the way between two input samples. The
+    cutoff is the lower of the two Nyquist frequencies, so downsampling
+    does not alias.
+
+    Args:
+        up (int): Interpolation factor
+        down (int): Decimation factor
+        zero_crossings (int): Zero crossings on each side of the centre (default: RESAMPLER_ZERO_CROSSINGS)
+        beta (float): Kaiser window shape parameter (default: RESAMPLER_KAISER_BETA)
+
+    Returns:
+        tuple: (float32 weights of shape (up, taps), input samples before the centre)
+    """
+    cutoff = min(1.0, up / down)
+    half = int(np.ceil(zero_crossings / cutoff))
+    taps = 2 * half
+
+    # Distance in input samples from each output position to each input sample it uses
+    offsets = np.arange(up)[:, None] / up + (half - 1) - np.arange(taps)[None, :]
+    ratio = np.clip(offsets / half, -1.0, 1.0)
+    window = np.i0(beta * np.sqrt(1.0 - ratio ** 2)) / np.i0(beta)
+    weights = cutoff * np.sinc(cutoff * offsets) * window
+
+    # Unity gain at DC for every phase
+    weights /= weights.sum(axis=1, keepdims=True)
+    return weights.astype(np.float32), half - 1
+
+class PolyphaseResampler:
+    """
+    Streaming rational-ratio resampler for mono float audio.
+
+    Each output sample is the dot product of one polyphase row with the
+    input samples around it. Blocks of any size can be pushed; the few
+    input samples the next block still needs are carried over, so the
+    output is identical to resampling the whole signal at once.
+    """
+
+    def __init__(self, source_rate, target_rate=TARGET_RATE):
+        """
+        Args:
+            source_rate (int): Sample rate of the input in Hz
+            target_rate (int): Sample rate of the output in Hz (default: TARGET_RATE)
+        """
+        divisor = gcd(int(source_rate), int(target_rate))
+        self.up = int(target_rate) // divisor
+        self.down = int(source_rate) // divisor
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            self.weights, self.before = design_polyphase_filter(self.up, self.down)
+            self.after = self.weights.shape[1] - self.before - 1
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all pushed audio and start a new signal.
+        """
+        self._input_count = 0
+        self._output_count = 0
+        if not self.passthrough:
+            # Zeros stand in for the input before the start of the signal
+            self._buffer = np.zeros(self.before, dtype=np.float32)
+            self._buffer_start = -self.before
+
+    def process(self, samples):
+        """
+        Resample the next block of a signal.
+
+        Args:
+            samples (np.ndarray): Mono float samples
+
+        Returns:
+            np.ndarray: float32 samples at the target rate
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.passthrough:
+            self._input_count += len(samples)
+            return samples
+
+        self._buffer = np.concatenate((self._buffer, samples))
+        self._input_count += len(samples)
+
+        # Every output whose filter support lies inside the input seen so far
+        last_input = self._input_count - 1 - self.after
+        ready = (last_input * self.up + self.up - 1) // self.down + 1 if last_input >= 0 else 0
+        return self._emit(ready)
+
+    def flush(self):
+        """
+        Resample the remaining input as if the signal were followed by silence.
+
+        Returns:
+            np.ndarray: float32 samples at the target rate
+        """
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.after, dtype=np.float32)))
+        total = -(-self._input_count * self.up // self.down)
+        output = self._emit(total)
+        self.reset()
+        return output
+
+    def _emit(self, stop):
+        pieces = []
+        taps = np.arange(self.weights.shape[1])
+        for chunk_start in range(self._output_count, stop, RESAMPLER_CHUNK):
+            positions = np.arange(chunk_start, min(chunk_start + RESAMPLER_CHUNK, stop)) * self.down
+            first = positions // self.up - self.before - self._buffer_start
+            # Gather every output's input neighbourhood at once and weight it by its phase
+            neighbourhoods = self._buffer[first[:, None] + taps]
+            pieces.append(np.einsum("ij,ij->i", neighbourhoods, self.weights[positions % self.up]))
+
+        if stop > self._output_count:
+            self._output_count = stop
+        # Drop input no later output can reach
+        keep_from = self._output_count * self.down // self.up - self.before - self._buffer_start
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._buffer_start += keep_from
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+class AudioDecoder:
+    """
+    Block-wise decoder for WAV, AIFF, FLAC and compressed formats.
+
+    WAV files are memory-mapped, AIFF and FLAC are read through
+    speech_recognition, and anything else (MP3, OGG, ...) is decoded by an
+    ffmpeg subprocess streaming float samples through a pipe. Opening a
+    decoder only reads the header; samples are decoded by blocks().
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the audio file
+        """
+        self.path = path
+        self.kind = None
+
+        wav = open_wav(path)
+        if wav is not None:
+            with wav:
+                self.kind = "wav"
+                self.sample_rate = wav.sample_rate
+                self.channels = wav.channels
+                self.duration = wav.duration
+                self.is_normalized = (wav.sample_rate == TARGET_RATE and wav.channels == 1
+                                      and wav.dtype == np.dtype("<i2"))
+            return
+
+        self.is_normalized = False
+        if path.lower().endswith(NATIVE_EXTENSIONS) or shutil.which("ffprobe") is None:
+            with sr.AudioFile(path) as source:
+                self.kind = "native"
+                self.sample_rate = source.SAMPLE_RATE
+                self.channels = 1
+                self.duration = source.DURATION
+            return
+
+        self.kind = "ffmpeg"
+        self._probe()
+
+    def _probe(self):
+        command = ["ffprobe", "-v", "error", "-select_streams", "a:0",
+                   "-show_entries", "stream=sample_rate,channels:format=duration", "-of", "json", self.path]
+        result = subprocess.run(command, capture_output=True, text=True)
+        info = json.loads(result.stdout or "{}")
+        if result.returncode != 0 or not info.get("streams"):
+            raise ValueError(f"No audio stream in {self.path}: {result.stderr.strip()}")
+
+        stream = info["streams"][0]
+        self.sample_rate = int(stream["sample_rate"])
+        self.channels = int(stream["channels"])
+        self.duration = float(info.get("format", {}).get("duration", 0.0))
+
+    def blocks(self, block_frames):
+        """
+        Decode the file in blocks.
+
+        Args:
+            block_frames (int): Frames per block
+
+        Yields:
+            np.ndarray: (frames, channels) float32 samples in [-1.0, 1.0]
+        """
+        if self.kind == "wav":
+            wav = open_wav(self.path)
+            with wav:
+                for _, frames in wav.iter_blocks(block_frames):
+                    yield to_float(frames)
+        elif self.kind == "native":
+            with sr.AudioFile(self.path) as source:
+                while True:
+                    data = source.stream.read(block_frames)
+                    if not data:
+                        break
+                    yield pcm_to_float(data, source.SAMPLE_WIDTH)[:, None]
+        else:
+            yield from self._ffmpeg_blocks(block_frames)
+
+    def _ffmpeg_blocks(self, block_frames):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError(f"ffmpeg is required to decode {self.path}")
+
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-i", self.path, "-map", "0:a:0",
+                   "-f", "f32le", "-acodec", "pcm_f32le", "-"]
+        block_bytes = block_frames * self.channels * 4
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) // (self.channels * 4) * self.channels * 4
+                yield np.frombuffer(data[:usable], dtype="<f4").reshape(-1, self.channels)
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode("utf-8", "replace").strip()
+            if process.wait() != 0 and stderr:
+                raise ValueError(f"ffmpeg could not decode {self.path}: {stderr}")
+
+def iter_normalized_blocks(path, target_rate=TARGET_RATE, block_seconds=BLOCK_SECONDS):
+    """
+    Decode, downmix and resample an audio file block by block.
+
+    Args:
+        path (str): Path to the audio file
+        target_rate (int): Output sample rate in Hz (default: TARGET_RATE)
+        block_seconds (float): Input decoded per step in seconds (default: BLOCK_SECONDS)
+
+    Yields:
+        np.ndarray: Mono float32 samples at target_rate
+    """
+    decoder = AudioDecoder(path)
+    resampler = PolyphaseResampler(decoder.sample_rate, target_rate)
+    block_frames = max(1, int(block_seconds * decoder.sample_rate))
+
+    for frames in decoder.blocks(block_frames):
+        samples = resampler.process(downmix(frames))
+        if len(samples):
+            yield samples
+    samples = resampler.flush()
+    if len(samples):
+        yield samples
+
+def source_fingerprint(path):
+    """
+    Identify the contents of a file without reading all of it.
+
+    The size, modification time and the first and last megabyte are
+    hashed, so an edited or replaced file gets a new fingerprint.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if stat.st_size > 2 * FINGERPRINT_BYTES:
+            f.seek(-FINGERPRINT_BYTES, 2)
+            digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+def _cache_key(path, target_rate):
+    return f"{source_fingerprint(path)}-{target_rate}"
+
+# Cache of normalized audio shared by every caller in this process
+normalized_cache = FileCache(NORMALIZED_CACHE_DIR, NORMALIZED_CACHE_MAX_MB * 1024 * 1024)
+
+def find_normalized(path, target_rate=TARGET_RATE, cache=normalized_cache):
+    """
+    Path of a normalized version of an audio file that needs no decoding.
+
+    Args:
+        path (str): Path to the audio file
+        target_rate (int): Sample rate in Hz (default: TARGET_RATE)
+        cache (FileCache): Cache for normalized files (default: normalized_cache)
+
+    Returns:
+        str: The file itself when already in the target format, its cached copy, or None
+    """
+    decoder = AudioDecoder(path)
+    if decoder.is_normalized and decoder.sample_rate == target_rate:
+        return path
+    return cache.lookup(_cache_key(path, target_rate))
+
+def stream_normalized(path, target_rate=TARGET_RATE, cache=normalized_cache):
+    """
+    Decode an audio file to 16-bit mono PCM block by block, filling the cache as it goes.
+
+    Each block is yielded as soon as it is decoded, so recognition can
+    start on the beginning of a long file while the rest is still being
+    decoded. The blocks are also written to a WAV file that is added to
+    the cache once the whole file has been read; a consumer that stops
+    early leaves nothing behind.
+
+    Args:
+        path (str): Path to the audio file
+        target_rate (int): Sample rate in Hz (default: TARGET_RATE)
+        cache (FileCache): Cache for normalized files (default: normalized_cache)
+
+    Yields:
+        bytes: Mono 16-bit PCM at target_rate
+    """
+    key = _cache_key(path, target_rate)
+
+    # Write next to the cache so moving the result in is a rename
+    os.makedirs(cache.cache_dir, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(suffix=".wav", dir=cache.cache_dir)
+    os.close(handle)
+    try:
+        with wave.open(temp_path, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(target_rate)
+            blocks = iter_normalized_blocks(path, target_rate)
+            while True:
+                with metrics.span("stt.decode"):
+                    samples = next(blocks, None)
+                    if samples is None:
+                        break
+                    data = to_pcm16(np.clip(samples, -1.0, 1.0))
+                    writer.writeframes(data)
+                yield data
+        cache.store(key, temp_path, move=True)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def normalize_audio(path, target_rate=TARGET_RATE, cache=normalized_cache):
+    """
+    Path of a 16-bit mono WAV version of an audio file at the target rate.
+
+    Files already in that format are returned unchanged. Anything else is
+    decoded and resampled once into the cache, keyed by the source
+    fingerprint, so transcribing the same file again skips decoding.
+
+    Args:
+        path (str): Path to the audio file
+        target_rate (int): Sample rate in Hz (default: TARGET_RATE)
+        cache (FileCache): Cache for normalized files (default: normalized_cache)
+
+    Returns:
+        str: Path of the normalized WAV file
+    """
+    normalized_file = find_normalized(path, target_rate, cache)
+    if normalized_file is None:
+        for _ in stream_normalized(path, target_rate, cache):
+            pass
+        normalized_file = cache.lookup(_cache_key(path, target_rate))
+    return normalized_file
@@ -0,0 +1,696 @@
+import os
+import sys
+import random
+import argparse
+import json
+import time
+import wave
+import platform
+import tempfile
+import subprocess
+import numpy as np
+from vad import pcm_to_float
+from transcribe_audio import iter_speech_segments, stream_transcribe, transcribe_audio, transcribe_batch
+from formant_synth import FormantBackend
+from diarization import diarize
+from tts_engine import split_sentences, create_tts_backend, iter_synthesized_segments
+from create_test_audio import create_test_audio
+from job_queue import JobQueue
+
+# Defaults of the benchmark suite
+SUITE_SECONDS = 60.0
+SUITE_REPEAT = 5
+SUITE_BATCH_FILES = 8
+SUITE_WORKERS = 4
+SUITE_STREAM_WINDOW = 5.0
+SUITE_TTS_SENTENCES = 12
+SUITE_TTS_BACKEND = "formant"
+
+# Every (task, mode) pair the suite runs, each in a fresh interpreter
+SUITE_CASES = (
+    ("stt", "single"), ("stt", "batch"), ("stt", "streaming"),
+    ("tts", "single"), ("tts", "batch"), ("tts", "streaming"),
+)
+
+# Relative slowdown of a metric that counts as a regression when comparing runs
+REGRESSION_THRESHOLD = 0.10
+
+# Voices of the synthetic dialogue as (pitch scale, formant scale); the second is higher and brighter
+DIALOGUE_VOICES = ((1.0, 1.0), (1.7, 1.18), (1.35, 0.9))
+
+# Words the synthetic speech and texts are drawn from
+VOCABULARY = (
+    "the quick brown fox jumps over lazy dog speech signal model window audio file sound voice record "
+    "listen answer question morning evening river mountain system process number seven eleven twelve "
+    "green yellow market station window garden summer winter table paper letter simple ready"
+).split()
+
+class SpectrogramBackend:
+    """
+    Offline stand-in for a recognizer whose cost grows linearly with audio length.
+
+    It computes a short-time spectrogram of every window it is given, which
+    is roughly the front end of a real recognizer, and returns no text.
+    """
+    name = "spectrogram"
+
+    def __init__(self, frame_length=400, hop_length=160):
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.window = np.hanning(frame_length).astype(np.float32)
+
+    def recognize(self, audio, language=None):
+        samples = pcm_to_float(audio.frame_data, audio.sample_width)
+        if len(samples) < self.frame_length:
+            return ""
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.frame_length)[::self.hop_length]
+        np.log1p(np.abs(np.fft.rfft(frames * self.window, axis=1)))
+        return ""
+
+def _best_time(func, repeat):
+    """
+    Run func repeat times and return the fastest wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def benchmark_vad(input_file="test_audio.wav", backend=None, repeat=3):
+    """
+    Measure how much audio voice activity detection skips and the time it saves.
+
+    Args:
+        input_file (str): Path to a WAV file to benchmark (default: "test_audio.wav")
+        backend (str): Recognition backend name, None for the offline spectrogram stand-in (default: None)
+        repeat (int): Number of runs per measurement, the fastest is reported (default: 3)
+
+    Returns:
+        dict: Benchmark results
+    """
+    if backend is None:
+        backend = SpectrogramBackend()
+
+    speech_seconds = 0.0
+    for _, audio in iter_speech_segments(input_file):
+        speech_seconds += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
+    with wave.open(input_file, "rb") as reader:
+        total_seconds = reader.getnframes() / reader.getframerate()
+
+    vad_only = _best_time(lambda: sum(1 for _ in iter_speech_segments(input_file)), repeat)
+    full = _best_time(lambda: list(stream_transcribe(input_file, backend=backend)), repeat)
+    with_vad = _best_time(lambda: list(stream_transcribe(input_file, backend=backend, vad=True)), repeat)
+
+    return {
+        "benchmark": "vad",
+        "input_file": input_file,
+        "backend": getattr(backend, "name", str(backend)),
+        "audio_seconds": round(total_seconds, 3),
+        "speech_seconds": round(speech_seconds, 3),
+        "skipped_fraction": round(max(0.0, 1.0 - speech_seconds / total_seconds), 4) if total_seconds else 0.0,
+        "vad_seconds": round(vad_only, 4),
+        "full_seconds": round(full, 4),
+        "with_vad_seconds": round(with_vad, 4),
+        "saved_seconds": round(full - with_vad, 4),
+    }
+
+def synthetic_text(sentences, seed=0):
+    """
+    Random English-like text for synthesis benchmarks.
+
+    Args:
+        sentences (int): Number of sentences
+        seed (int): Random seed, the same seed gives the same text (default: 0)
+
+    Returns:
+        str: Text of the requested number of sentences
+    """
+    rng = random.Random(seed)
+    return " ".join(" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 12))).capitalize() + "."
+                    for _ in range(sentences))
+
+def synthetic_speech(seconds, seed=0):
+    """
+    Speech-like audio of a given length, rendered by the local formant synthesizer.
+
+    Random sentences are separated by pauses of random length, so voice
+    activity detection and recognizers see realistic speech and silence.
+
+    Args:
+        seconds (float): Length of the audio in seconds
+        seed (int): Random seed, the same seed gives the same audio (default: 0)
+
+    Returns:
+        np.ndarray: 16-bit mono samples at FormantBackend.sample_rate
+    """
+    rng = random.Random(seed)
+    backend = FormantBackend()
+    total = int(seconds * backend.sample_rate)
+    pieces = []
+    length = 0
+    while length < total:
+        speech = np.frombuffer(backend.synthesize(synthetic_text(1, rng.random()), "en"), dtype="<i2")
+        pause = np.zeros(int(rng.uniform(0.2, 1.0) * backend.sample_rate), dtype="<i2")
+        pieces += [speech, pause]
+        length += len(speech) + len(pause)
+    return np.concatenate(pieces)[:total]
+
+def synthetic_dialogue(seconds, speakers=2, seed=0):
+    """
+    Conversation between formant voices, with the reference of who spoke when.
+
+    Speakers mostly take turns, sometimes say two things in a row, and
+    pause between turns, like a call recording.
+
+    Args:
+        seconds (float): Length of the audio in seconds
+        speakers (int): Number of voices, at most len(DIALOGUE_VOICES) (default: 2)
+        seed (int): Random seed, the same seed gives the same audio (default: 0)
+
+    Returns:
+        tuple: (16-bit mono samples at FormantBackend.sample_rate, list of (start, end, speaker index) turns)
+    """
+    rng = random.Random(seed)
+    voices = [FormantBackend(pitch, formant) for pitch, formant in DIALOGUE_VOICES[:speakers]]
+    sample_rate = FormantBackend.sample_rate
+    total = int(seconds * sample_rate)
+    pieces = []
+    reference = []
+    length = 0
+    speaker = rng.randrange(speakers)
+    while length < total:
+        if rng.random() < 0.8:
+            speaker = (speaker + rng.randrange(1, speakers)) % speakers if speakers > 1 else 0
+        speech = np.frombuffer(voices[speaker].synthesize(synthetic_text(rng.randint(1, 2), rng.random()), "en"),
+                               dtype="<i2")
+        reference.append((length / sample_rate, (length + len(speech)) / sample_rate, speaker))
+        pause = np.zeros(int(rng.uniform(0.3, 1.0) * sample_rate), dtype="<i2")
+        pieces += [speech, pause]
+        length += len(speech) + len(pause)
+    return np.concatenate(pieces)[:total], reference
+
+def diarization_accuracy(turns, reference, resolution=0.01):
+    """
+    Score diarization against the reference turns of a synthetic dialogue.
+
+    Each found speaker is mapped to the reference speaker it overlaps
+    most. Accuracy is measured on the speech that was assigned a speaker,
+    coverage is the share of reference speech that was.
+
+    Returns:
+        dict: Accuracy, coverage, and found and reference speaker counts
+    """
+    steps = int(max([end for _, end, _ in reference] + [turn["end"] for turn in turns] + [0.0]) / resolution) + 1
+    truth = np.full(steps, -1)
+    found = np.full(steps, -1)
+    for start, end, speaker in reference:
+        truth[int(start / resolution):int(end / resolution)] = speaker
+    names = {}
+    for turn in turns:
+        found[int(turn["start"] / resolution):int(turn["end"] / resolution)] = names.setdefault(turn["speaker"], len(names))
+
+    speech = truth >= 0
+    assigned = speech & (found >= 0)
+    overlap = np.zeros((len(names), truth.max() + 1))
+    np.add.at(overlap, (found[assigned], truth[assigned]), 1)
+    return {
+        "accuracy": round(float(overlap.max(axis=1).sum() / assigned.sum()), 4) if assigned.any() else None,
+        "coverage": round(float(assigned.sum() / speech.sum()), 4) if speech.any() else None,
+        "speakers_found": len(names),
+        "speakers": int(truth.max() + 1),
+    }
+
+def benchmark_diarization(seconds=SUITE_SECONDS, speakers=2, seed=0, num_speakers=None, workers=None):
+    """
+    Time speaker diarization on a synthetic dialogue and score it against the known turns.
+
+    Args:
+        seconds (float): Length of the dialogue (default: SUITE_SECONDS)
+        speakers (int): Number of voices in the dialogue (default: 2)
+        seed (int): Random seed of the dialogue (default: 0)
+        num_speakers (int): Number of speakers given to diarization, None to let it estimate (default: None)
+        workers (int): Embedding worker processes, None for the diarization default (default: None)
+
+    Returns:
+        dict: Benchmark results
+    """
+    samples, reference = synthetic_dialogue(seconds, speakers, seed)
+    options = {"workers": workers} if workers else {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = write_wav(os.path.join(work_dir, "dialogue.wav"), samples, FormantBackend.sample_rate)
+        started = time.perf_counter()
+        turns = diarize(path, num_speakers, **options)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "benchmark": "diarization",
+        "audio_seconds": round(seconds, 3),
+        "seconds": round(elapsed, 4),
+        "rtf": round(elapsed / seconds, 5) if seconds else None,
+        "turns": len(turns),
+        "reference_turns": len(reference),
+        **diarization_accuracy(turns, reference),
+    }
+
+def write_wav(path, samples, sample_rate):
+    """
+    Write 16-bit mono samples to a WAV file.
+    """
+    with wave.open(path, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.astype("<i2").tobytes())
+    return path
+
+def _wav_seconds(path):
+    with wave.open(path, "rb") as reader:
+        return reader.getnframes() / reader.getframerate()
+
+def latency_stats(latencies):
+    """
+    Summarize latencies given in seconds.
+
+    Returns:
+        dict: Count, mean, p50, p95 and maximum in milliseconds
+    """
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident memory of this process or of its finished children, in MiB.
+
+    Returns:
+        float: Peak RSS, or None where the resource module is unavailable
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_case(task, mode, work_dir, seconds=SUITE_SECONDS, repeat=SUITE_REPEAT, batch_files=SUITE_BATCH_FILES,
+             workers=SUITE_WORKERS, tts_backend=SUITE_TTS_BACKEND):
+    """
+    Run one benchmark case in the current process.
+
+    Recognition uses the offline SpectrogramBackend and synthesis a local
+    backend, and every cache is bypassed, so results measure the pipeline
+    itself and need no network.
+
+    Args:
+        task (str): "stt" or "tts"
+        mode (str): "single", "batch" or "streaming"
+        work_dir (str): Directory for generated inputs and outputs
+        seconds (float): Length of each synthetic recording (default: SUITE_SECONDS)
+        repeat (int): Runs of single and streaming cases (default: SUITE_REPEAT)
+        batch_files (int): Files or texts per batch (default: SUITE_BATCH_FILES)
+        workers (int): Batch worker processes or synthesis threads (default: SUITE_WORKERS)
+        tts_backend (str): Local synthesis backend (default: SUITE_TTS_BACKEND)
+
+    Returns:
+        dict: Latency percentiles, real-time factor, throughput and peak RSS
+    """
+    result = {"task": task, "mode": mode}
+    latencies = []
+
+    if task == "stt":
+        backend = SpectrogramBackend()
+        count = batch_files if mode == "batch" else 1
+        inputs = [write_wav(os.path.join(work_dir, f"speech_{seed}.wav"), synthetic_speech(seconds, seed),
+                            FormantBackend.sample_rate) for seed in range(count)]
+        audio_seconds = seconds * count
+
+        started = time.perf_counter()
+        if mode == "single":
+            for _ in range(repeat):
+                run_started = time.perf_counter()
+                transcribe_audio(inputs[0], auto_save=False, backend=backend, use_cache=False)
+                latencies.append(time.perf_counter() - run_started)
+            elapsed = min(latencies)
+        elif mode == "streaming":
+            # Latency of each window from the previous one, and of the first window from the start
+            first_chunk = []
+            for _ in range(repeat):
+                marks = [time.perf_counter()]
+                for _ in stream_transcribe(inputs[0], backend=backend, window=SUITE_STREAM_WINDOW,
+                                           progress=lambda done, total: marks.append(time.perf_counter())):
+                    pass
+                first_chunk.append(marks[1] - marks[0])
+                latencies.extend(np.diff(marks))
+            elapsed = (time.perf_counter() - started) / repeat
+            result["first_chunk"] = latency_stats(first_chunk)
+        else:
+            summary = transcribe_batch(inputs, os.path.join(work_dir, "batch.jsonl"), workers, backend=backend,
+                                       use_cache=False)
+            with open(summary["output_file"], "r", encoding="utf-8") as f:
+                latencies = [json.loads(line)["seconds"] for line in f]
+            elapsed = time.perf_counter() - started
+            result["errors"] = summary["errors"]
+    else:
+        engine = create_tts_backend(tts_backend)
+        count = batch_files if mode == "batch" else 1
+        texts = [synthetic_text(SUITE_TTS_SENTENCES, seed) for seed in range(count)]
+
+        started = time.perf_counter()
+        if mode == "single":
+            for _ in range(repeat):
+                run_started = time.perf_counter()
+                output_file = create_test_audio(texts[0], os.path.join(work_dir, "speech.wav"), backend=tts_backend,
+                                                use_cache=False, workers=workers)
+                latencies.append(time.perf_counter() - run_started)
+            elapsed = min(latencies)
+            audio_seconds = _wav_seconds(output_file)
+        elif mode == "streaming":
+            first_chunk = []
+            audio_bytes = 0
+            for _ in range(repeat):
+                marks = [time.perf_counter()]
+                audio_bytes = 0
+                for data in iter_synthesized_segments(split_sentences(texts[0]), "en", engine, workers):
+                    marks.append(time.perf_counter())
+                    audio_bytes += len(data)
+                first_chunk.append(marks[1] - marks[0])
+                latencies.extend(np.diff(marks))
+            elapsed = (time.perf_counter() - started) / repeat
+            audio_seconds = audio_bytes / (engine.sample_rate * engine.sample_width)
+            result["first_chunk"] = latency_stats(first_chunk)
+        else:
+            def timed_synthesis(**kwargs):
+                job_started = time.perf_counter()
+                output_file = create_test_audio(**kwargs)
+                return output_file, time.perf_counter() - job_started
+
+            # Whole texts run as concurrent jobs, each synthesized sentence by sentence
+            queue = JobQueue(workers=workers, max_jobs=count)
+            jobs = [queue.submit(timed_synthesis, "tts", text=text, output_file=os.path.join(work_dir, f"speech_{i}.wav"),
+                                 backend=tts_backend, use_cache=False, workers=1) for i, text in enumerate(texts)]
+            queue.shutdown(cancel=False)
+            elapsed = time.perf_counter() - started
+            finished = [job.result for job in jobs if job.result]
+            audio_seconds = sum(_wav_seconds(output_file) for output_file, _ in finished)
+            latencies = [seconds for _, seconds in finished]
+            result["errors"] = len(jobs) - len(finished)
+
+    result.update({
+        "audio_seconds": round(audio_seconds, 3),
+        "elapsed_seconds": round(elapsed, 4),
+        "rtf": round(elapsed / audio_seconds, 5) if audio_seconds else None,
+        "latency": latency_stats(latencies),
+        "throughput": {
+            "audio_seconds_per_second": round(audio_seconds / elapsed, 2) if elapsed else None,
+            "items_per_second": round(count / elapsed, 3) if elapsed else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    if mode == "batch" and task == "stt":
+        result["peak_child_rss_mb"] = peak_rss_mb(children=True)
+    return result
+
+# Directory of the benchmarked code
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _child_env(env=None):
+    """
+    Environment for a benchmark subprocess started in a scratch directory.
+
+    Caches and logs are created relative to the working directory, so
+    children run elsewhere to leave the repository untouched. The
+    repository goes on PYTHONPATH so its modules still import.
+
+    Args:
+        env (dict): Extra variables (default: None)
+
+    Returns:
+        dict: Environment for subprocess
+    """
+    python_path = os.pathsep.join(filter(None, (REPO_DIR, os.environ.get("PYTHONPATH"))))
+    return dict(os.environ, PYTHONPATH=python_path, **(env or {}))
+
+def environment_info():
+    """
+    Details of the machine and software a benchmark ran on, so runs can be compared fairly.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=REPO_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "commit": commit,
+    }
+
+def benchmark_suite(cases=SUITE_CASES, seconds=SUITE_SECONDS, repeat=SUITE_REPEAT, batch_files=SUITE_BATCH_FILES,
+                    workers=SUITE_WORKERS, tts_backend=SUITE_TTS_BACKEND):
+    """
+    Run every benchmark case, each in a fresh interpreter.
+
+    Separate processes keep peak RSS per case and stop one case's warm
+    caches from flattering the next.
+
+    Returns:
+        dict: Settings, environment and the result of every case
+    """
+    settings = {"seconds": seconds, "repeat": repeat, "batch_files": batch_files, "workers": workers,
+                "tts_backend": tts_backend}
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for task, mode in cases:
+            command = [os.path.abspath(__file__), "case", "--task", task, "--mode", mode, "--work-dir", work_dir,
+                       "--seconds", str(seconds), "--repeat", str(repeat), "--batch-files", str(batch_files),
+                       "--workers", str(workers), "--tts-backend", tts_backend]
+            completed = subprocess.run([sys.executable] + command, capture_output=True, text=True,
+                                       cwd=work_dir, env=_child_env())
+            if completed.returncode != 0:
+                lines = completed.stderr.strip().splitlines()
+                results.append({"task": task, "mode": mode, "error": lines[-1] if lines else "failed"})
+            else:
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {"benchmark": "suite", "settings": settings, "environment": environment_info(), "cases": results}
+
+# Metrics compared between runs; all of them are better when lower
+COMPARED_METRICS = (("rtf",), ("latency", "p50_ms"), ("latency", "p95_ms"), ("peak_rss_mb",))
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare a suite result with an earlier one.
+
+    Args:
+        current (dict): Result of benchmark_suite()
+        baseline (dict): Earlier result of benchmark_suite()
+        threshold (float): Relative increase reported as a regression (default: REGRESSION_THRESHOLD)
+
+    Returns:
+        list: One entry per compared metric with both values, the change and a regression flag
+    """
+    earlier = {(case["task"], case["mode"]): case for case in baseline.get("cases", [])}
+    comparison = []
+    for case in current.get("cases", []):
+        before = earlier.get((case["task"], case["mode"]))
+        if before is None or "error" in case or "error" in before:
+            continue
+        for path in COMPARED_METRICS:
+            new, old = case, before
+            for key in path:
+                new = new.get(key) if isinstance(new, dict) else None
+                old = old.get(key) if isinstance(old, dict) else None
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            comparison.append({"task": case["task"], "mode": case["mode"], "metric": ".".join(path),
+                               "baseline": old, "current": new, "change": round(change, 4),
+                               "regression": change > threshold})
+    return comparison
+
+# Modules started from the command line, measured by the startup benchmark
+ENTRY_POINTS = ("gui", "transcribe_audio", "text_to_speech", "create_test_audio", "server")
+
+# Longest wait for an entry point to import or the GUI to paint, in seconds
+STARTUP_TIMEOUT = 120
+
+def _run_entry_point(args, cwd, env=None, marker=None):
+    """
+    Start a Python subprocess in a scratch directory and time it.
+
+    Returns:
+        tuple: (wall seconds until exit or until marker is printed, stderr text, return code)
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, env=_child_env(env))
+    elapsed = None
+    if marker is not None:
+        for line in process.stdout:
+            if line.strip() == marker:
+                elapsed = time.perf_counter() - started
+                break
+    _, stderr = process.communicate(timeout=STARTUP_TIMEOUT)
+    if elapsed is None:
+        elapsed = time.perf_counter() - started
+    return elapsed, stderr, process.returncode
+
+def parse_importtime(stderr):
+    """
+    Parse the report of python -X importtime.
+
+    Returns:
+        list: (module name, nesting depth, cumulative microseconds, top-level module) per imported module
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(cumulative)))
+
+    # Modules are reported after everything they import, so the parent of a run comes last
+    top_level = None
+    parented = []
+    for name, depth, cumulative in reversed(modules):
+        if depth == 0:
+            top_level = name
+        parented.append((name, depth, cumulative, top_level))
+    return parented[::-1]
+
+def benchmark_startup(entry_points=ENTRY_POINTS, repeat=3, slowest=5):
+    """
+    Measure import cost of every entry point and time to first paint of the GUI.
+
+    Each entry point is imported in a fresh interpreter under
+    python -X importtime. The import total is the cumulative time of the
+    modules imported at the top level, without interpreter start-up
+    (site). The GUI is started offscreen and timed until it has painted
+    its window.
+
+    Args:
+        entry_points (list): Module names to import (default: ENTRY_POINTS)
+        repeat (int): Number of runs per measurement, the fastest is reported (default: 3)
+        slowest (int): Number of slowest direct imports listed per entry point (default: 5)
+
+    Returns:
+        dict: Benchmark results
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = {}
+        for module in entry_points:
+            best = None
+            for _ in range(repeat):
+                wall, stderr, returncode = _run_entry_point(["-X", "importtime", "-c", f"import {module}"], work_dir)
+                if returncode != 0:
+                    best = {"error": stderr.strip().splitlines()[-1] if stderr.strip() else f"exit {returncode}"}
+                    break
+                modules = parse_importtime(stderr)
+                import_us = sum(us for name, depth, us, _ in modules if depth == 0 and name != "site")
+                if best is None or import_us < best["import_ms"] * 1000:
+                    # Direct imports of the entry point, most expensive first
+                    children = sorted(((name, us) for name, depth, us, parent in modules
+                                       if depth == 1 and parent == module), key=lambda c: -c[1])
+                    best = {
+                        "import_ms": round(import_us / 1000, 1),
+                        "wall_ms": round(wall * 1000, 1),
+                        "modules": len(modules),
+                        "slowest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in children[:slowest]],
+                    }
+            results[module] = best
+
+        first_paint = None
+        if "gui" in entry_points and "error" not in results["gui"]:
+            env = {"GUI_STARTUP_PROBE": "1", "QT_QPA_PLATFORM": os.getenv("QT_QPA_PLATFORM", "offscreen")}
+            timings = []
+            for _ in range(repeat):
+                elapsed, _, returncode = _run_entry_point([os.path.join(REPO_DIR, "gui.py")], work_dir, env,
+                                                          marker="first-paint")
+                if returncode == 0:
+                    timings.append(elapsed)
+            first_paint = round(min(timings) * 1000, 1) if timings else None
+
+    return {"benchmark": "startup", "entry_points": results, "gui_first_paint_ms": first_paint}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for speech recognition and synthesis")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    vad_parser = subparsers.add_parser("vad", help="Audio skipped and time saved by voice activity detection")
+    vad_parser.add_argument("--input", default="test_audio.wav", help="WAV file to benchmark")
+    vad_parser.add_argument("--backend", default=None, help="Recognition backend (default: offline stand-in)")
+    vad_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+
+    diarize_parser = subparsers.add_parser("diarize", help="Speaker diarization speed and accuracy on a synthetic dialogue")
+    diarize_parser.add_argument("--seconds", type=float, default=SUITE_SECONDS, help="Length of the dialogue")
+    diarize_parser.add_argument("--speakers", type=int, default=2, choices=range(1, len(DIALOGUE_VOICES) + 1),
+                                help="Voices in the dialogue")
+    diarize_parser.add_argument("--seed", type=int, default=0, help="Random seed of the dialogue")
+    diarize_parser.add_argument("--known-speakers", action="store_true",
+                                help="Tell diarization the number of speakers instead of letting it estimate")
+    diarize_parser.add_argument("--workers", type=int, default=None, help="Embedding worker processes")
+
+    startup_parser = subparsers.add_parser("startup", help="Import time of each entry point and GUI first paint")
+    startup_parser.add_argument("--entry-point", action="append", dest="entry_points",
+                                help="Module to measure, repeat for several (default: all entry points)")
+    startup_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+
+    suite_parser = subparsers.add_parser("suite", help="STT and TTS latency, real-time factor, throughput and memory")
+    case_parser = subparsers.add_parser("case", help="Run a single suite case in this process")
+    for sub in (suite_parser, case_parser):
+        sub.add_argument("--seconds", type=float, default=SUITE_SECONDS, help="Length of each synthetic recording")
+        sub.add_argument("--repeat", type=int, default=SUITE_REPEAT, help="Runs of single and streaming cases")
+        sub.add_argument("--batch-files", type=int, default=SUITE_BATCH_FILES, help="Files or texts per batch")
+        sub.add_argument("--workers", type=int, default=SUITE_WORKERS, help="Batch workers or synthesis threads")
+        sub.add_argument("--tts-backend", default=SUITE_TTS_BACKEND, help="Local synthesis backend")
+    suite_parser.add_argument("--case", action="append", dest="cases", metavar="TASK:MODE",
+                              help="Case to run, e.g. stt:batch, repeat for several (default: all)")
+    suite_parser.add_argument("--output", default=None, help="Also write the result to this JSON file")
+    suite_parser.add_argument("--compare", default=None, help="Earlier result to compare against")
+    suite_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                              help="Relative slowdown reported as a regression")
+    case_parser.add_argument("--task", choices=("stt", "tts"), required=True)
+    case_parser.add_argument("--mode", choices=("single", "batch", "streaming"), required=True)
+    case_parser.add_argument("--work-dir", required=True, help="Directory for generated inputs and outputs")
+
+    args = parser.parse_args()
+    if args.benchmark == "case":
+        result = run_case(args.task, args.mode, args.work_dir, args.seconds, args.repeat, args.batch_files,
+                          args.workers, args.tts_backend)
+        print(json.dumps(result))
+        return
+    if args.benchmark == "suite":
+        cases = [tuple(case.split(":")) for case in args.cases] if args.cases else SUITE_CASES
+        result = benchmark_suite(cases, args.seconds, args.repeat, args.batch_files, args.workers, args.tts_backend)
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                result["comparison"] = compare_results(result, json.load(f), args.threshold)
+            result["regressions"] = sum(entry["regression"] for entry in result["comparison"])
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+    elif args.benchmark == "vad":
+        result = benchmark_vad(args.input, args.backend, args.repeat)
+    elif args.benchmark == "diarize":
+        result = benchmark_diarization(args.seconds, args.speakers, args.seed,
+                                       args.speakers if args.known_speakers else None, args.workers)
+    elif args.benchmark == "startup":
+        result = benchmark_startup(args.entry_points or ENTRY_POINTS, args.repeat)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
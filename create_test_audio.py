@@ -1,35 +1,102 @@
-from gtts import gTTS
 import os
+import time
+import tempfile
+from job_queue import JobCancelled
+from metrics import metrics
+from event_log import log_event
+from tts_cache import cached_synthesis
+from audio_dsp import rate_to_speed, process_wav, process_mp3
+from tts_engine import synthesize_to_file, create_tts_backend, output_extension, TTS_WORKERS
 
-def create_test_audio(text, output_file="test_audio.mp3", language="en-US", rate=150, volume=0.9):
+def create_test_audio(text, output_file="test_audio.mp3", language="en-US", rate=150, volume=1.0, use_cache=True,
+                      backend=None, workers=TTS_WORKERS, progress=None, cancel_token=None):
     """
-    Create an audio file from text using Google Text-to-Speech.
+    Create an audio file from text using Google Text-to-Speech or a local synthesizer.
+    
+    The text is split into sentences that are synthesized concurrently and
+    written to the output in order as they complete. Rate and volume are
+    applied afterwards as DSP on the synthesized PCM, so cached audio can be
+    re-rendered at another rate without synthesizing it again. MP3 from
+    encoded backends is decoded for this, and the result saved as WAV.
     
     Args:
         text (str): The text to convert to speech
         output_file (str): Path to save the audio file (default: "test_audio.mp3")
         language (str): Language code (e.g., "en-US", "es-ES") (default: "en-US")
-        rate (int): Speech rate in words per minute (default: 150)
-        volume (float): Volume level between 0.0 and 1.0 (default: 0.9)
+        rate (int): Speech rate in words per minute, 150 is the natural rate (default: 150)
+        volume (float): Volume level between 0.0 and 1.0 (default: 1.0)
+        use_cache (bool): Reuse previously synthesized audio for the same text and language (default: True)
+        backend (str): Synthesis backend, e.g. "gtts" or the local "formant" (default: TTS_BACKEND setting)
+        workers (int): Number of sentences synthesized concurrently (default: TTS_WORKERS)
+        progress (callable): Called with (done, total) after each sentence (default: None)
+        cancel_token (CancellationToken): Stops synthesis between sentences when cancelled (default: None)
     
     Returns:
-        str: Path to the created audio file
+        str: Path to the created audio file, its extension adjusted to the format written: WAV for PCM
+            backends and whenever rate or volume are applied, MP3 otherwise
     """
     try:
         # Extract the language code (e.g., "en" from "en-US")
         lang_code = language.split('-')[0]
         
-        # Create the gTTS object
-        tts = gTTS(text=text, lang=lang_code, slow=False)
+        # Rate and volume are post-processing steps on PCM audio, decoded first for encoded backends
+        engine = create_tts_backend(backend)
+        speed = rate_to_speed(rate)
+        postprocess = None
+        decode = False
+        if speed != 1.0 or volume != 1.0:
+            decode = engine.audio_format != "pcm"
+            
+            def postprocess(source, destination):
+                with metrics.span("tts.postprocess"):
+                    (process_mp3 if decode else process_wav)(source, destination, speed, volume)
+        
+        # PCM output is written as WAV and encoded output as MP3, whatever extension was asked for
+        root, extension = os.path.splitext(output_file)
+        written_extension = ".wav" if decode else output_extension(engine)
+        if extension.lower() != written_extension:
+            output_file = root + written_extension
         
         # Create output directory if it doesn't exist
         os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
         
-        # Save the audio file
-        tts.save(output_file)
+        def synthesize(path):
+            # Synthesize sentence by sentence and save the audio file
+            synthesize_to_file(text, path, lang_code, engine, workers, progress, cancel_token)
+        
+        def render(path, transform):
+            if use_cache:
+                cached_synthesis(text, lang_code, path, synthesize, transform, engine=engine.name, slow=False)
+            else:
+                synthesize(path)
+                if transform:
+                    transform(path, path)
+        
+        started = time.perf_counter()
+        if decode:
+            # The MP3 is synthesized, or fetched from the cache, next to the WAV it is processed into
+            handle, encoded_file = tempfile.mkstemp(suffix=output_extension(engine),
+                                                    dir=os.path.dirname(output_file) or ".")
+            os.close(handle)
+            try:
+                render(encoded_file, None)
+                postprocess(encoded_file, output_file)
+            finally:
+                os.remove(encoded_file)
+        else:
+            render(output_file, postprocess)
+        seconds = time.perf_counter() - started
+        metrics.observe("tts.total", seconds)
+        log_event("synthesis", output_file=output_file, language=language, backend=engine.name,
+                  characters=len(text), seconds=round(seconds, 3))
         
         return output_file
         
+    except JobCancelled:
+        # Never leave a truncated file behind
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
     except Exception as e:
         raise Exception(f"Error creating audio file: {str(e)}")
 
@@ -0,0 +1,359 @@
+import os
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from metrics import metrics
+from vad import create_vad
+from wav_reader import open_wav, downmix, to_float
+
+# Analysis frames of the MFCC front end, in seconds
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+
+# Mel filterbank and cepstrum sizes
+MEL_BANDS = 26
+MFCC_COUNT = 13
+MEL_LOW_HZ = 60.0
+
+# Pitch search range and analysis frame, and the normalized autocorrelation that counts as voiced
+PITCH_MIN_HZ = 60.0
+PITCH_MAX_HZ = 400.0
+PITCH_FRAME_SECONDS = 0.04
+VOICING_THRESHOLD = 0.5
+
+# Frames quieter than the loudest frame of a window by this much log energy are left out of its embedding
+ENERGY_RANGE = 8.0
+
+# Scale of the cepstral and pitch parts of an embedding, so that both vary about as much
+# within one speaker; pitch separates voices more reliably than the spectral envelope
+MFCC_WEIGHT = 0.25
+PITCH_WEIGHT = 4.0
+
+# Speech is cut into windows of this length, each embedded and assigned to one speaker
+EMBEDDING_SECONDS = 1.5
+MIN_EMBEDDING_SECONDS = 0.5
+
+# Clusters closer than this distance between embeddings are merged when the number of speakers is unknown,
+# and smaller clusters than this share of the windows are taken for outliers of the nearest speaker
+CLUSTER_THRESHOLD = float(os.getenv("DIARIZATION_THRESHOLD", "2.5"))
+MIN_SPEAKER_SHARE = 0.05
+
+# Most windows clustered pairwise; longer recordings cluster an evenly spaced sample of this many
+# and assign the other windows to the nearest speaker found
+CLUSTER_MAX_WINDOWS = int(os.getenv("DIARIZATION_MAX_WINDOWS", "1000"))
+
+# Turns of one speaker separated by less than this pause are joined, in seconds
+TURN_GAP_SECONDS = 1.0
+
+# Embedding worker processes, and the fewest windows worth starting them for
+DIARIZATION_WORKERS = int(os.getenv("DIARIZATION_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_WINDOWS = 64
+
+# Amount of audio run through voice activity detection per step, in seconds
+VAD_BLOCK_SECONDS = 30.0
+
+def mel_filterbank(sample_rate, n_fft, bands=MEL_BANDS, low=MEL_LOW_HZ, high=None):
+    """
+    Triangular filters spaced evenly on the mel scale.
+
+    Returns:
+        np.ndarray: (bands, n_fft // 2 + 1) filter weights
+    """
+    high = high or sample_rate / 2
+
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    edges = 700.0 * (10 ** (np.linspace(to_mel(low), to_mel(high), bands + 2) / 2595.0) - 1.0)
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+def dct_matrix(count, bands):
+    """
+    Orthonormal DCT-II basis that turns log mel energies into cepstral coefficients.
+    """
+    basis = np.cos(np.pi / bands * (np.arange(bands) + 0.5)[None, :] * np.arange(count)[:, None])
+    basis *= np.sqrt(2.0 / bands)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+def mfcc(samples, sample_rate, count=MFCC_COUNT, bands=MEL_BANDS):
+    """
+    Mel-frequency cepstral coefficients of every analysis frame.
+
+    All frames are processed at once as views into the signal, with one
+    FFT and two matrix products for the whole block.
+
+    Args:
+        samples (np.ndarray): float32 mono samples
+        sample_rate (int): Sample rate in Hz
+        count (int): Coefficients per frame (default: MFCC_COUNT)
+        bands (int): Mel filters (default: MEL_BANDS)
+
+    Returns:
+        np.ndarray: (frames, count) coefficients
+    """
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    hop_length = int(HOP_SECONDS * sample_rate)
+    if len(samples) < frame_length:
+        return np.zeros((0, count), dtype=np.float32)
+
+    n_fft = 1 << (frame_length - 1).bit_length()
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop_length]
+    power = np.abs(np.fft.rfft(frames * np.hamming(frame_length).astype(np.float32), n_fft)) ** 2
+    energies = np.log(power @ mel_filterbank(sample_rate, n_fft, bands).T + 1e-10)
+    return energies @ dct_matrix(count, bands).T
+
+def pitch_quartiles(samples, sample_rate):
+    """
+    Quartiles of the log pitch over the voiced frames of a stretch of speech.
+
+    Pitch is taken from the autocorrelation peak of each frame, computed
+    for all frames with one FFT.
+
+    Returns:
+        np.ndarray: 25th, 50th and 75th percentile of log pitch in Hz, zeros when nothing is voiced
+    """
+    frame_length = int(PITCH_FRAME_SECONDS * sample_rate)
+    if len(samples) < frame_length:
+        return np.zeros(3, dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::int(HOP_SECONDS * sample_rate)]
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    autocorrelation = np.fft.irfft(np.abs(np.fft.rfft(frames, 2 * frame_length)) ** 2)[:, :frame_length]
+
+    shortest, longest = int(sample_rate / PITCH_MAX_HZ), int(sample_rate / PITCH_MIN_HZ)
+    lags = shortest + np.argmax(autocorrelation[:, shortest:longest], axis=1)
+    strength = autocorrelation[np.arange(len(lags)), lags] / (autocorrelation[:, 0] + 1e-9)
+    voiced = strength > VOICING_THRESHOLD
+    if not voiced.any():
+        return np.zeros(3, dtype=np.float32)
+    return np.percentile(np.log(sample_rate / lags[voiced]), [25, 50, 75]).astype(np.float32)
+
+def embed(samples, sample_rate):
+    """
+    Fixed-size speaker embedding of a stretch of speech.
+
+    The mean cepstral coefficients of the louder frames describe the
+    voice's spectral envelope, and the pitch quartiles its register. The
+    first coefficient, which only tracks loudness, is left out. The parts
+    are weighted so that Euclidean distance compares voices.
+
+    Returns:
+        np.ndarray: 1-D embedding
+    """
+    coefficients = mfcc(samples, sample_rate)
+    if not len(coefficients):
+        return np.zeros(MFCC_COUNT + 2, dtype=np.float32)
+    loud = coefficients[coefficients[:, 0] > coefficients[:, 0].max() - ENERGY_RANGE]
+    return np.concatenate([MFCC_WEIGHT * loud[:, 1:].mean(axis=0),
+                           PITCH_WEIGHT * pitch_quartiles(samples, sample_rate)]).astype(np.float32)
+
+def _embed_windows(path, windows):
+    """
+    Embed windows of a WAV file; runs in a worker process, which maps the file itself.
+    """
+    wav = open_wav(path)
+    with wav:
+        return [embed(to_float(wav.mono(start, end)), wav.sample_rate) for start, end in windows]
+
+def speech_regions(wav, max_segment=VAD_BLOCK_SECONDS, **vad_options):
+    """
+    Find speech in a mapped WAV file with voice activity detection.
+
+    Returns:
+        list: (start, end) speech segments in sample frames
+    """
+    detector, segmenter = create_vad(wav.sample_rate, max_segment, **vad_options)
+    frame_length = detector.frame_length
+    block_frames = max(1, int(VAD_BLOCK_SECONDS * wav.sample_rate) // frame_length) * frame_length
+
+    regions = []
+    for block_start, frames in wav.iter_blocks(block_frames):
+        regions += segmenter.push(detector.is_speech(to_float(downmix(frames))))
+        if block_start + block_frames >= wav.frames:
+            regions += segmenter.flush()
+    return [(start * frame_length, min(end * frame_length, wav.frames)) for start, end in regions]
+
+def split_windows(regions, sample_rate, window=EMBEDDING_SECONDS, min_window=MIN_EMBEDDING_SECONDS):
+    """
+    Cut speech segments into embedding windows.
+
+    A remainder shorter than min_window is added to the window before it,
+    and segments shorter than min_window are skipped.
+
+    Returns:
+        list: (start, end) windows in sample frames
+    """
+    window_frames = int(window * sample_rate)
+    min_frames = int(min_window * sample_rate)
+    windows = []
+    for start, end in regions:
+        if end - start < min_frames:
+            continue
+        bounds = list(range(start, end, window_frames)) + [end]
+        if len(bounds) > 2 and bounds[-1] - bounds[-2] < min_frames:
+            del bounds[-2]
+        windows += list(zip(bounds[:-1], bounds[1:]))
+    return windows
+
+def cluster_embeddings(embeddings, num_speakers=None, threshold=CLUSTER_THRESHOLD, max_windows=CLUSTER_MAX_WINDOWS):
+    """
+    Group embeddings by speaker with average-linkage agglomerative clustering.
+
+    Embeddings are compared by Euclidean distance. Clusters are merged
+    until num_speakers remain, or, when the number of speakers is unknown,
+    until the closest pair is further apart than threshold. In that case
+    clusters holding less than MIN_SPEAKER_SHARE of the windows are
+    outliers such as a shouted word, and join the nearest larger cluster.
+
+    Pairwise clustering costs cubic time in the number of windows, so past
+    max_windows only an evenly spaced sample is clustered, and every
+    window is then assigned to the speaker with the nearest centroid.
+
+    Args:
+        embeddings (np.ndarray): (windows, features) embeddings
+        num_speakers (int): Known number of speakers, None to estimate it (default: None)
+        threshold (float): Distance that stops merging (default: CLUSTER_THRESHOLD)
+        max_windows (int): Most windows clustered pairwise (default: CLUSTER_MAX_WINDOWS)
+
+    Returns:
+        np.ndarray: Speaker index per window, numbered in order of first appearance
+    """
+    count = len(embeddings)
+    if count < 2:
+        return np.zeros(count, dtype=int)
+
+    embeddings = embeddings.astype(np.float64)
+    if count > max_windows:
+        sample = np.linspace(0, count - 1, max_windows).round().astype(int)
+        sample_labels = _agglomerate(embeddings[sample], num_speakers, threshold)
+        speakers = np.unique(sample_labels)
+        centroids = np.stack([embeddings[sample][sample_labels == k].mean(axis=0) for k in speakers])
+        # Squared distances expanded, so only a (windows, speakers) matrix is built
+        distance = (np.sum(embeddings ** 2, axis=1)[:, None] - 2.0 * embeddings @ centroids.T
+                    + np.sum(centroids ** 2, axis=1)[None, :])
+        labels = speakers[np.argmin(distance, axis=1)]
+    else:
+        labels = _agglomerate(embeddings, num_speakers, threshold)
+
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first))[inverse]
+
+def _agglomerate(embeddings, num_speakers, threshold):
+    """
+    Cluster label per embedding, see cluster_embeddings(); labels are arbitrary cluster ids.
+    """
+    count = len(embeddings)
+    squared = np.sum(embeddings ** 2, axis=1)
+    distance = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2.0 * embeddings @ embeddings.T, 0.0))
+    distance = distance.astype(np.float32)
+    np.fill_diagonal(distance, np.inf)
+
+    sizes = np.ones(count)
+    labels = np.arange(count)
+    clusters = count
+    while clusters > (num_speakers or 1):
+        i, j = divmod(int(np.argmin(distance)), count)
+        if num_speakers is None and distance[i, j] > threshold:
+            break
+        # Average linkage: the merged cluster's distance is the size-weighted mean of its parts
+        merged = (sizes[i] * distance[i] + sizes[j] * distance[j]) / (sizes[i] + sizes[j])
+        distance[i], distance[:, i] = merged, merged
+        distance[i, i] = np.inf
+        distance[j], distance[:, j] = np.inf, np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+        clusters -= 1
+
+    if num_speakers is None:
+        ids, sizes = np.unique(labels, return_counts=True)
+        speakers = ids[sizes >= MIN_SPEAKER_SHARE * count]
+        if 0 < len(speakers) < len(ids):
+            centroids = np.stack([embeddings[labels == k].mean(axis=0) for k in speakers])
+            for k in np.setdiff1d(ids, speakers):
+                members = labels == k
+                nearest = np.argmin(np.linalg.norm(centroids - embeddings[members].mean(axis=0), axis=1))
+                labels[members] = speakers[nearest]
+    return labels
+
+def speaker_turns(windows, labels, sample_rate, gap=TURN_GAP_SECONDS):
+    """
+    Join consecutive windows of the same speaker into turns.
+
+    A single window whose neighbours both belong to another speaker is
+    treated as a misclassification and relabelled first.
+
+    Returns:
+        list: Turns as dicts with "start", "end" and "speaker" keys, times in seconds
+    """
+    labels = list(labels)
+    for k in range(1, len(labels) - 1):
+        if labels[k - 1] == labels[k + 1] != labels[k]:
+            labels[k] = labels[k - 1]
+
+    turns = []
+    for (start, end), label in zip(windows, labels):
+        speaker = f"SPEAKER_{label + 1}"
+        if turns and turns[-1]["speaker"] == speaker and start / sample_rate - turns[-1]["end"] <= gap:
+            turns[-1]["end"] = round(end / sample_rate, 3)
+        else:
+            turns.append({"start": round(start / sample_rate, 3), "end": round(end / sample_rate, 3),
+                          "speaker": speaker})
+    return turns
+
+def diarize(input_file, num_speakers=None, workers=DIARIZATION_WORKERS, threshold=CLUSTER_THRESHOLD, **vad_options):
+    """
+    Find who spoke when in a recording.
+
+    Speech is found with voice activity detection and cut into short
+    windows. Each window is embedded from its MFCCs, across worker
+    processes for long recordings, and the embeddings are clustered into
+    speakers. Windows without voiced frames have no pitch to compare, so
+    they take the speaker of the next voiced window. Adjacent windows of
+    one speaker form a turn.
+
+    Args:
+        input_file (str): Path to a 16-bit WAV file, see audio_normalize.normalize_audio()
+        num_speakers (int): Known number of speakers, None to estimate it (default: None)
+        workers (int): Embedding worker processes (default: DIARIZATION_WORKERS)
+        threshold (float): Embedding distance that separates speakers when their number is unknown
+            (default: CLUSTER_THRESHOLD)
+        **vad_options: Options for VoiceActivityDetector and SpeechSegmenter
+
+    Returns:
+        list: Speaker turns in time order, dicts with "start", "end" and "speaker" keys
+    """
+    wav = open_wav(input_file)
+    if wav is None:
+        raise ValueError(f"Diarization needs a WAV file: {input_file}")
+    with wav:
+        sample_rate = wav.sample_rate
+        with metrics.span("stt.vad"):
+            regions = speech_regions(wav, **vad_options)
+    windows = split_windows(regions, sample_rate)
+    if not windows:
+        return []
+
+    with metrics.span("diarization.embed"):
+        # Inside a worker process, e.g. of a batch, the cores are already in use
+        if workers > 1 and len(windows) >= PARALLEL_MIN_WINDOWS and multiprocessing.parent_process() is None:
+            # Contiguous batches keep each worker reading one part of the mapped file
+            size = -(-len(windows) // (workers * 4))
+            batches = [windows[i:i + size] for i in range(0, len(windows), size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_embed_windows, [input_file] * len(batches), batches)
+                embeddings = [embedding for batch in results for embedding in batch]
+        else:
+            embeddings = _embed_windows(input_file, windows)
+
+    with metrics.span("diarization.cluster"):
+        embeddings = np.stack(embeddings)
+        voiced = np.flatnonzero(embeddings[:, -1] > 0)
+        if not len(voiced):
+            voiced = np.arange(len(windows))
+        labels = cluster_embeddings(embeddings[voiced], num_speakers, threshold)
+        labels = labels[np.minimum(np.searchsorted(voiced, np.arange(len(windows))), len(voiced) - 1)]
+    return speaker_turns(windows, labels, sample_rate)
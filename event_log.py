@@ -0,0 +1,305 @@
+import os
+import gzip
+import json
+import glob
+import time
+import queue
+import atexit
+import shutil
+import weakref
+import logging
+import threading
+import multiprocessing
+import multiprocessing.util
+from datetime import datetime
+from metrics import metrics
+
+# Log files and their rotation limits, overridable from the environment
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", os.path.join("logs", "events.log"))
+APP_LOG_PATH = os.getenv("APP_LOG_PATH", os.path.join("logs", "intellicontrol.log"))
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "10"))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+
+# Lines waiting for the writer thread, and how often written lines are forced to disk
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FSYNC_SECONDS = float(os.getenv("LOG_FSYNC_SECONDS", "1.0"))
+
+# Most lines written between two checks of the queue
+WRITE_BATCH_LINES = 512
+
+# Line format of the application log
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Queue marker that makes the writer thread finish
+_STOP = object()
+
+def process_log_path(path):
+    """
+    Log file of the current process.
+
+    Worker processes write to their own file, with their pid before the
+    extension (events.log -> events.1234.log), so no two processes ever
+    append to or rotate the same file.
+
+    Args:
+        path (str): Log file path of the main process
+
+    Returns:
+        str: path itself in the main process, the pid-suffixed path in worker processes
+    """
+    if multiprocessing.parent_process() is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{extension}"
+
+# Writers to reset in a forked child, whose copies still point at the parent's thread and file
+_writers = weakref.WeakSet()
+
+class AsyncLogWriter:
+    """
+    Line-oriented log file written by a background thread.
+
+    write() only puts the line on a bounded queue and never touches the
+    disk, so callers on worker or GUI threads are not slowed by file I/O.
+    When the queue is full the line is dropped and counted instead of
+    blocking the caller. The writer thread appends lines in batches and
+    forces them to disk at most every fsync_seconds. The file is rotated
+    once it exceeds max_bytes or has been written to for rotate_seconds;
+    rotated files are gzip-compressed and only the newest backups are kept.
+    Worker processes write to their own file, see process_log_path().
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_MB * 1024 * 1024, rotate_seconds=LOG_ROTATE_HOURS * 3600,
+                 backups=LOG_BACKUPS, queue_size=LOG_QUEUE_SIZE, fsync_seconds=LOG_FSYNC_SECONDS):
+        """
+        Args:
+            path (str): Log file path of the main process
+            max_bytes (float): Size after which the file is rotated, 0 to disable (default: LOG_MAX_MB)
+            rotate_seconds (float): Age after which the file is rotated, 0 to disable (default: LOG_ROTATE_HOURS)
+            backups (int): Compressed rotated files kept (default: LOG_BACKUPS)
+            queue_size (int): Lines waiting to be written before new ones are dropped (default: LOG_QUEUE_SIZE)
+            fsync_seconds (float): Longest time written lines may wait for fsync (default: LOG_FSYNC_SECONDS)
+        """
+        self.base_path = path
+        self.path = process_log_path(path)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.fsync_seconds = fsync_seconds
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._opened = 0.0
+        _writers.add(self)
+
+    def write(self, line):
+        """
+        Queue a line for writing without waiting for the disk.
+
+        Args:
+            line (str): Text of the line, without the trailing newline
+
+        Returns:
+            bool: False if the queue was full and the line was dropped
+        """
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.increment("log.dropped")
+            return False
+
+    def flush(self, timeout=None):
+        """
+        Wait until every line queued so far is written and synced.
+
+        Args:
+            timeout (float): Seconds to wait at most, None to wait indefinitely (default: None)
+
+        Returns:
+            bool: True if the lines were written in time
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        """
+        Write the remaining lines and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                # Known only once the process runs: multiprocessing marks a child after importing its modules
+                self.path = process_log_path(self.base_path)
+                self._thread = threading.Thread(target=self._run, name=f"log-writer:{self.path}", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+                if multiprocessing.parent_process() is not None:
+                    # Worker processes exit without running atexit handlers, but do run these
+                    multiprocessing.util.Finalize(self, self.close, exitpriority=0)
+
+    def _after_fork(self):
+        # The parent's writer thread does not exist here and its file is the parent's to rotate
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.fsync_seconds)]
+            except queue.Empty:
+                items = []
+            # Take whatever else is waiting so it is written in one go
+            while items and len(items) < WRITE_BATCH_LINES:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = [item for item in items if isinstance(item, str)]
+            waiters = [item for item in items if isinstance(item, threading.Event)]
+            stop = _STOP in items
+            try:
+                if lines:
+                    self._write(lines)
+                if self._file is not None and (waiters or stop or time.monotonic() - last_sync >= self.fsync_seconds):
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    last_sync = time.monotonic()
+            except OSError as e:
+                # A full or missing disk must not kill the thread; the lines are lost
+                self.dropped += len(lines)
+                logging.getLogger("IntelliControl").debug("Log write to %s failed: %s", self.path, e)
+
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, lines):
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        if self._file is not None and self._should_rotate(len(data)):
+            self._rotate()
+        if self._file is None:
+            self._open()
+        self._file.write(data)
+        self._size += len(data)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened = time.time()
+
+    def _should_rotate(self, incoming):
+        if not self._size:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened >= self.rotate_seconds
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        # Timestamped names sort oldest first
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(rotated)
+
+        backups = sorted(glob.glob(glob.escape(self.path) + ".*.gz"))
+        for old in backups[:max(0, len(backups) - self.backups)]:
+            os.remove(old)
+
+class AsyncLogHandler(logging.Handler):
+    """
+    Logging handler that hands formatted records to an AsyncLogWriter.
+    """
+
+    def __init__(self, writer, level=logging.NOTSET):
+        super().__init__(level)
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            self.writer.write(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush(timeout=self.writer.fsync_seconds * 2)
+
+def _reset_writers_after_fork():
+    for writer in list(_writers):
+        writer._after_fork()
+
+os.register_at_fork(after_in_child=_reset_writers_after_fork)
+
+# Writers shared by every caller in this process
+event_log = AsyncLogWriter(EVENT_LOG_PATH)
+app_log = AsyncLogWriter(APP_LOG_PATH)
+
+def log_event(event, **fields):
+    """
+    Record an event as a JSON line in the event log.
+
+    Args:
+        event (str): Event name, e.g. "transcription"
+        **fields: JSON serializable details of the event
+
+    Returns:
+        bool: False if the event was dropped because the log is backed up
+    """
+    record = {"event": event, **fields, "timestamp": datetime.now().isoformat()}
+    return event_log.write(json.dumps(record, ensure_ascii=False, default=str))
+
+def configure_logging(level=logging.INFO):
+    """
+    Send the application logger to the rotating application log through the writer thread.
+
+    Args:
+        level (int): Logging level of the application logger (default: logging.INFO)
+
+    Returns:
+        logging.Logger: The configured logger
+    """
+    logger = logging.getLogger("IntelliControl")
+    logger.setLevel(level)
+    if not any(isinstance(h, AsyncLogHandler) and h.writer is app_log for h in logger.handlers):
+        handler = AsyncLogHandler(app_log)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+    return logger
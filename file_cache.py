@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks on Windows; the cache is then only safe within one process
+    fcntl = None
+
+INDEX_FILE = "index.json"
+
+# File locked while a process reads, changes and writes back the index
+LOCK_FILE = "index.lock"
+
+class FileCache:
+    """
+    Size-bounded on-disk cache of files addressed by a string key.
+
+    An index file records size and last use of every entry, and the least
+    recently used entries are evicted past the size limit. The index is
+    reloaded when another process rewrites it, and every read-modify-write
+    of it holds a file lock, so processes sharing the cache never lose
+    each other's entries.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Args:
+            cache_dir (str): Directory holding cached files and the index
+            max_bytes (int): Maximum total size of cached files in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.lock_path = os.path.join(cache_dir, LOCK_FILE)
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_stamp = None
+
+    def fetch(self, key, output_file, transform=None):
+        """
+        Place the cached file for a key at output_file.
+
+        Args:
+            key (str): Cache key
+            output_file (str): Destination path
+            transform (callable): Called with (cached_file, output_file) to write a processed copy
+                instead of linking the cached file (default: None)
+
+        Returns:
+            bool: True on a cache hit, False otherwise
+        """
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return False
+
+            cached_file = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(cached_file):
+                del index[key]
+                self._save_index()
+                return False
+
+            if transform is None:
+                _link_or_copy(cached_file, output_file)
+            else:
+                # Never write through an existing hard link into the cache
+                if os.path.lexists(output_file):
+                    os.remove(output_file)
+                transform(cached_file, output_file)
+            entry["last_used"] = time.time()
+            self._save_index()
+            return True
+
+    def lookup(self, key):
+        """
+        Path of the cached file for a key, marking it as recently used.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: Path inside the cache, or None on a miss
+        """
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+
+            cached_file = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(cached_file):
+                del index[key]
+                self._save_index()
+                return None
+
+            entry["last_used"] = time.time()
+            self._save_index()
+            return cached_file
+
+    def store(self, key, source_file, move=False):
+        """
+        Add a file to the cache.
+
+        The entry just stored is never evicted by its own insertion, even if
+        it alone exceeds the size limit.
+
+        Args:
+            key (str): Cache key
+            source_file (str): Path of the file to cache
+            move (bool): Move source_file into the cache instead of copying it (default: False)
+
+        Returns:
+            str: Path of the cached file
+        """
+        with self._locked():
+            index = self._load_index()
+
+            size = os.path.getsize(source_file)
+            file_name = key + os.path.splitext(source_file)[1]
+            cached_file = os.path.join(self.cache_dir, file_name)
+            if move:
+                os.replace(source_file, cached_file)
+            else:
+                # Copy rather than link, so later writes to source_file cannot alter the cache
+                shutil.copyfile(source_file, cached_file)
+            index[key] = {
+                "file": file_name,
+                "size": size,
+                "last_used": time.time(),
+            }
+            self._evict(index, keep=key)
+            self._save_index()
+            return cached_file
+
+    def size(self):
+        """
+        Returns:
+            int: Total size of cached files in bytes
+        """
+        with self._locked():
+            return sum(entry["size"] for entry in self._load_index().values())
+
+    @contextmanager
+    def _locked(self):
+        # Threads of this process wait on the thread lock, other processes on the lock file
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self, index, keep=None):
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = index.pop(key)
+            total -= entry["size"]
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        # Reload only when another process has replaced the index since we last read it
+        stamp = self._stamp()
+        if self._index is None or stamp != self._index_stamp:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+            self._index_stamp = stamp
+        return self._index
+
+    def _save_index(self):
+        # Write to a temporary file of our own first so a crash never leaves a truncated index
+        os.makedirs(self.cache_dir, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(prefix=INDEX_FILE + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self.index_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._index_stamp = self._stamp()
+
+    def _stamp(self):
+        # Every save replaces the file, so the inode changes even when the mtime does not
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+def _link_or_copy(source, destination):
+    """
+    Hard link source to destination, copying when linking is not possible.
+    """
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
@@ -0,0 +1,243 @@
+import re
+import numpy as np
+
+# Output format of the synthesizer
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Pitch contour of an utterance in Hz, falling from start to end
+START_PITCH = 130.0
+END_PITCH = 95.0
+
+# Pauses in seconds
+WORD_PAUSE = 0.04
+COMMA_PAUSE = 0.15
+SENTENCE_PAUSE = 0.3
+
+# Bandwidths and relative amplitudes of the first three formants
+FORMANT_BANDWIDTHS = np.array([60.0, 90.0, 130.0])
+FORMANT_AMPLITUDES = np.array([1.0, 0.5, 0.25])
+
+# Phoneme parameters: (kind, formants or noise band, duration in seconds, amplitude)
+# kind is "vowel" or "sonorant" (voiced, formant filtered), "fricative" (band-limited noise),
+# "voiced_fricative" (noise plus voicing) or "plosive" (closure followed by a noise burst)
+PHONEMES = {
+    "IY": ("vowel", (270, 2290, 3010), 0.12, 1.0),
+    "IH": ("vowel", (390, 1990, 2550), 0.10, 1.0),
+    "EH": ("vowel", (530, 1840, 2480), 0.11, 1.0),
+    "EY": ("vowel", (480, 2000, 2600), 0.14, 1.0),
+    "AE": ("vowel", (660, 1720, 2410), 0.12, 1.0),
+    "AA": ("vowel", (730, 1090, 2440), 0.13, 1.0),
+    "AH": ("vowel", (520, 1190, 2390), 0.10, 1.0),
+    "AW": ("vowel", (700, 1200, 2500), 0.15, 1.0),
+    "OW": ("vowel", (450, 1000, 2400), 0.14, 1.0),
+    "UW": ("vowel", (300, 870, 2240), 0.13, 1.0),
+    "ER": ("vowel", (490, 1350, 1690), 0.12, 1.0),
+    "L": ("sonorant", (360, 1300, 2700), 0.07, 0.6),
+    "R": ("sonorant", (420, 1300, 1600), 0.07, 0.6),
+    "W": ("sonorant", (300, 610, 2200), 0.06, 0.6),
+    "Y": ("sonorant", (270, 2100, 3000), 0.06, 0.6),
+    "M": ("sonorant", (280, 900, 2200), 0.08, 0.4),
+    "N": ("sonorant", (280, 1700, 2600), 0.08, 0.4),
+    "NG": ("sonorant", (280, 2300, 2750), 0.08, 0.4),
+    "S": ("fricative", (4000, 7500), 0.10, 0.3),
+    "SH": ("fricative", (2000, 5000), 0.10, 0.3),
+    "F": ("fricative", (1000, 7000), 0.09, 0.12),
+    "TH": ("fricative", (1400, 7000), 0.08, 0.1),
+    "H": ("fricative", (500, 4000), 0.06, 0.1),
+    "Z": ("voiced_fricative", (4000, 7500), 0.09, 0.25),
+    "ZH": ("voiced_fricative", (2000, 5000), 0.09, 0.25),
+    "V": ("voiced_fricative", (1000, 7000), 0.08, 0.15),
+    "P": ("plosive", (500, 3000), 0.07, 0.3),
+    "T": ("plosive", (3000, 7000), 0.07, 0.3),
+    "K": ("plosive", (1500, 4000), 0.07, 0.3),
+    "B": ("plosive", (300, 2000), 0.06, 0.25),
+    "D": ("plosive", (2500, 6000), 0.06, 0.25),
+    "G": ("plosive", (1200, 3500), 0.06, 0.25),
+}
+
+# Letter sequences to phonemes, longest match first
+GRAPHEMES = {
+    "tch": ["T", "SH"], "sh": ["SH"], "ch": ["T", "SH"], "th": ["TH"], "ng": ["NG"], "ph": ["F"],
+    "wh": ["W"], "ck": ["K"], "qu": ["K", "W"], "ee": ["IY"], "ea": ["IY"], "oo": ["UW"],
+    "ou": ["AW"], "ow": ["OW"], "ai": ["EY"], "ay": ["EY"], "oa": ["OW"], "er": ["ER"],
+    "ir": ["ER"], "ur": ["ER"], "a": ["AE"], "b": ["B"], "c": ["K"], "d": ["D"], "e": ["EH"],
+    "f": ["F"], "g": ["G"], "h": ["H"], "i": ["IH"], "j": ["D", "ZH"], "k": ["K"], "l": ["L"],
+    "m": ["M"], "n": ["N"], "o": ["AA"], "p": ["P"], "q": ["K"], "r": ["R"], "s": ["S"],
+    "t": ["T"], "u": ["AH"], "v": ["V"], "w": ["W"], "x": ["K", "S"], "y": ["IY"], "z": ["Z"],
+}
+
+DIGITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d|[,;:]|[.!?]")
+
+def word_to_phonemes(word):
+    """
+    Convert a lowercase word to phonemes with simple spelling rules.
+
+    Args:
+        word (str): Lowercase ASCII word
+
+    Returns:
+        list: Phoneme names
+    """
+    # A final silent "e" is dropped, e.g. "make", "time"
+    if len(word) > 3 and word.endswith("e") and word[-2] not in "aeiouy":
+        word = word[:-1]
+
+    phonemes = []
+    i = 0
+    while i < len(word):
+        for size in (3, 2, 1):
+            chunk = word[i:i + size]
+            if len(chunk) == size and chunk in GRAPHEMES:
+                if chunk == "c" and word[i + 1:i + 2] in ("e", "i", "y"):
+                    phonemes.append("S")
+                elif chunk == "y" and i == 0:
+                    phonemes.append("Y")
+                else:
+                    phonemes.extend(GRAPHEMES[chunk])
+                i += size
+                break
+        else:
+            i += 1
+    return phonemes
+
+def text_to_phonemes(text):
+    """
+    Convert text to a sequence of phonemes and pauses.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        list: Phoneme names, with pauses given as float durations in seconds
+    """
+    sequence = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token.isdigit():
+            token = DIGITS[int(token)]
+        if token in ",;:":
+            sequence.append(COMMA_PAUSE)
+        elif token in ".!?":
+            sequence.append(SENTENCE_PAUSE)
+        else:
+            if sequence and not isinstance(sequence[-1], float):
+                sequence.append(WORD_PAUSE)
+            sequence.extend(word_to_phonemes(token))
+    return sequence
+
+def _envelope(length, ramp):
+    """
+    Raised-cosine attack and release envelope to avoid clicks between phonemes.
+    """
+    envelope = np.ones(length)
+    ramp = min(ramp, length // 2)
+    if ramp:
+        window = 0.5 - 0.5 * np.cos(np.linspace(0.0, np.pi, ramp))
+        envelope[:ramp] = window
+        envelope[-ramp:] = window[::-1]
+    return envelope
+
+def _voiced(formants, length, pitch):
+    """
+    Glottal pulse train shaped by formant resonances.
+
+    Each pulse excites a grain of damped sinusoids at the formant
+    frequencies; convolving the grain with the pulse train overlap-adds
+    one grain per pitch period.
+    """
+    t = np.arange(int(0.03 * SAMPLE_RATE))[:, None] / SAMPLE_RATE
+    grain = np.sum(FORMANT_AMPLITUDES * np.exp(-np.pi * FORMANT_BANDWIDTHS * t)
+                   * np.sin(2 * np.pi * np.asarray(formants, dtype=float) * t), axis=1)
+    pulses = np.zeros(length)
+    pulses[::max(1, int(SAMPLE_RATE / pitch))] = 1.0
+    signal = np.convolve(pulses, grain)[:length]
+    return signal / (np.max(np.abs(signal)) or 1.0)
+
+def _noise(band, length, rng):
+    """
+    White noise limited to a frequency band in the spectral domain.
+    """
+    spectrum = np.fft.rfft(rng.standard_normal(length))
+    frequencies = np.fft.rfftfreq(length, 1.0 / SAMPLE_RATE)
+    spectrum[(frequencies < band[0]) | (frequencies > band[1])] = 0.0
+    signal = np.fft.irfft(spectrum, length)
+    return signal / (np.std(signal) * 3.0 or 1.0)
+
+def _render_phoneme(name, pitch, rng, formant_scale=1.0):
+    kind, shape, duration, amplitude = PHONEMES[name]
+    length = int(duration * SAMPLE_RATE)
+    # A shorter vocal tract moves every resonance and noise band up by the same factor
+    shape = tuple(f * formant_scale for f in shape)
+
+    if kind in ("vowel", "sonorant"):
+        signal = _voiced(shape, length, pitch)
+    elif kind == "fricative":
+        signal = _noise(shape, length, rng)
+    elif kind == "voiced_fricative":
+        voicing = tuple(f * formant_scale for f in (250, 1500, 2500))
+        signal = 0.6 * _noise(shape, length, rng) + 0.4 * _voiced(voicing, length, pitch)
+    else:
+        # Plosives: silent closure followed by a short burst
+        closure = length // 2
+        signal = np.zeros(length)
+        signal[closure:] = _noise(shape, length - closure, rng)
+
+    return amplitude * signal * _envelope(length, int(0.01 * SAMPLE_RATE))
+
+class FormantBackend:
+    """
+    Fully local formant synthesizer built on NumPy.
+
+    Text is converted to phonemes with English spelling rules, voiced sounds
+    are rendered as formant-filtered pulse trains and unvoiced sounds as
+    band-limited noise. The voice is robotic but intelligible, and latency
+    depends only on CPU. Non-English text is spoken with English rules.
+    """
+    name = "formant"
+    audio_format = "pcm"
+    sample_rate = SAMPLE_RATE
+    sample_width = SAMPLE_WIDTH
+
+    def __init__(self, pitch_scale=1.0, formant_scale=1.0):
+        """
+        Args:
+            pitch_scale (float): Factor applied to the voice pitch (default: 1.0)
+            formant_scale (float): Factor applied to formants and noise bands, above 1.0 for
+                a smaller, brighter voice (default: 1.0)
+        """
+        self.pitch_scale = pitch_scale
+        self.formant_scale = formant_scale
+
+    def synthesize(self, text, language):
+        """
+        Synthesize one sentence.
+
+        Args:
+            text (str): Sentence to synthesize
+            language (str): Ignored, English spelling rules are used
+
+        Returns:
+            bytes: 16-bit little-endian mono PCM
+        """
+        sequence = text_to_phonemes(text)
+        phoneme_count = max(1, sum(1 for item in sequence if not isinstance(item, float)))
+
+        # Seeded so the same text always renders to the same audio
+        rng = np.random.default_rng(0)
+        pieces = []
+        spoken = 0
+        for item in sequence:
+            if isinstance(item, float):
+                pieces.append(np.zeros(int(item * SAMPLE_RATE)))
+                continue
+            pitch = self.pitch_scale * (START_PITCH + (END_PITCH - START_PITCH) * spoken / phoneme_count)
+            pieces.append(_render_phoneme(item, pitch, rng, self.formant_scale))
+            spoken += 1
+
+        if not pieces:
+            return b""
+        signal = np.concatenate(pieces)
+        peak = np.max(np.abs(signal)) or 1.0
+        return (signal * (0.8 * 32767 / peak)).astype("<i2").tobytes()
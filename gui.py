@@ -1,14 +1,61 @@
 import sys
 import os
+import threading
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                             QComboBox, QSpinBox, QDoubleSpinBox, QFileDialog,
                             QTabWidget, QTextEdit, QCheckBox, QProgressBar,
-                            QMessageBox, QFrame, QSizePolicy)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
+                            QMessageBox, QFrame, QSizePolicy, QListWidget, QListWidgetItem)
+from PyQt6.QtCore import Qt, QThread, QObject, QTimer, pyqtSignal, QSize
 from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QLinearGradient, QPainter
-from create_test_audio import create_test_audio
-from transcribe_audio import transcribe_audio
+from tts_engine import DEFAULT_TTS_BACKEND, output_extension
+from language_id import LANGUAGES, AUTO_LANGUAGE
+from job_queue import JobQueue, QueueFull, DONE, FAILED, CANCELLED
+
+# Local recognition backend for the STT tab (e.g. "vosk" or "whisper"), models are
+# loaded once into the shared model cache and reused by every job
+STT_BACKEND = os.getenv("STT_BACKEND") or None
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE") or None
+
+# Formats written when auto-saving a transcription, e.g. "txt,srt,json"
+STT_OUTPUT_FORMATS = tuple(os.getenv("STT_OUTPUT_FORMATS", "txt").split(","))
+
+# Synthesis backend for the TTS tab (e.g. "gtts", or "formant" for fully offline use)
+TTS_BACKEND = DEFAULT_TTS_BACKEND
+TTS_OUTPUT_FILE = "output/speech" + output_extension(TTS_BACKEND)
+
+# Load the engines and the STT model in the background once the window is painted, "0" disables it.
+# The engines are imported on first use either way, so the window never waits for them.
+GUI_WARM_UP = os.getenv("GUI_WARM_UP", "1") != "0"
+
+# Language choice on the STT tab that detects the language of each speech segment
+AUTO_DETECT = "Auto-detect"
+
+# Worker processes running STT and TTS jobs outside the GUI process, "0" runs them on threads in it
+GUI_PROCESS_WORKERS = int(os.getenv("GUI_PROCESS_WORKERS", "2"))
+
+# Finished jobs left in the job list; older rows are removed as more jobs finish
+GUI_FINISHED_JOBS = int(os.getenv("GUI_FINISHED_JOBS", "50"))
+
+# When set, print "first-paint" once the window is painted and quit; used by the startup benchmark
+GUI_STARTUP_PROBE = bool(os.getenv("GUI_STARTUP_PROBE"))
+
+def warm_up(language):
+    """
+    Import the speech engines and load the STT model ahead of the first job.
+
+    Runs on a background thread; failures are left for the first real job to report.
+    """
+    try:
+        import create_test_audio
+        import transcribe_audio
+        import live_capture
+        if STT_BACKEND:
+            from recognizers import get_backend
+            backend_options = {"model_size": STT_MODEL_SIZE} if STT_BACKEND == "whisper" and STT_MODEL_SIZE else {}
+            get_backend(STT_BACKEND, language=language, **backend_options)
+    except Exception:
+        pass
 
 class StyledButton(QPushButton):
     def __init__(self, text, parent=None):
@@ -120,30 +167,99 @@ class StyledLineEdit(QLineEdit):
             }
         """)
 
-class AudioWorker(QThread):
-    finished = pyqtSignal(str)
+def run_tts_job(progress=None, cancel_token=None, pool=None, **kwargs):
+    """
+    Synthesis job for the job queue, run in a worker process when a pool is given.
+
+    Returns:
+        str: Message shown when the job completes
+    """
+    kwargs.setdefault("backend", TTS_BACKEND)
+    if pool is not None:
+        result = pool.run("tts", progress, cancel_token, **kwargs)
+    else:
+        from create_test_audio import create_test_audio
+        result = create_test_audio(progress=progress, cancel_token=cancel_token, **kwargs)
+    return f"Audio file created successfully: {result}"
+
+def run_stt_job(progress=None, cancel_token=None, pool=None, **kwargs):
+    """
+    Transcription job for the job queue, run in a worker process when a pool is given.
+
+    Returns:
+        str: Message shown when the job completes
+    """
+    from transcript_output import speaker_prefix
+
+    if pool is not None:
+        result = pool.transcribe(progress=progress, cancel_token=cancel_token, **kwargs)
+    else:
+        from transcribe_audio import transcribe_audio
+        result = transcribe_audio(progress=progress, cancel_token=cancel_token, **kwargs)
+    text = result.text
+    if kwargs.get("diarize") or kwargs.get("language") == AUTO_LANGUAGE:
+        # One line per turn or segment, labelled with its detected language and speaker
+        text = ""
+        for segment in result.segments:
+            language = f"[{segment['language']}] " if "language" in segment else ""
+            text += f"\n{language}{speaker_prefix(segment)}{segment['text']}"
+    saved = "".join(f"\nSaved to {path}" for path in result.files.values())
+    return f"Transcription completed: {text}{saved}"
+
+class JobSignals(QObject):
+    """
+    Carries JobQueue callbacks from worker threads to the GUI thread.
+    """
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+
+class LiveTranscriber(QObject):
+    """
+    Bridges StreamingRecognizer callbacks from its worker thread to Qt signals.
+    """
+    partial = pyqtSignal(str)
+    final = pyqtSignal(str)
     error = pyqtSignal(str)
-    progress = pyqtSignal(int)
+    overrun = pyqtSignal(float)
 
-    def __init__(self, task_type, **kwargs):
+    def __init__(self, source, backend, language, **backend_options):
         super().__init__()
-        self.task_type = task_type
-        self.kwargs = kwargs
+        from live_capture import StreamingRecognizer
 
-    def run(self):
-        try:
-            if self.task_type == "tts":
-                result = create_test_audio(**self.kwargs)
-                self.finished.emit(f"Audio file created successfully: {result}")
-            elif self.task_type == "stt":
-                result = transcribe_audio(**self.kwargs)
-                self.finished.emit(f"Transcription completed: {result}")
-        except Exception as e:
-            self.error.emit(str(e))
+        self.recognizer = StreamingRecognizer(source, backend, language,
+                                              on_partial=self.partial.emit, on_final=self.final.emit,
+                                              on_error=lambda e: self.error.emit(str(e)),
+                                              on_overrun=self.overrun.emit, **backend_options)
+
+    def start(self):
+        self.recognizer.start()
+
+    def stop(self):
+        self.recognizer.stop()
+
+class SpeechPlayback(QObject):
+    """
+    Bridges SpeechPlayer completion from its playback thread to a Qt signal.
+    """
+    finished = pyqtSignal(object)
+
+    def __init__(self, pool=None):
+        super().__init__()
+        from tts_playback import SpeechPlayer
+
+        # With a pool, synthesis runs in a worker and the audio comes back through shared memory
+        self.player = SpeechPlayer(synthesize=pool.stream_synthesis) if pool is not None else SpeechPlayer()
+
+    def play(self, text, **kwargs):
+        self.player.play(text, on_finished=self.finished.emit, **kwargs)
+
+    def stop(self):
+        self.player.stop()
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.painted = False
         self.setWindowTitle("IntelliControl - Text to Speech & Speech Recognition")
         self.setMinimumSize(900, 700)
         self.setStyleSheet("""
@@ -225,6 +341,24 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         self.progress_bar.setMinimumHeight(10)
         layout.addWidget(self.progress_bar)
+        
+        # Background jobs; several can run at once and each can be cancelled
+        self.job_signals = JobSignals()
+        self.job_signals.progress.connect(self.on_job_progress)
+        self.job_signals.finished.connect(self.on_job_finished)
+        self.jobs = JobQueue(on_progress=self.job_signals.progress.emit, on_finished=self.job_signals.finished.emit)
+        self.job_items = {}
+        self.pool = None
+        
+        jobs_label = QLabel("Jobs:")
+        jobs_label.setStyleSheet("color: #212121; font-weight: bold;")
+        self.job_list = QListWidget()
+        self.job_list.setMaximumHeight(100)
+        cancel_button = StyledButton("Cancel Selected Job")
+        cancel_button.clicked.connect(self.cancel_selected_job)
+        layout.addWidget(jobs_label)
+        layout.addWidget(self.job_list)
+        layout.addWidget(cancel_button)
 
     def setup_tts_tab(self, tab):
         layout = QVBoxLayout(tab)
@@ -246,47 +380,9 @@ class MainWindow(QMainWindow):
         voice_label.setStyleSheet("color: #212121;")
         self.voice_combo = StyledComboBox()
         
-        # Use the same language dictionary as in the STT tab
-        self.tts_languages = {
-            "English (US)": "en-US",
-            "English (UK)": "en-GB",
-            "Spanish": "es-ES",
-            "French": "fr-FR",
-            "German": "de-DE",
-            "Italian": "it-IT",
-            "Portuguese": "pt-PT",
-            "Russian": "ru-RU",
-            "Japanese": "ja-JP",
-            "Korean": "ko-KR",
-            "Chinese (Simplified)": "zh-CN",
-            "Chinese (Traditional)": "zh-TW",
-            "Hindi": "hi-IN",
-            "Arabic": "ar-SA",
-            "Dutch": "nl-NL",
-            "Swedish": "sv-SE",
-            "Norwegian": "nb-NO",
-            "Danish": "da-DK",
-            "Finnish": "fi-FI",
-            "Greek": "el-GR",
-            "Turkish": "tr-TR",
-            "Polish": "pl-PL",
-            "Czech": "cs-CZ",
-            "Hungarian": "hu-HU",
-            "Romanian": "ro-RO",
-            "Bulgarian": "bg-BG",
-            "Ukrainian": "uk-UA",
-            "Vietnamese": "vi-VN",
-            "Thai": "th-TH",
-            "Indonesian": "id-ID",
-            "Telugu": "te-IN",
-            "Tamil": "ta-IN",
-            "Kannada": "kn-IN",
-            "Malayalam": "ml-IN",
-            "Bengali": "bn-IN"
-        }
         
         # Add languages to combo box
-        self.voice_combo.addItems(self.tts_languages.keys())
+        self.voice_combo.addItems(LANGUAGES.keys())
         
         voice_layout.addWidget(voice_label)
         voice_layout.addWidget(self.voice_combo)
@@ -320,7 +416,7 @@ class MainWindow(QMainWindow):
         output_label = QLabel("Output File:")
         output_label.setStyleSheet("color: #212121;")
         self.output_edit = StyledLineEdit()
-        self.output_edit.setText("output/speech.mp3")
+        self.output_edit.setText(TTS_OUTPUT_FILE)
         self.output_edit.setReadOnly(True)
         browse_button = StyledButton("Browse...")
         browse_button.clicked.connect(self.browse_output_file)
@@ -334,6 +430,12 @@ class MainWindow(QMainWindow):
         generate_button.clicked.connect(self.generate_audio)
         layout.addWidget(generate_button)
         
+        # Speak while synthesizing, without saving a file
+        self.playback = None
+        self.play_button = StyledButton("Play")
+        self.play_button.clicked.connect(self.toggle_playback)
+        layout.addWidget(self.play_button)
+        
         # Add some spacing
         layout.addStretch()
 
@@ -361,47 +463,12 @@ class MainWindow(QMainWindow):
         language_label.setStyleSheet("color: #212121;")
         self.language_combo = StyledComboBox()
         
-        # Comprehensive list of languages with their codes
-        self.languages = {
-            "English (US)": "en-US",
-            "English (UK)": "en-GB",
-            "Spanish": "es-ES",
-            "French": "fr-FR",
-            "German": "de-DE",
-            "Italian": "it-IT",
-            "Portuguese": "pt-PT",
-            "Russian": "ru-RU",
-            "Japanese": "ja-JP",
-            "Korean": "ko-KR",
-            "Chinese (Simplified)": "zh-CN",
-            "Chinese (Traditional)": "zh-TW",
-            "Hindi": "hi-IN",
-            "Arabic": "ar-SA",
-            "Dutch": "nl-NL",
-            "Swedish": "sv-SE",
-            "Norwegian": "nb-NO",
-            "Danish": "da-DK",
-            "Finnish": "fi-FI",
-            "Greek": "el-GR",
-            "Turkish": "tr-TR",
-            "Polish": "pl-PL",
-            "Czech": "cs-CZ",
-            "Hungarian": "hu-HU",
-            "Romanian": "ro-RO",
-            "Bulgarian": "bg-BG",
-            "Ukrainian": "uk-UA",
-            "Vietnamese": "vi-VN",
-            "Thai": "th-TH",
-            "Indonesian": "id-ID",
-            "Telugu": "te-IN",
-            "Tamil": "ta-IN",
-            "Kannada": "kn-IN",
-            "Malayalam": "ml-IN",
-            "Bengali": "bn-IN"
-        }
+        # Auto-detect identifies the language of each speech segment and routes it to that language's model
+        self.languages = {AUTO_DETECT: AUTO_LANGUAGE, **LANGUAGES}
         
         # Add languages to combo box
         self.language_combo.addItems(self.languages.keys())
+        self.language_combo.setCurrentText("English (US)")
         
         language_layout.addWidget(language_label)
         language_layout.addWidget(self.language_combo)
@@ -413,11 +480,23 @@ class MainWindow(QMainWindow):
         self.auto_save_check.setChecked(True)
         layout.addWidget(self.auto_save_check)
         
+        # Speaker diarization option
+        self.diarize_check = QCheckBox("Separate speakers")
+        self.diarize_check.setStyleSheet("color: #212121;")
+        layout.addWidget(self.diarize_check)
+        
         # Transcribe button
         transcribe_button = StyledButton("Transcribe Audio")
         transcribe_button.clicked.connect(self.transcribe_audio)
         layout.addWidget(transcribe_button)
         
+        # Live microphone transcription
+        self.live = None
+        self.live_lines = []
+        self.listen_button = StyledButton("Start Listening")
+        self.listen_button.clicked.connect(self.toggle_listening)
+        layout.addWidget(self.listen_button)
+        
         # Transcription result
         result_label = QLabel("Transcription Result:")
         result_label.setStyleSheet("color: #212121; font-weight: bold;")
@@ -427,12 +506,31 @@ class MainWindow(QMainWindow):
         layout.addWidget(result_label)
         layout.addWidget(self.result_text)
         
+        # Search over every saved transcript
+        search_label = QLabel("Search Transcripts:")
+        search_label.setStyleSheet("color: #212121; font-weight: bold;")
+        search_layout = QHBoxLayout()
+        self.search_edit = StyledLineEdit()
+        self.search_edit.setPlaceholderText('Words, "exact phrases" or prefix*')
+        self.search_edit.returnPressed.connect(self.search_transcripts)
+        search_button = StyledButton("Search")
+        search_button.clicked.connect(self.search_transcripts)
+        search_layout.addWidget(self.search_edit)
+        search_layout.addWidget(search_button)
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(120)
+        self.search_results.itemClicked.connect(self.show_search_hit)
+        layout.addWidget(search_label)
+        layout.addLayout(search_layout)
+        layout.addWidget(self.search_results)
+        
         # Add some spacing
         layout.addStretch()
 
     def browse_output_file(self):
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Audio File", "output/speech.mp3", "MP3 Files (*.mp3)"
+            self, "Save Audio File", TTS_OUTPUT_FILE,
+            "WAV Files (*.wav)" if TTS_OUTPUT_FILE.endswith(".wav") else "MP3 Files (*.mp3)"
         )
         if file_path:
             self.output_edit.setText(file_path)
@@ -454,21 +552,48 @@ class MainWindow(QMainWindow):
         
         # Get the language code from the selected language name
         language_name = self.voice_combo.currentText()
-        language_code = self.tts_languages.get(language_name, "en-US")
+        language_code = LANGUAGES.get(language_name, "en-US")
         
         rate = self.rate_spin.value()
         volume = self.volume_spin.value()
         
-        # Show progress
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.statusBar().showMessage("Generating audio...")
+        # Queue the job; progress is reported per synthesized sentence
+        self.start_job(run_tts_job, "tts", f"Speech to {os.path.basename(output_file)}", text=text,
+                       output_file=output_file, language=language_code, rate=rate, volume=volume,
+                       pool=self.process_pool())
+
+    def toggle_playback(self):
+        if self.playback is not None:
+            self.playback.stop()
+            return
         
-        # Create worker thread
-        self.worker = AudioWorker("tts", text=text, output_file=output_file, language=language_code)
-        self.worker.finished.connect(self.on_tts_complete)
-        self.worker.error.connect(self.on_error)
-        self.worker.start()
+        text = self.text_input.toPlainText()
+        if not text.strip():
+            QMessageBox.warning(self, "Error", "Please enter some text to convert to speech.")
+            return
+        
+        language_name = self.voice_combo.currentText()
+        language_code = LANGUAGES.get(language_name, "en-US")
+        
+        self.playback = SpeechPlayback(self.process_pool())
+        self.playback.finished.connect(self.on_playback_finished)
+        try:
+            self.playback.play(text, language=language_code, backend=TTS_BACKEND, rate=self.rate_spin.value(),
+                               volume=self.volume_spin.value())
+        except Exception as e:
+            self.playback = None
+            self.on_error(str(e))
+            return
+        
+        self.play_button.setText("Stop Playback")
+        self.statusBar().showMessage("Speaking...")
+
+    def on_playback_finished(self, error):
+        self.playback = None
+        self.play_button.setText("Play")
+        self.statusBar().showMessage("Ready")
+        if error is not None:
+            self.on_error(f"Error playing speech: {str(error)}")
 
     def transcribe_audio(self):
         input_file = self.input_edit.text()
@@ -481,33 +606,220 @@ class MainWindow(QMainWindow):
         language_code = self.languages.get(language_name, "en-US")
         auto_save = self.auto_save_check.isChecked()
         
-        # Show progress
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.statusBar().showMessage("Transcribing audio...")
+        # Queue the job; progress is reported per recognized chunk of audio
+        backend_options = {"model_size": STT_MODEL_SIZE} if STT_BACKEND == "whisper" and STT_MODEL_SIZE else {}
+        self.start_job(run_stt_job, "stt", f"Transcribe {os.path.basename(input_file)}", input_file=input_file,
+                       language=language_code, auto_save=auto_save, backend=STT_BACKEND,
+                       formats=STT_OUTPUT_FORMATS, diarize=self.diarize_check.isChecked(), pool=self.process_pool(),
+                       **backend_options)
+
+    def process_pool(self):
+        """
+        Worker processes for STT and TTS jobs, started on first use.
+
+        Returns:
+            AudioProcessPool: The pool, or None when jobs run in the GUI process
+        """
+        if self.pool is None and GUI_PROCESS_WORKERS > 0:
+            from process_pool import AudioProcessPool
+            self.pool = AudioProcessPool(GUI_PROCESS_WORKERS)
+        return self.pool
+
+    def start_job(self, func, kind, description, **kwargs):
+        try:
+            job = self.jobs.submit(func, kind, description, **kwargs)
+        except QueueFull as e:
+            QMessageBox.warning(self, "Busy", str(e))
+            return
         
-        # Create worker thread
-        self.worker = AudioWorker("stt", input_file=input_file, language=language_code, auto_save=auto_save)
-        self.worker.finished.connect(self.on_stt_complete)
-        self.worker.error.connect(self.on_error)
-        self.worker.start()
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self.job_list.addItem(item)
+        self.job_items[job.id] = item
+        self.update_job_item(job)
+        self.update_job_progress()
 
-    def on_tts_complete(self, message):
-        self.progress_bar.setValue(100)
+    def cancel_selected_job(self):
+        item = self.job_list.currentItem()
+        if item is not None and self.jobs.cancel(item.data(Qt.ItemDataRole.UserRole)):
+            self.statusBar().showMessage("Cancelling job...")
+
+    def update_job_item(self, job):
+        item = self.job_items.get(job.id)
+        if item is not None:
+            state = f"{job.progress:.0%}" if job.active else job.status
+            item.setText(f"#{job.id} {job.description} - {state}")
+
+    def update_job_progress(self):
+        # The bar shows the mean progress of every unfinished job
+        active = self.jobs.active_jobs()
+        self.progress_bar.setVisible(bool(active))
+        if active:
+            self.progress_bar.setValue(int(100 * sum(job.progress for job in active) / len(active)))
+            self.statusBar().showMessage(f"{len(active)} job(s) in progress...")
+
+    def on_job_progress(self, job):
+        self.update_job_item(job)
+        self.update_job_progress()
+
+    def on_job_finished(self, job):
+        self.update_job_item(job)
+        self.update_job_progress()
+        if job.status == DONE:
+            if job.kind == "tts":
+                self.on_tts_complete(job.result)
+            else:
+                self.on_stt_complete(job.result)
+        elif job.status == FAILED:
+            self.on_error(str(job.error))
+        elif job.status == CANCELLED and not self.jobs.active_jobs():
+            self.statusBar().showMessage(f"Job #{job.id} cancelled")
+        if job.status != DONE:
+            # Successful jobs are recorded by the engines themselves
+            from event_log import log_event
+            log_event("job", id=job.id, kind=job.kind, status=job.status, description=job.description,
+                      error=str(job.error) if job.error else None)
+        self.prune_finished_jobs()
+
+    def prune_finished_jobs(self):
+        # Finished rows already show the outcome, so the queue can drop those jobs and their results
+        self.jobs.forget_finished()
+        finished = [job_id for job_id in self.job_items if job_id not in self.jobs.jobs]
+        for job_id in finished[:max(0, len(finished) - GUI_FINISHED_JOBS)]:
+            item = self.job_items.pop(job_id)
+            self.job_list.takeItem(self.job_list.row(item))
+
+    def search_transcripts(self):
+        query = self.search_edit.text().strip()
+        self.search_results.clear()
+        if not query:
+            return
+        from transcript_index import transcript_index, format_hit
+
+        try:
+            hits = transcript_index.search(query)
+        except Exception as e:
+            self.on_error(f"Error searching transcripts: {str(e)}")
+            return
+        for hit in hits:
+            item = QListWidgetItem(format_hit(hit))
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            self.search_results.addItem(item)
+        self.statusBar().showMessage(f"{len(hits)} matching segments")
+
+    def show_search_hit(self, item):
+        from transcript_index import format_hit
+
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        self.result_text.setText(f"{format_hit(hit)}\n\nSource: {hit['source'] or '-'}\n\n{hit['text']}")
+
+    def toggle_listening(self):
+        if self.live is not None:
+            self.stop_listening()
+            return
+        
+        if not STT_BACKEND:
+            QMessageBox.warning(self, "Error", "Set STT_BACKEND to vosk or whisper to use live transcription.")
+            return
+        
+        language_name = self.language_combo.currentText()
+        language_code = self.languages.get(language_name, "en-US")
+        if language_code == AUTO_LANGUAGE:
+            QMessageBox.warning(self, "Error", "Auto-detect works on audio files. Select a language for live transcription.")
+            return
+        backend_options = {"model_size": STT_MODEL_SIZE} if STT_BACKEND == "whisper" and STT_MODEL_SIZE else {}
+        
+        self.live_lines = []
+        self.result_text.clear()
+        from live_capture import MicrophoneSource
+
+        self.live = LiveTranscriber(MicrophoneSource(), STT_BACKEND, language_code, **backend_options)
+        self.live.partial.connect(self.on_live_partial)
+        self.live.final.connect(self.on_live_final)
+        self.live.error.connect(self.on_live_error)
+        self.live.overrun.connect(self.on_live_overrun)
+        try:
+            self.live.start()
+        except Exception as e:
+            self.live = None
+            self.on_error(str(e))
+            return
+        
+        self.listen_button.setText("Stop Listening")
+        self.statusBar().showMessage("Listening...")
+
+    def stop_listening(self):
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
+        self.listen_button.setText("Start Listening")
         self.statusBar().showMessage("Ready")
+
+    def on_live_partial(self, text):
+        self.result_text.setText("\n".join(self.live_lines + [text + " ..."]))
+
+    def on_live_final(self, text):
+        self.live_lines.append(text)
+        self.result_text.setText("\n".join(self.live_lines))
+
+    def on_live_overrun(self, seconds):
+        self.statusBar().showMessage(f"Recognition fell behind, {seconds:.1f}s of audio was dropped")
+
+    def on_live_error(self, error_message):
+        self.stop_listening()
+        self.on_error(error_message)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.on_first_paint()
+
+    def on_first_paint(self):
+        if GUI_STARTUP_PROBE:
+            print("first-paint", flush=True)
+            QTimer.singleShot(0, QApplication.instance().quit)
+            return
+        if GUI_WARM_UP:
+            language_code = self.languages.get(self.language_combo.currentText(), "en-US")
+            pool = self.process_pool()
+            if pool is not None:
+                # Jobs run in the workers, so that is where the engines and model are needed
+                backend_options = {"model_size": STT_MODEL_SIZE} if STT_BACKEND == "whisper" and STT_MODEL_SIZE else {}
+                pool.warm_up(STT_BACKEND, language_code, **backend_options)
+            else:
+                threading.Thread(target=warm_up, args=(language_code,), daemon=True).start()
+
+    def closeEvent(self, event):
+        self.stop_listening()
+        if self.playback is not None:
+            self.playback.stop()
+        # Running jobs stop at their next chunk; do not block the window on them
+        self.jobs.shutdown(cancel=True, wait=False)
+        if self.pool is not None:
+            self.pool.shutdown(cancel=True, wait=False)
+        super().closeEvent(event)
+
+    def on_tts_complete(self, message):
+        if not self.jobs.active_jobs():
+            self.statusBar().showMessage("Ready")
         QMessageBox.information(self, "Success", message)
 
     def on_stt_complete(self, message):
-        self.progress_bar.setValue(100)
-        self.statusBar().showMessage("Ready")
+        if not self.jobs.active_jobs():
+            self.statusBar().showMessage("Ready")
         self.result_text.setText(message)
 
     def on_error(self, error_message):
-        self.progress_bar.setVisible(False)
+        self.update_job_progress()
         self.statusBar().showMessage("Error occurred")
         QMessageBox.critical(self, "Error", error_message)
 
 if __name__ == "__main__":
+    from metrics import start_exporters
+    from event_log import configure_logging
+    configure_logging()
+    start_exporters()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,200 @@
+import os
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs running at once and jobs accepted in total, overridable from the environment
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when its cancellation token has been triggered.
+    """
+
+class QueueFull(RuntimeError):
+    """
+    Raised when a job is submitted to a queue that already holds its limit.
+    """
+
+class CancellationToken:
+    """
+    Flag shared between a job and whoever may cancel it.
+
+    Engines call raise_if_cancelled() between chunks of work, so a
+    cancelled job stops at the next chunk boundary.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Job was cancelled")
+
+class Job:
+    """
+    One unit of work in a JobQueue, with its state, progress and outcome.
+    """
+
+    def __init__(self, job_id, kind, description):
+        self.id = job_id
+        self.kind = kind
+        self.description = description
+        self.token = CancellationToken()
+        self.status = QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def cancel(self):
+        """
+        Cancel the job; a queued job never starts and a running one stops at its next chunk.
+        """
+        self.token.cancel()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+class JobQueue:
+    """
+    Bounded queue of cancellable jobs run on a thread pool.
+
+    A job function is called with its keyword arguments plus progress and
+    cancel_token. It reports progress as progress(done, total) and calls
+    cancel_token.raise_if_cancelled() between chunks of work. Callbacks
+    run on the worker thread, so GUI callers must hand them to their own
+    thread, e.g. through Qt signals.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_jobs=JOB_QUEUE_SIZE, on_progress=None, on_finished=None):
+        """
+        Args:
+            workers (int): Jobs running at once (default: JOB_WORKERS)
+            max_jobs (int): Maximum queued and running jobs (default: JOB_QUEUE_SIZE)
+            on_progress (callable): Called with (job) when a job reports progress (default: None)
+            on_finished (callable): Called with (job) when a job is done, failed or cancelled (default: None)
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_jobs = max_jobs
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, func, kind="job", description="", **kwargs):
+        """
+        Queue a job.
+
+        Args:
+            func (callable): Job function, called with **kwargs, progress and cancel_token
+            kind (str): Job category, e.g. "tts" or "stt" (default: "job")
+            description (str): Human readable summary (default: "")
+            **kwargs: Arguments for func
+
+        Returns:
+            Job: The queued job
+        """
+        with self._lock:
+            if len(self.active_jobs()) >= self.max_jobs:
+                raise QueueFull(f"Too many jobs in progress (limit {self.max_jobs})")
+            job = Job(next(self._ids), kind, description)
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job, func, kwargs)
+
+        def on_done(future):
+            # A job cancelled before it started never reaches _run
+            if future.cancelled():
+                self._finish(job, CANCELLED)
+
+        job.future.add_done_callback(on_done)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job by id.
+
+        Returns:
+            bool: True if the job was still active
+        """
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def active_jobs(self):
+        """
+        Returns:
+            list: Jobs that are queued or running, oldest first
+        """
+        return [job for job in self.jobs.values() if job.active]
+
+    def forget_finished(self):
+        """
+        Drop finished jobs from the registry.
+        """
+        with self._lock:
+            self.jobs = {job_id: job for job_id, job in self.jobs.items() if job.active}
+
+    def shutdown(self, cancel=True, wait=True):
+        """
+        Stop the queue, cancelling active jobs unless asked to let them finish.
+
+        Args:
+            cancel (bool): Cancel queued and running jobs (default: True)
+            wait (bool): Block until running jobs have stopped (default: True)
+        """
+        if cancel:
+            for job in self.active_jobs():
+                job.cancel()
+        self.executor.shutdown(wait=wait)
+
+    def _run(self, job, func, kwargs):
+        if job.token.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+
+        def progress(done, total):
+            job.progress = min(1.0, done / total) if total else 0.0
+            if self.on_progress:
+                self.on_progress(job)
+
+        try:
+            job.result = func(progress=progress, cancel_token=job.token, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = e
+            self._finish(job, FAILED)
+        else:
+            job.progress = 1.0
+            self._finish(job, DONE)
+
+    def _finish(self, job, status):
+        with self._lock:
+            if not job.active:
+                return
+            job.status = status
+        if self.on_finished:
+            self.on_finished(job)
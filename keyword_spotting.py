@@ -0,0 +1,419 @@
+import os
+import time
+import wave
+import tempfile
+import threading
+import argparse
+import numpy as np
+from metrics import metrics
+from event_log import log_event
+from vad import VoiceActivityDetector, pcm_to_float
+from diarization import mfcc, FRAME_SECONDS, HOP_SECONDS, MFCC_COUNT
+from live_capture import RingBuffer, CAPTURE_WIDTH, BLOCK_MS, END_SILENCE, RING_SECONDS, PRE_ROLL
+from recognizers import BACKENDS
+
+# Average per-frame distance below which a template match counts as the keyword
+KEYWORD_THRESHOLD = float(os.getenv("KEYWORD_THRESHOLD", "4.5"))
+
+# Seconds of new audio between two matching passes
+SPOT_INTERVAL = 0.1
+
+# Audio searched for the keyword, relative to the longest template
+SEARCH_SCALE = 1.5
+
+# Seconds after a detection during which the same keyword is not reported again
+REFRACTORY_SECONDS = 1.0
+
+# Longest command recorded after the wake word, and how long to wait for it to start, in seconds
+COMMAND_SECONDS = 6.0
+COMMAND_START_SECONDS = 3.0
+
+def keyword_features(samples, sample_rate):
+    """
+    MFCC frames used for template matching.
+
+    The first coefficient only tracks loudness and is dropped, so a
+    keyword matches whether it is spoken softly or loudly.
+
+    Args:
+        samples (np.ndarray): float32 mono samples
+        sample_rate (int): Sample rate in Hz
+
+    Returns:
+        np.ndarray: (frames, MFCC_COUNT - 1) features
+    """
+    return mfcc(samples, sample_rate)[:, 1:]
+
+def match_template(template, window):
+    """
+    Best alignment of a template anywhere inside a window by dynamic time warping.
+
+    Each template frame advances by one and the window by zero, one or two
+    frames, so the keyword may be spoken up to twice as fast or as slow as
+    the template. Rows are computed one at a time, every row as a single
+    vectorized step.
+
+    Args:
+        template (np.ndarray): (m, d) template features
+        window (np.ndarray): (n, d) features to search
+
+    Returns:
+        float: Average distance per template frame along the best path, inf if the window is too short
+    """
+    if len(window) < (len(template) + 1) // 2:
+        return float("inf")
+    distances = np.sqrt(((template[:, None, :] - window[None, :, :]) ** 2).sum(axis=2))
+    cost = distances[0].copy()
+    for row in distances[1:]:
+        previous = cost.copy()
+        previous[1:] = np.minimum(previous[1:], cost[:-1])
+        previous[2:] = np.minimum(previous[2:], cost[:-2])
+        previous[0] = cost[0]
+        cost = row + previous
+    return float(cost.min()) / len(template)
+
+class KeywordSpotter:
+    """
+    Template-matching keyword spotter over streamed audio.
+
+    Keywords are enrolled from a few recordings each. While the voice
+    activity detector hears speech, incoming audio is turned into MFCC
+    frames block by block and the recent frames are matched against every
+    template; in silence only the detector runs.
+    """
+
+    def __init__(self, sample_rate, threshold=KEYWORD_THRESHOLD, interval=SPOT_INTERVAL):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio in Hz
+            threshold (float): Match distance below which a keyword is detected (default: KEYWORD_THRESHOLD)
+            interval (float): Seconds of new audio between matching passes (default: SPOT_INTERVAL)
+        """
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.templates = []
+        self.detector = VoiceActivityDetector(sample_rate)
+        self.frame_length = int(FRAME_SECONDS * sample_rate)
+        self.hop_length = int(HOP_SECONDS * sample_rate)
+        self.interval_frames = max(1, int(interval / HOP_SECONDS))
+        self.reset()
+
+    def enroll(self, keyword, samples):
+        """
+        Add a recording of a keyword as a template.
+
+        Leading and trailing silence is trimmed with voice activity
+        detection. Templates are speaker and microphone dependent, so they
+        are best recorded by the user on the device used for listening;
+        several recordings per keyword make detection more robust to how
+        it is spoken.
+
+        Args:
+            keyword (str): Keyword reported when the template matches
+            samples (np.ndarray): float32 mono samples at the spotter's sample rate
+        """
+        detector = VoiceActivityDetector(self.sample_rate)
+        speech = np.flatnonzero(detector.is_speech(samples))
+        if len(speech):
+            frame = detector.frame_length
+            samples = samples[speech[0] * frame:(speech[-1] + 1) * frame]
+        features = keyword_features(samples, self.sample_rate)
+        if len(features) < 2:
+            raise ValueError(f"Recording of '{keyword}' is too short to use as a template")
+        self.templates.append((keyword, features))
+        self.reset()
+
+    def enroll_file(self, keyword, path):
+        """
+        Add a 16-bit mono WAV recording of a keyword as a template.
+        """
+        with wave.open(path, "rb") as reader:
+            if reader.getnchannels() != 1 or reader.getframerate() != self.sample_rate:
+                raise ValueError(f"Keyword recordings must be mono at {self.sample_rate} Hz: {path}")
+            samples = pcm_to_float(reader.readframes(reader.getnframes()), reader.getsampwidth())
+        self.enroll(keyword, samples)
+
+    def enroll_speech(self, keyword, backend="formant"):
+        """
+        Add a template synthesized from the keyword's text with a local voice.
+
+        Useful for trying the spotter out; recordings of the real speaker
+        match far more reliably.
+        """
+        from tts_engine import create_tts_backend
+
+        engine = create_tts_backend(backend)
+        if engine.audio_format != "pcm" or engine.sample_rate != self.sample_rate:
+            raise ValueError(f"Backend '{engine.name}' does not produce PCM at {self.sample_rate} Hz")
+        self.enroll(keyword, pcm_to_float(engine.synthesize(keyword, "en"), engine.sample_width))
+
+    def reset(self):
+        """
+        Forget buffered audio, e.g. after a detection or a pause in the stream.
+        """
+        longest = max((len(features) for _, features in self.templates), default=0)
+        self.window_frames = int(longest * SEARCH_SCALE)
+        self.features = np.zeros((0, MFCC_COUNT - 1), dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._vad_pending = np.zeros(0, dtype=np.float32)
+        self._new_frames = 0
+        self._speech_frames = 0
+        self._blocked_until = 0
+        self.frames_seen = 0
+
+    def process(self, samples):
+        """
+        Feed audio and return the keywords detected in it.
+
+        Args:
+            samples (np.ndarray): float32 mono samples continuing the stream
+
+        Returns:
+            list: (keyword, score, seconds into the stream) per detection
+        """
+        if not self.templates:
+            raise ValueError("No keyword templates enrolled")
+
+        # Voice activity over whole VAD frames; frames since the last speech bound the search
+        self._vad_pending = np.concatenate((self._vad_pending, samples))
+        usable = len(self._vad_pending) // self.detector.frame_length * self.detector.frame_length
+        if usable:
+            if self.detector.is_speech(self._vad_pending[:usable]).any():
+                self._speech_frames = self.window_frames
+            self._vad_pending = self._vad_pending[usable:]
+
+        # Without speech only a short pre-roll is kept, so silence costs no more than the VAD
+        self._pending = np.concatenate((self._pending, samples))
+        if self._speech_frames <= 0:
+            dropped = max(0, len(self._pending) - int(PRE_ROLL * self.sample_rate)) // self.hop_length
+            self._pending = self._pending[dropped * self.hop_length:]
+            self.frames_seen += dropped
+            self.features = self.features[:0]
+            return []
+
+        # Features of every whole analysis frame, carrying the rest to the next block
+        if len(self._pending) < self.frame_length:
+            return []
+        count = 1 + (len(self._pending) - self.frame_length) // self.hop_length
+        features = keyword_features(self._pending[:(count - 1) * self.hop_length + self.frame_length],
+                                    self.sample_rate)
+        self._pending = self._pending[count * self.hop_length:]
+        self.features = np.concatenate((self.features, features))[-self.window_frames:]
+        self.frames_seen += count
+        self._new_frames += count
+
+        if self._new_frames < self.interval_frames:
+            return []
+        self._new_frames = 0
+        self._speech_frames -= self.interval_frames
+        if self.frames_seen < self._blocked_until:
+            return []
+
+        with metrics.span("keyword.match"):
+            scores = {}
+            for keyword, template in self.templates:
+                score = match_template(template, self.features)
+                scores[keyword] = min(score, scores.get(keyword, score))
+        keyword, score = min(scores.items(), key=lambda item: item[1])
+        if score >= self.threshold:
+            return []
+
+        metrics.increment("keyword.detections")
+        self._blocked_until = self.frames_seen + int(REFRACTORY_SECONDS / HOP_SECONDS)
+        self.features = self.features[:0]
+        return [(keyword, round(score, 3), self.frames_seen * HOP_SECONDS)]
+
+class WakeWordListener:
+    """
+    Always-on listener that runs full recognition only after a wake word.
+
+    The capture source feeds a ring buffer; a worker thread runs the
+    keyword spotter over it. Once a keyword is detected, the following
+    utterance is recorded until a pause and transcribed with
+    transcribe_audio(), after which spotting resumes.
+    """
+
+    def __init__(self, source, spotter, backend="vosk", language="en-US", on_wake=None, on_command=None,
+                 on_error=None, command_seconds=COMMAND_SECONDS, end_silence=END_SILENCE, **backend_options):
+        """
+        Args:
+            source (object): Capture source with start(callback), stop() and sample_rate
+            spotter (KeywordSpotter): Spotter with enrolled keywords, at the source's sample rate
+            backend (str or object): Recognition backend for commands (default: "vosk")
+            language (str): Language code for recognition (default: "en-US")
+            on_wake (callable): Called with (keyword, score) when a keyword is detected (default: None)
+            on_command (callable): Called with (keyword, text) once the command is transcribed (default: None)
+            on_error (callable): Called with the exception if the worker fails (default: None)
+            command_seconds (float): Longest command recorded (default: COMMAND_SECONDS)
+            end_silence (float): Silence that ends a command in seconds (default: END_SILENCE)
+            **backend_options: Options passed to the backend when created by name
+        """
+        if spotter.sample_rate != source.sample_rate:
+            raise ValueError("Spotter and capture source must use the same sample rate")
+        if backend is None:
+            # Without a backend transcribe_audio() only returns its placeholder text
+            raise ValueError("A recognition backend is required to transcribe commands")
+        self.source = source
+        self.spotter = spotter
+        self.backend = backend
+        self.backend_options = backend_options
+        self.language = language
+        self.on_wake = on_wake
+        self.on_command = on_command
+        self.on_error = on_error
+        self.command_seconds = command_seconds
+        self.end_silence = end_silence
+
+        self.sample_rate = source.sample_rate
+        self.ring = RingBuffer(int(RING_SECONDS * self.sample_rate))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start capturing and spotting in the background.
+
+        If the source cannot be opened, the worker is stopped again before the error is raised.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        try:
+            self.source.start(self.ring.write)
+        except Exception:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            raise
+
+    def stop(self):
+        """
+        Stop capturing and wait for the worker.
+        """
+        self.source.stop()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            self._listen()
+        except Exception as e:
+            self.source.stop()
+            if self.on_error:
+                self.on_error(e)
+
+    def _read(self):
+        # Samples waiting in the ring buffer, sleeping a block when there are none
+        samples = self.ring.read()
+        if not len(samples):
+            if self._stop.is_set():
+                return None
+            time.sleep(BLOCK_MS / 1000)
+        return pcm_to_float(samples.astype("<i2").tobytes(), CAPTURE_WIDTH)
+
+    def _listen(self):
+        while True:
+            samples = self._read()
+            if samples is None:
+                return
+            for keyword, score, _ in self.spotter.process(samples):
+                log_event("wake", keyword=keyword, score=score)
+                if self.on_wake:
+                    self.on_wake(keyword, score)
+                command = self._record_command()
+                if command is None:
+                    return
+                text = self._transcribe(command)
+                log_event("command", keyword=keyword, text=text)
+                if self.on_command:
+                    self.on_command(keyword, text)
+                # Audio captured while transcribing is not searched for the keyword again
+                self.ring.read()
+                self.spotter.reset()
+                break
+
+    def _record_command(self):
+        detector = VoiceActivityDetector(self.sample_rate)
+        frame_length = detector.frame_length
+        end_frames = int(self.end_silence / detector.frame_seconds)
+        start_frames = int(COMMAND_START_SECONDS / detector.frame_seconds)
+        max_frames = int(self.command_seconds / detector.frame_seconds)
+
+        pending = np.zeros(0, dtype=np.float32)
+        frames = []
+        heard = False
+        silent_frames = 0
+        while len(frames) < max_frames:
+            samples = self._read()
+            if samples is None:
+                return None
+            pending = np.concatenate((pending, samples))
+            usable = len(pending) // frame_length * frame_length
+            block = pending[:usable]
+            pending = pending[usable:]
+            for frame, is_speech in zip(block.reshape(-1, frame_length), detector.is_speech(block)):
+                frames.append(frame)
+                heard = heard or is_speech
+                silent_frames = 0 if is_speech else silent_frames + 1
+                if (heard and silent_frames >= end_frames) or (not heard and len(frames) >= start_frames):
+                    return np.concatenate(frames) if heard else np.zeros(0, dtype=np.float32)
+        return np.concatenate(frames)
+
+    def _transcribe(self, samples):
+        from transcribe_audio import transcribe_audio
+
+        if not len(samples):
+            return ""
+        # transcribe_audio() works on files; the command is only a few seconds long
+        handle, path = tempfile.mkstemp(suffix=".wav")
+        os.close(handle)
+        try:
+            with wave.open(path, "wb") as writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(CAPTURE_WIDTH)
+                writer.setframerate(self.sample_rate)
+                writer.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+            result = transcribe_audio(path, self.language, auto_save=False, backend=self.backend, use_cache=False,
+                                      **self.backend_options)
+            return result.text
+        finally:
+            os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Listen for a wake word, then transcribe the command that follows")
+    parser.add_argument("keyword", help="Wake word or phrase, e.g. \"hey control\"")
+    parser.add_argument("--template", action="append", default=[],
+                        help="16-bit mono WAV recording of the keyword, repeat for several "
+                             "(default: synthesize one with the formant voice)")
+    parser.add_argument("--input", default=None, help="WAV file to listen to instead of the microphone")
+    parser.add_argument("--backend", required=True, choices=sorted(BACKENDS),
+                        help="Local recognition backend for commands")
+    parser.add_argument("--language", default="en-US", help="Language code for recognition")
+    parser.add_argument("--threshold", type=float, default=KEYWORD_THRESHOLD, help="Match distance for a detection")
+    args = parser.parse_args()
+
+    from live_capture import MicrophoneSource, WavFileSource
+
+    source = WavFileSource(args.input) if args.input else MicrophoneSource()
+    spotter = KeywordSpotter(source.sample_rate, args.threshold)
+    for path in args.template:
+        spotter.enroll_file(args.keyword, path)
+    if not args.template:
+        spotter.enroll_speech(args.keyword)
+
+    listener = WakeWordListener(source, spotter, args.backend, args.language,
+                                on_wake=lambda keyword, score: print(f"Wake word '{keyword}' ({score})"),
+                                on_command=lambda keyword, text: print(f"Command: {text}"),
+                                on_error=lambda e: print(f"Error: {e}"))
+    listener.start()
+    try:
+        while not (args.input and source.finished.is_set()):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    listener.stop()
+
+if __name__ == "__main__":
+    main()
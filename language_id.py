@@ -0,0 +1,146 @@
+import os
+import threading
+from metrics import metrics
+
+# Languages offered for recognition and synthesis, display name to locale
+LANGUAGES = {
+    "English (US)": "en-US",
+    "English (UK)": "en-GB",
+    "Spanish": "es-ES",
+    "French": "fr-FR",
+    "German": "de-DE",
+    "Italian": "it-IT",
+    "Portuguese": "pt-PT",
+    "Russian": "ru-RU",
+    "Japanese": "ja-JP",
+    "Korean": "ko-KR",
+    "Chinese (Simplified)": "zh-CN",
+    "Chinese (Traditional)": "zh-TW",
+    "Hindi": "hi-IN",
+    "Arabic": "ar-SA",
+    "Dutch": "nl-NL",
+    "Swedish": "sv-SE",
+    "Norwegian": "nb-NO",
+    "Danish": "da-DK",
+    "Finnish": "fi-FI",
+    "Greek": "el-GR",
+    "Turkish": "tr-TR",
+    "Polish": "pl-PL",
+    "Czech": "cs-CZ",
+    "Hungarian": "hu-HU",
+    "Romanian": "ro-RO",
+    "Bulgarian": "bg-BG",
+    "Ukrainian": "uk-UA",
+    "Vietnamese": "vi-VN",
+    "Thai": "th-TH",
+    "Indonesian": "id-ID",
+    "Telugu": "te-IN",
+    "Tamil": "ta-IN",
+    "Kannada": "kn-IN",
+    "Malayalam": "ml-IN",
+    "Bengali": "bn-IN"
+}
+
+# Language argument that asks for the language of each speech segment to be identified
+AUTO_LANGUAGE = "auto"
+
+# Audio from the start of each speech segment used to identify its language, in seconds
+LANGUAGE_ID_SECONDS = float(os.getenv("LANGUAGE_ID_SECONDS", "3.0"))
+
+# Shorter segments keep the language of the segment before them, there is too little speech to tell
+LANGUAGE_ID_MIN_SECONDS = 1.0
+
+# Whisper model used for identification when the recognizer is not Whisper itself
+LANGUAGE_ID_MODEL = os.getenv("LANGUAGE_ID_MODEL", "tiny")
+
+# Identification codes that differ from the language part of our locales
+CODE_ALIASES = {"no": "nb"}
+
+def locale_for(code):
+    """
+    Locale for an identified language, e.g. "de" -> "de-DE".
+
+    Languages with several locales map to the first one in LANGUAGES.
+
+    Args:
+        code (str): ISO 639-1 language code
+
+    Returns:
+        str: Locale from LANGUAGES, or the code itself for languages not listed there
+    """
+    code = CODE_ALIASES.get(code, code)
+    for locale in LANGUAGES.values():
+        if locale.split("-")[0] == code:
+            return locale
+    return code
+
+# A language identifier is any class with this method:
+#   identify(samples, candidates)  16 kHz mono float32 samples -> (language code, probability),
+#                                  choosing among the languages of the candidate locales
+
+class WhisperLanguageIdentifier:
+    """
+    Spoken language identification with Whisper's language detection head.
+
+    Only the encoder and a single decoder step run, so identifying a few
+    seconds of speech costs a fraction of recognizing it, even with the
+    tiny model.
+    """
+
+    def __init__(self, model_size=LANGUAGE_ID_MODEL, model=None):
+        """
+        Args:
+            model_size (str): Whisper model size to load (default: LANGUAGE_ID_MODEL)
+            model (object): Already loaded Whisper model to use instead, e.g. the recognizer's (default: None)
+        """
+        if model is None:
+            import whisper
+            model = whisper.load_model(model_size)
+        self.model = model
+        self._lock = threading.Lock()
+
+    def identify(self, samples, candidates=None):
+        """
+        Identify the language spoken in a stretch of audio.
+
+        Args:
+            samples (np.ndarray): 16 kHz mono float32 samples
+            candidates (list): Locales whose languages to choose between (default: None, those in LANGUAGES)
+
+        Returns:
+            tuple: (language code, probability)
+        """
+        import whisper
+
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), n_mels=self.model.dims.n_mels)
+        with self._lock:
+            _, probabilities = self.model.detect_language(mel.to(self.model.device))
+        candidates = set(candidates or LANGUAGES.values())
+        probabilities = {code: p for code, p in probabilities.items() if locale_for(code) in candidates}
+        code = max(probabilities, key=probabilities.get)
+        return code, probabilities[code]
+
+# Identifiers shared by every caller in this process, by model size
+_identifiers = {}
+_identifiers_lock = threading.Lock()
+
+def get_identifier(backend=None, model_size=LANGUAGE_ID_MODEL):
+    """
+    Return a shared language identifier, loading its model on first use.
+
+    A Whisper recognizer lends its own model, so no second model is loaded.
+
+    Args:
+        backend (object): Recognition backend the audio will be routed to (default: None)
+        model_size (str): Whisper model size for other backends (default: LANGUAGE_ID_MODEL)
+
+    Returns:
+        object: Identifier exposing identify(samples, candidates)
+    """
+    if getattr(backend, "name", None) == "whisper":
+        return WhisperLanguageIdentifier(model=backend.model)
+    with _identifiers_lock:
+        if model_size not in _identifiers:
+            with metrics.span("stt.language_id_load"):
+                _identifiers[model_size] = WhisperLanguageIdentifier(model_size)
+        return _identifiers[model_size]
@@ -0,0 +1,432 @@
+import time
+import wave
+import threading
+import numpy as np
+import speech_recognition as sr
+from vad import VoiceActivityDetector, pcm_to_float
+from recognizers import get_backend
+
+# Capture format shared by every source
+CAPTURE_RATE = 16000
+CAPTURE_WIDTH = 2
+
+# Audio delivered per source callback, in milliseconds
+BLOCK_MS = 20
+
+# Ring buffer capacity in seconds of audio
+RING_SECONDS = 10.0
+
+# How often the worker emits a partial hypothesis, in seconds
+PARTIAL_INTERVAL = 0.5
+
+# Silence that ends an utterance, in seconds
+END_SILENCE = 0.6
+
+# Audio kept before detected speech so word onsets are not clipped, in seconds
+PRE_ROLL = 0.3
+
+# Longest utterance before it is finalized regardless of silence, in seconds
+MAX_UTTERANCE = 20.0
+
+# Trailing audio decoded for a partial hypothesis by backends without a streaming API, in seconds
+PARTIAL_WINDOW = 5.0
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer ring buffer of int16 samples.
+
+    The producer only advances the write counter and the consumer only the
+    read counter, so neither side takes a lock. When the consumer falls
+    behind, new samples that do not fit are dropped and counted.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Number of samples the buffer holds
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._written = 0
+        self._read = 0
+        self.dropped = 0
+
+    def available(self):
+        """
+        Returns:
+            int: Number of samples waiting to be read
+        """
+        return self._written - self._read
+
+    def write(self, samples):
+        """
+        Append samples, called from the producer only.
+
+        Args:
+            samples (np.ndarray): int16 samples
+
+        Returns:
+            int: Number of samples stored
+        """
+        free = self.capacity - (self._written - self._read)
+        if len(samples) > free:
+            self.dropped += len(samples) - free
+            samples = samples[:free]
+
+        start = self._written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+
+        # Publish only after the samples are in place
+        self._written += len(samples)
+        return len(samples)
+
+    def read(self, max_samples=None):
+        """
+        Remove and return waiting samples, called from the consumer only.
+
+        Args:
+            max_samples (int): Upper bound on the samples returned (default: None, all)
+
+        Returns:
+            np.ndarray: int16 samples
+        """
+        count = self._written - self._read
+        if max_samples is not None:
+            count = min(count, max_samples)
+
+        start = self._read % self.capacity
+        first = min(count, self.capacity - start)
+        samples = np.concatenate((self._data[start:start + first], self._data[:count - first]))
+
+        self._read += count
+        return samples
+
+class MicrophoneSource:
+    """
+    Live capture from the default input device through PyAudio.
+    """
+
+    def __init__(self, sample_rate=CAPTURE_RATE, block_ms=BLOCK_MS, device_index=None):
+        self.sample_rate = sample_rate
+        self.block_frames = int(sample_rate * block_ms / 1000)
+        self.device_index = device_index
+        self._audio = None
+        self._stream = None
+
+    def start(self, callback):
+        """
+        Start capturing, calling callback with int16 samples from the audio thread.
+        """
+        import pyaudio
+
+        def on_audio(in_data, frame_count, time_info, status):
+            callback(np.frombuffer(in_data, dtype="<i2"))
+            return None, pyaudio.paContinue
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                                        input_device_index=self.device_index,
+                                        frames_per_buffer=self.block_frames, stream_callback=on_audio)
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+class _ThreadedSource:
+    """
+    Base for sources that deliver pre-recorded samples from their own thread.
+    """
+
+    def __init__(self, sample_rate=CAPTURE_RATE, block_ms=BLOCK_MS, realtime=True):
+        self.sample_rate = sample_rate
+        self.block_frames = int(sample_rate * block_ms / 1000)
+        self.realtime = realtime
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        self._stop.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _blocks(self):
+        raise NotImplementedError
+
+    def _run(self, callback):
+        # Pace delivery like a sound card unless running as fast as possible
+        started = time.perf_counter()
+        delivered = 0
+        for block in self._blocks():
+            if self._stop.is_set():
+                break
+            callback(block)
+            delivered += len(block)
+            if self.realtime:
+                delay = started + delivered / self.sample_rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.finished.set()
+
+class WavFileSource(_ThreadedSource):
+    """
+    Capture stand-in that plays a 16-bit mono WAV file into the pipeline.
+    """
+
+    def __init__(self, path, block_ms=BLOCK_MS, realtime=True):
+        with wave.open(path, "rb") as reader:
+            if reader.getnchannels() != 1 or reader.getsampwidth() != CAPTURE_WIDTH:
+                raise ValueError("WAV capture source must be 16-bit mono")
+            sample_rate = reader.getframerate()
+        super().__init__(sample_rate, block_ms, realtime)
+        self.path = path
+
+    def _blocks(self):
+        with wave.open(self.path, "rb") as reader:
+            while True:
+                data = reader.readframes(self.block_frames)
+                if not data:
+                    break
+                yield np.frombuffer(data, dtype="<i2")
+
+class SyntheticSource(_ThreadedSource):
+    """
+    Capture stand-in that plays an in-memory signal into the pipeline.
+    """
+
+    def __init__(self, samples, sample_rate=CAPTURE_RATE, block_ms=BLOCK_MS, realtime=True):
+        """
+        Args:
+            samples (np.ndarray): float samples in [-1.0, 1.0] or int16 samples
+        """
+        super().__init__(sample_rate, block_ms, realtime)
+        samples = np.asarray(samples)
+        if samples.dtype != np.int16:
+            samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        self.samples = samples
+
+    def _blocks(self):
+        for start in range(0, len(self.samples), self.block_frames):
+            yield self.samples[start:start + self.block_frames]
+
+class WindowedStream:
+    """
+    Incremental recognition for backends without a streaming API.
+
+    A partial hypothesis decodes only the trailing window of the
+    utterance, so its cost does not grow with the utterance. The final
+    hypothesis decodes the whole utterance once.
+    """
+
+    def __init__(self, backend, language, sample_rate, window=PARTIAL_WINDOW):
+        """
+        Args:
+            backend (object): Backend with recognize(audio, language)
+            language (str): Language code for recognition
+            sample_rate (int): Sample rate of the accepted 16-bit mono PCM
+            window (float): Trailing audio decoded for a partial hypothesis in seconds (default: PARTIAL_WINDOW)
+        """
+        self.backend = backend
+        self.language = language
+        self.sample_rate = sample_rate
+        self.window_bytes = int(window * sample_rate) * CAPTURE_WIDTH
+        self._pieces = []
+
+    def accept(self, frame_data):
+        self._pieces.append(frame_data)
+
+    def partial(self):
+        tail = []
+        size = 0
+        for piece in reversed(self._pieces):
+            if size >= self.window_bytes:
+                break
+            tail.append(piece)
+            size += len(piece)
+        return self._recognize(b"".join(reversed(tail))[-self.window_bytes:])
+
+    def result(self):
+        return self._recognize(b"".join(self._pieces))
+
+    def _recognize(self, frame_data):
+        return self.backend.recognize(sr.AudioData(frame_data, self.sample_rate, CAPTURE_WIDTH), self.language)
+
+class StreamingRecognizer:
+    """
+    Incremental recognizer fed from a capture source through a ring buffer.
+
+    The source callback only copies samples into the ring buffer. A worker
+    thread drains it, tracks utterances with voice activity detection and
+    feeds each utterance to the backend's open_stream() as it is captured,
+    reporting partial hypotheses while it is in progress and a final
+    hypothesis once it ends. Backends without a streaming API go through a
+    WindowedStream instead. Audio dropped because the worker fell behind
+    is reported through on_overrun.
+    """
+
+    def __init__(self, source, backend="vosk", language="en-US", on_partial=None, on_final=None, on_error=None,
+                 partial_interval=PARTIAL_INTERVAL, end_silence=END_SILENCE, on_overrun=None, **backend_options):
+        """
+        Args:
+            source (object): Capture source with start(callback), stop() and sample_rate
+            backend (str or object): Backend name or instance with recognize(audio, language) (default: "vosk")
+            language (str): Language code for recognition (default: "en-US")
+            on_partial (callable): Called with the partial text of the current utterance (default: None)
+            on_final (callable): Called with the final text of a finished utterance (default: None)
+            on_error (callable): Called with the exception if the worker fails (default: None)
+            partial_interval (float): Seconds between partial hypotheses (default: PARTIAL_INTERVAL)
+            end_silence (float): Silence that ends an utterance in seconds (default: END_SILENCE)
+            on_overrun (callable): Called with the seconds of captured audio dropped since the last call, when the
+                ring buffer overflowed (default: None)
+            **backend_options: Options passed to the backend when created by name
+        """
+        self.source = source
+        self.backend = backend
+        self.backend_options = backend_options
+        self.language = language
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.on_error = on_error
+        self.on_overrun = on_overrun
+        self.partial_interval = partial_interval
+        self.end_silence = end_silence
+
+        self.sample_rate = source.sample_rate
+        self.ring = RingBuffer(int(RING_SECONDS * self.sample_rate))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start capturing and recognizing in the background.
+
+        If the source cannot be opened, the worker is stopped again before the error is raised.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        try:
+            self.source.start(self.ring.write)
+        except Exception:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            raise
+
+    def stop(self):
+        """
+        Stop capturing, finalize any utterance in progress and wait for the worker.
+        """
+        self.source.stop()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _open_stream(self):
+        open_stream = getattr(self.backend, "open_stream", None)
+        if open_stream is not None:
+            return open_stream(self.sample_rate)
+        return WindowedStream(self.backend, self.language, self.sample_rate)
+
+    def _run(self):
+        try:
+            # Load the model on the worker thread so the caller is never blocked by it
+            if isinstance(self.backend, str):
+                self.backend = get_backend(self.backend, language=self.language, **self.backend_options)
+            self._listen()
+        except Exception as e:
+            self.source.stop()
+            if self.on_error:
+                self.on_error(e)
+
+    def _listen(self):
+        detector = VoiceActivityDetector(self.sample_rate)
+        frame_length = detector.frame_length
+        end_frames = int(self.end_silence / detector.frame_seconds)
+        pre_roll_frames = int(PRE_ROLL / detector.frame_seconds)
+        max_frames = int(MAX_UTTERANCE / detector.frame_seconds)
+
+        pending = np.zeros(0, dtype=np.int16)
+        pre_roll = []
+        stream = None
+        fresh = []
+        utterance_frames = 0
+        silent_frames = 0
+        last_partial = 0.0
+        reported = 0
+
+        while True:
+            stopping = self._stop.is_set()
+            samples = self.ring.read()
+            if self.ring.dropped > reported:
+                if self.on_overrun:
+                    self.on_overrun((self.ring.dropped - reported) / self.sample_rate)
+                reported = self.ring.dropped
+            if not len(samples) and not stopping:
+                time.sleep(BLOCK_MS / 1000)
+                continue
+
+            # Work on whole frames, carrying the remainder to the next round
+            pending = np.concatenate((pending, samples))
+            usable = len(pending) // frame_length * frame_length
+            frames = pending[:usable].reshape(-1, frame_length)
+            pending = pending[usable:]
+
+            mask = detector.is_speech(pcm_to_float(frames.tobytes(), CAPTURE_WIDTH)) if len(frames) else []
+            for frame, is_speech in zip(frames, mask):
+                if stream is not None:
+                    fresh.append(frame)
+                    utterance_frames += 1
+                    silent_frames = 0 if is_speech else silent_frames + 1
+                    if silent_frames >= end_frames or utterance_frames >= max_frames:
+                        self._finish(stream, fresh)
+                        stream = None
+                        fresh = []
+                elif is_speech:
+                    stream = self._open_stream()
+                    fresh = pre_roll + [frame]
+                    utterance_frames = len(fresh)
+                    pre_roll = []
+                    silent_frames = 0
+                else:
+                    pre_roll = (pre_roll + [frame])[-pre_roll_frames:] if pre_roll_frames else []
+
+            # Only the audio captured since the last round is decoded
+            if stream is not None and fresh:
+                stream.accept(np.concatenate(fresh).astype("<i2").tobytes())
+                fresh = []
+
+            now = time.perf_counter()
+            if stream is not None and self.on_partial and now - last_partial >= self.partial_interval:
+                last_partial = now
+                text = stream.partial()
+                if text:
+                    self.on_partial(text)
+
+            if stopping and not self.ring.available():
+                if stream is not None:
+                    self._finish(stream, fresh)
+                break
+
+    def _finish(self, stream, fresh):
+        if fresh:
+            stream.accept(np.concatenate(fresh).astype("<i2").tobytes())
+        text = stream.result()
+        if text and self.on_final:
+            self.on_final(text)
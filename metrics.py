@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Whether spans are recorded, and where metrics are exported, overridable from the environment
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_SNAPSHOT_FILE = os.getenv("METRICS_SNAPSHOT_FILE") or None
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "10"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "intellicontrol"
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket that contains it.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+        target = q * total
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            return {"count": self.count, "sum": round(self.sum, 6),
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))}
+
+    def raw(self):
+        """
+        Unrounded bucket counts, sum and count, as accepted by merge().
+        """
+        with self._lock:
+            return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    def merge(self, raw):
+        """
+        Add the observations of another histogram with the same buckets.
+
+        Args:
+            raw (dict): Result of raw() on the other histogram
+        """
+        with self._lock:
+            self.counts = [mine + theirs for mine, theirs in zip(self.counts, raw["counts"])]
+            self.sum += raw["sum"]
+            self.count += raw["count"]
+
+class _Span:
+    """
+    Times the enclosed block into a histogram.
+    """
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class _NullSpan:
+    """
+    Span used while metrics are disabled; entering and leaving it does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class MetricsRegistry:
+    """
+    Process-wide store of stage latency histograms and counters.
+
+    Stages are named "<area>.<stage>", e.g. "stt.inference". While the
+    registry is disabled span() returns a shared no-op context manager
+    and increment() returns at once, so instrumented code pays only a
+    function call.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        """
+        Args:
+            enabled (bool): Record spans and counters (default: METRICS_ENABLED)
+        """
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage):
+        """
+        Context manager timing a block of work into the histogram for a stage.
+
+        Args:
+            stage (str): Stage name, e.g. "stt.decode"
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._histogram(stage))
+
+    def observe(self, stage, seconds):
+        """
+        Record a duration measured elsewhere.
+        """
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def increment(self, name, amount=1):
+        """
+        Add to a counter, e.g. of audio seconds processed.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def drain(self):
+        """
+        Take everything recorded since the last drain, leaving the registry empty.
+
+        Worker processes drain their registry after each task and send the
+        result to the parent, which adds it to its own with merge().
+
+        Returns:
+            dict: Raw histograms by stage and counters
+        """
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+            counters, self.counters = self.counters, {}
+        return {"stages": {stage: histogram.raw() for stage, histogram in histograms.items()}, "counters": counters}
+
+    def merge(self, drained):
+        """
+        Add metrics drained from another registry, e.g. in a worker process.
+
+        Args:
+            drained (dict): Result of drain()
+        """
+        if not self.enabled:
+            return
+        for stage, raw in drained["stages"].items():
+            self._histogram(stage).merge(raw)
+        with self._lock:
+            for name, amount in drained["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Timestamp, histograms with p50/p95 estimates, and counters
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        stages = {}
+        for stage, histogram in sorted(histograms.items()):
+            stages[stage] = histogram.snapshot()
+            stages[stage]["p50"] = histogram.quantile(0.5)
+            stages[stage]["p95"] = histogram.quantile(0.95)
+        return {"timestamp": time.time(), "stages": stages, "counters": counters}
+
+    def prometheus_text(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, histogram in sorted(histograms.items()):
+            data = histogram.snapshot()
+            running = 0
+            for bound, count in data["buckets"].items():
+                running += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {running}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {data["sum"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {data["count"]}')
+
+        for counter, value in sorted(counters.items()):
+            metric = f"{METRIC_PREFIX}_{counter.replace('.', '_')}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+# Registry shared by every caller in this process
+metrics = MetricsRegistry()
+
+class SnapshotWriter:
+    """
+    Appends a JSON snapshot of the registry to a file at a fixed interval.
+
+    A final snapshot is written when the writer stops or the process exits,
+    so short command line runs still leave a record.
+    """
+
+    def __init__(self, path, interval=METRICS_SNAPSHOT_SECONDS, registry=metrics):
+        """
+        Args:
+            path (str): JSON lines file to append to
+            interval (float): Seconds between snapshots (default: METRICS_SNAPSHOT_SECONDS)
+            registry (MetricsRegistry): Registry to snapshot (default: metrics)
+        """
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.write()
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.registry.snapshot()) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+def start_http_exporter(port, registry=metrics, host="127.0.0.1"):
+    """
+    Serve the registry at /metrics in Prometheus text format from a background thread.
+
+    Args:
+        port (int): Port to listen on
+        registry (MetricsRegistry): Registry to export (default: metrics)
+        host (str): Interface to listen on (default: "127.0.0.1")
+
+    Returns:
+        ThreadingHTTPServer: The running server, call shutdown() to stop it
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_exporters():
+    """
+    Start the exporters configured in the environment.
+
+    Sets up the JSON snapshot file when METRICS_SNAPSHOT_FILE is set and
+    the Prometheus endpoint when METRICS_PORT is set. Does nothing while
+    metrics are disabled.
+    """
+    if not metrics.enabled:
+        return
+    if METRICS_SNAPSHOT_FILE:
+        SnapshotWriter(METRICS_SNAPSHOT_FILE).start()
+    if METRICS_PORT:
+        start_http_exporter(METRICS_PORT)
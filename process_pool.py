@@ -0,0 +1,565 @@
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from job_queue import JobCancelled
+from metrics import metrics
+
+# Worker processes for STT and TTS work, each loading its models once
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Size of each worker's output audio ring, in MB
+SHARED_RING_MB = int(os.getenv("SHARED_RING_MB", "4"))
+
+# Audio moved through a ring per step, in bytes
+RING_BLOCK_BYTES = 64 * 1024
+
+# How long a blocked ring reader or writer sleeps before looking again, in seconds
+RING_POLL_SECONDS = 0.001
+
+# Header of a shared ring: bytes written, bytes read, both only ever increasing
+_HEADER_BYTES = 16
+
+# How often the pool looks for worker processes that died, e.g. killed while loading a model, in seconds
+WORKER_CHECK_SECONDS = 0.5
+
+class SharedRingBuffer:
+    """
+    Single-producer, single-consumer byte ring in shared memory.
+
+    The cross-process counterpart of live_capture.RingBuffer: the
+    producer only advances the write counter and the consumer only the
+    read counter, both stored in the shared block, so neither side locks
+    and no audio is pickled. Any bytes can be carried, PCM or encoded
+    audio alike.
+    """
+
+    def __init__(self, capacity, name=None):
+        """
+        Args:
+            capacity (int): Bytes the ring holds
+            name (str): Name of an existing ring to attach to, None to create one (default: None)
+        """
+        self.capacity = capacity
+        self.owner = name is None
+        # Workers are spawned by the creating process and share its resource tracker, which
+        # removes the block once, when the creator unlinks it or exits
+        self._memory = shared_memory.SharedMemory(name=name, create=self.owner, size=_HEADER_BYTES + capacity)
+        self._counters = np.ndarray(2, dtype=np.int64, buffer=self._memory.buf)
+        self._data = np.ndarray(capacity, dtype=np.uint8, buffer=self._memory.buf, offset=_HEADER_BYTES)
+        if self.owner:
+            self._counters[:] = 0
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def available(self):
+        """
+        Returns:
+            int: Bytes waiting to be read
+        """
+        return int(self._counters[0] - self._counters[1])
+
+    def write(self, data):
+        """
+        Append as much of data as fits, called from the producer only.
+
+        Args:
+            data (bytes-like): Bytes to append
+
+        Returns:
+            int: Number of bytes stored
+        """
+        written, read = int(self._counters[0]), int(self._counters[1])
+        data = np.frombuffer(data, dtype=np.uint8)[:self.capacity - (written - read)]
+
+        start = written % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._data[start:start + first] = data[:first]
+        self._data[:len(data) - first] = data[first:]
+
+        # Publish only after the bytes are in place
+        self._counters[0] = written + len(data)
+        return len(data)
+
+    def read(self, max_bytes=None):
+        """
+        Remove and return waiting bytes, called from the consumer only.
+
+        Args:
+            max_bytes (int): Upper bound on the bytes returned (default: None, all)
+
+        Returns:
+            bytes: Data read
+        """
+        written, read = int(self._counters[0]), int(self._counters[1])
+        count = written - read if max_bytes is None else min(written - read, max_bytes)
+
+        start = read % self.capacity
+        first = min(count, self.capacity - start)
+        data = self._data[start:start + first].tobytes() + self._data[:count - first].tobytes()
+
+        self._counters[1] = read + count
+        return data
+
+    def write_all(self, data, cancelled=None):
+        """
+        Write all of data, waiting for the consumer whenever the ring is full.
+
+        Args:
+            data (bytes-like): Bytes to append
+            cancelled (callable): Returns True to give up waiting (default: None)
+
+        Returns:
+            bool: True if everything was written
+        """
+        view = memoryview(data).cast("B")
+        while len(view):
+            if cancelled is not None and cancelled():
+                return False
+            stored = self.write(view[:RING_BLOCK_BYTES])
+            view = view[stored:]
+            if not stored:
+                time.sleep(RING_POLL_SECONDS)
+        return True
+
+    def read_exactly(self, count, cancelled=None):
+        """
+        Read exactly count bytes in blocks, waiting for the producer as needed.
+
+        Args:
+            count (int): Bytes to read
+            cancelled (callable): Returns True to give up waiting (default: None)
+
+        Yields:
+            bytes: Blocks of at most RING_BLOCK_BYTES
+        """
+        while count > 0:
+            data = self.read(min(count, RING_BLOCK_BYTES))
+            if not data:
+                if cancelled is not None and cancelled():
+                    return
+                time.sleep(RING_POLL_SECONDS)
+                continue
+            count -= len(data)
+            yield data
+
+    def discard(self):
+        """
+        Drop every waiting byte. Only safe while the consumer is not reading.
+        """
+        self._counters[1] = self._counters[0]
+
+    def close(self):
+        """
+        Detach from the ring, and remove it if this process created it.
+        """
+        self._counters = self._data = None
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+
+class _WorkerToken:
+    """
+    Cancellation token of a worker process, set by the pool through a shared event.
+    """
+
+    def __init__(self, event):
+        self._event = event
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Job was cancelled")
+
+def _run_stt(progress, cancel_token, outbox, send_audio, **kwargs):
+    from transcribe_audio import transcribe_audio
+
+    result = transcribe_audio(progress=progress, cancel_token=cancel_token, **kwargs)
+    return {"language": result.language, "segments": list(result.segments), "files": result.files}
+
+def _run_tts(progress, cancel_token, outbox, send_audio, **kwargs):
+    from create_test_audio import create_test_audio
+
+    return create_test_audio(progress=progress, cancel_token=cancel_token, **kwargs)
+
+def _run_tts_stream(progress, cancel_token, outbox, send_audio, text, **kwargs):
+    from tts_engine import stream_synthesis
+
+    for data in stream_synthesis(text, cancel_token=cancel_token, **kwargs):
+        # Blocks as they are written, so the reader can drain the ring while the rest is written
+        view = memoryview(data)
+        for start in range(0, len(view), RING_BLOCK_BYTES):
+            block = view[start:start + RING_BLOCK_BYTES]
+            if not outbox.write_all(block, lambda: cancel_token.cancelled):
+                cancel_token.raise_if_cancelled()
+            send_audio(len(block))
+    return None
+
+def _run_warm_up(progress, cancel_token, outbox, send_audio, backend=None, language="en-US",
+                 **backend_options):
+    import create_test_audio
+    import transcribe_audio
+    if backend:
+        from recognizers import get_backend
+        get_backend(backend, language=language, **backend_options)
+
+# Work a pool worker can run, by name
+OPERATIONS = {
+    "warm_up": _run_warm_up,
+    "stt": _run_stt,
+    "tts": _run_tts,
+    "tts_stream": _run_tts_stream,
+}
+
+def _worker_main(tasks, results, outbox_name, capacity, cancel_event, metrics_enabled=False):
+    """
+    Run tasks in a worker process until told to stop.
+
+    Messages sent back are tuples starting with the kind and the task id:
+    ("progress", id, done, total), ("audio", id, byte count),
+    ("metrics", id, drained metrics), ("result", id, value),
+    ("error", id, message) and ("cancelled", id). Metrics recorded by a
+    task are sent just before its final message.
+    """
+    metrics.enabled = metrics_enabled
+    outbox = SharedRingBuffer(capacity, outbox_name)
+    token = _WorkerToken(cancel_event)
+    try:
+        for task_id, operation, kwargs in iter(tasks.get, None):
+            def progress(done, total):
+                results.put(("progress", task_id, done, total))
+
+            def send_audio(count):
+                results.put(("audio", task_id, count))
+
+            try:
+                value = OPERATIONS[operation](progress, token, outbox, send_audio, **kwargs)
+                outcome = ("result", task_id, value)
+            except JobCancelled:
+                outcome = ("cancelled", task_id)
+            except Exception as e:
+                outcome = ("error", task_id, str(e))
+            if metrics.enabled:
+                results.put(("metrics", task_id, metrics.drain()))
+            results.put(outcome)
+    finally:
+        outbox.close()
+
+class PoolTask:
+    """
+    Work submitted to an AudioProcessPool, with a future for its result.
+    """
+
+    def __init__(self, task_id, operation, kwargs, on_progress=None, on_audio=None):
+        self.id = task_id
+        self.operation = operation
+        self.kwargs = kwargs
+        self.on_progress = on_progress
+        self.on_audio = on_audio
+        self.future = Future()
+        self.worker = None
+        self.finished = threading.Event()
+        self.cancelled = False
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+class _Worker:
+    """
+    Parent-side handle of a worker process and its ring.
+    """
+
+    def __init__(self, context, results, capacity):
+        self.tasks = context.Queue()
+        self.cancel_event = context.Event()
+        self.outbox = SharedRingBuffer(capacity)
+        self.process = context.Process(target=_worker_main, daemon=True,
+                                       args=(self.tasks, results, self.outbox.name, capacity, self.cancel_event,
+                                             metrics.enabled))
+        self.process.start()
+        self.task = None
+        self.died = None
+
+    def close(self):
+        """
+        Release the ring once the process has exited.
+        """
+        self.process.join()
+        self.outbox.close()
+
+class AudioProcessPool:
+    """
+    Pool of worker processes for STT and TTS work.
+
+    Inference runs outside the caller's process, so it neither holds the
+    caller's GIL nor stalls a GUI event loop, and several jobs use several
+    cores. Each worker has an output SharedRingBuffer: synthesized audio
+    crosses the process boundary through shared memory, while only small
+    control messages (task parameters, byte counts, progress and results)
+    travel over queues. Workers are started with "spawn", so they are
+    safe to create from a process running Qt or other threads. A worker
+    that dies, e.g. killed while loading a model, fails its task and is
+    replaced by a fresh one with a new ring.
+    """
+
+    def __init__(self, workers=PROCESS_WORKERS, ring_mb=SHARED_RING_MB):
+        """
+        Args:
+            workers (int): Number of worker processes (default: PROCESS_WORKERS)
+            ring_mb (int): Size of each worker's audio ring in MB (default: SHARED_RING_MB)
+        """
+        self._context = multiprocessing.get_context("spawn")
+        self._capacity = ring_mb * 1024 * 1024
+        self._results = self._context.Queue()
+        self._workers = [_Worker(self._context, self._results, self._capacity) for _ in range(max(1, workers))]
+        self._pending = deque()
+        self._tasks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, operation, on_progress=None, on_audio=None, **kwargs):
+        """
+        Queue work for the next free worker.
+
+        Args:
+            operation (str): One of OPERATIONS
+            on_progress (callable): Called with (done, total) as the worker reports progress (default: None)
+            on_audio (callable): Called with each block of audio the worker produces (default: None)
+            **kwargs: Arguments of the operation
+
+        Returns:
+            PoolTask: Task whose future resolves to the operation's result
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown pool operation: {operation}")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pool is shut down")
+            task = PoolTask(next(self._ids), operation, kwargs, on_progress, on_audio)
+            self._tasks[task.id] = task
+            self._pending.append(task)
+            self._start_pending()
+        return task
+
+    def cancel(self, task):
+        """
+        Cancel a task; a pending one never starts and a running one stops at its next chunk.
+
+        Finished tasks are left alone, so a late cancel never reaches the next task of the same worker.
+        """
+        with self._lock:
+            if task.finished.is_set() or task.future.done():
+                return
+            task.cancelled = True
+            if task in self._pending:
+                self._pending.remove(task)
+                self._tasks.pop(task.id, None)
+                task.future.set_exception(JobCancelled("Job was cancelled"))
+            elif task.worker is not None and task.worker.task is task:
+                task.worker.cancel_event.set()
+
+    def warm_up(self, backend=None, language="en-US", **backend_options):
+        """
+        Import the speech engines and load the STT model in every idle worker ahead of the first job.
+
+        Returns:
+            list: Submitted tasks; failures are left for the first real job to report
+        """
+        return [self.submit("warm_up", backend=backend, language=language, **backend_options)
+                for _ in self._workers]
+
+    def run(self, operation, progress=None, cancel_token=None, **kwargs):
+        """
+        Run an operation in a worker and wait for it, as a JobQueue job function.
+
+        Args:
+            operation (str): One of OPERATIONS
+            progress (callable): Called with (done, total) (default: None)
+            cancel_token (CancellationToken): Cancels the task in the worker when cancelled (default: None)
+            **kwargs: Arguments of the operation
+
+        Returns:
+            object: Result of the operation
+        """
+        task = self.submit(operation, on_progress=progress, **kwargs)
+        while True:
+            if cancel_token is not None and cancel_token.cancelled and not task.cancelled:
+                self.cancel(task)
+            try:
+                return task.result(timeout=0.1)
+            except TimeoutError:
+                continue
+
+    def transcribe(self, input_file, progress=None, cancel_token=None, **kwargs):
+        """
+        Transcribe an audio file in a worker; arguments are those of transcribe_audio().
+
+        Returns:
+            TranscriptionResult: Result rebuilt in this process
+        """
+        from transcript_output import TranscriptionResult
+
+        result = self.run("stt", progress, cancel_token, input_file=input_file, **kwargs)
+        return TranscriptionResult(result["language"], result["segments"], result["files"])
+
+    def stream_synthesis(self, text, language="en", backend=None, workers=None, speed=1.0, volume=1.0,
+                         cancel_token=None):
+        """
+        Synthesize text in a worker and yield the audio as it arrives.
+
+        A drop-in replacement for tts_engine.stream_synthesis(), e.g. for
+        SpeechPlayer, with synthesis running outside this process.
+
+        Yields:
+            bytes: Audio in the backend's format
+        """
+        blocks = queue.Queue()
+        kwargs = {"language": language, "backend": getattr(backend, "name", backend), "speed": speed,
+                  "volume": volume}
+        if workers is not None:
+            kwargs["workers"] = workers
+        task = self.submit("tts_stream", on_audio=blocks.put, text=text, **kwargs)
+        task.future.add_done_callback(lambda future: blocks.put(None))
+        try:
+            while True:
+                if cancel_token is not None and cancel_token.cancelled and not task.cancelled:
+                    self.cancel(task)
+                try:
+                    block = blocks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if block is None:
+                    break
+                yield block
+            task.result()
+        finally:
+            if not task.future.done():
+                self.cancel(task)
+
+    def shutdown(self, cancel=True, wait=True):
+        """
+        Stop the workers and release the shared memory.
+
+        Args:
+            cancel (bool): Cancel queued and running tasks (default: True)
+            wait (bool): Wait for the worker processes to exit; otherwise a thread releases the shared
+                memory once they have, before the interpreter exits (default: True)
+        """
+        with self._lock:
+            self._closed = True
+            tasks = list(self._tasks.values())
+        if cancel:
+            for task in tasks:
+                self.cancel(task)
+        for worker in self._workers:
+            worker.tasks.put(None)
+        if wait:
+            self._release()
+        else:
+            threading.Thread(target=self._release).start()
+
+    def _release(self):
+        for worker in self._workers:
+            worker.close()
+        self._results.put(None)
+        self._dispatcher.join()
+
+    def _start_pending(self):
+        # Called with the lock held: hand pending tasks to idle workers
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.task is not None:
+                continue
+            task = self._pending.popleft()
+            task.worker = worker
+            worker.task = task
+            worker.cancel_event.clear()
+            worker.tasks.put((task.id, task.operation, task.kwargs))
+
+    def _check_workers(self):
+        # A worker counts as dead once it has been gone for a whole check interval, by which time
+        # every message it sent before exiting has been dispatched
+        now = time.monotonic()
+        with self._lock:
+            for index, worker in enumerate(self._workers):
+                if worker.process.is_alive():
+                    continue
+                if worker.died is None:
+                    worker.died = now
+                    continue
+                if now - worker.died < WORKER_CHECK_SECONDS or self._closed:
+                    continue
+
+                task = worker.task
+                if task is not None:
+                    self._tasks.pop(task.id, None)
+                    task.finished.set()
+                    task.future.set_exception(
+                        Exception(f"Worker process exited with code {worker.process.exitcode}"))
+                worker.close()
+                self._workers[index] = _Worker(self._context, self._results, self._capacity)
+            self._start_pending()
+
+    def _dispatch_results(self):
+        next_check = time.monotonic() + WORKER_CHECK_SECONDS
+        while True:
+            try:
+                message = self._results.get(timeout=WORKER_CHECK_SECONDS)
+                if message is None:
+                    return
+                self._dispatch(message)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + WORKER_CHECK_SECONDS
+
+    def _dispatch(self, message):
+        kind, task_id = message[0], message[1]
+        if kind == "metrics":
+            # Counted even when the task itself is already gone
+            metrics.merge(message[2])
+            return
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+
+        if kind == "progress":
+            if task.on_progress:
+                task.on_progress(*message[2:])
+            return
+        if kind == "audio":
+            # Announced only after the worker has written the bytes
+            data = b"".join(task.worker.outbox.read_exactly(message[2]))
+            if task.on_audio:
+                task.on_audio(data)
+            return
+
+        # The worker is idle now, so audio a cancelled or failed task left behind can be dropped
+        task.finished.set()
+        task.worker.outbox.discard()
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            task.worker.task = None
+            self._start_pending()
+        if kind == "result":
+            task.future.set_result(message[2])
+        elif kind == "cancelled":
+            task.future.set_exception(JobCancelled("Job was cancelled"))
+        else:
+            task.future.set_exception(Exception(message[2]))
@@ -0,0 +1,391 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Recognizers expect 16 kHz, 16-bit PCM
+TARGET_SAMPLE_RATE = 16000
+TARGET_SAMPLE_WIDTH = 2
+
+# Limits of the shared model cache, overridable from the environment
+MODEL_CACHE_MAX_MODELS = int(os.getenv("MODEL_CACHE_MAX_MODELS", "4"))
+MODEL_CACHE_MAX_MB = int(os.getenv("MODEL_CACHE_MAX_MB", "4096"))
+
+# Rough resident size of a Vosk model when it cannot be measured on disk
+VOSK_DEFAULT_MODEL_BYTES = 300 * 1024 * 1024
+
+# Vosk model language ids by locale, for languages Vosk publishes a model for; Vosk has
+# no British English model, so en-GB uses the US one
+VOSK_MODEL_IDS = {
+    "en-US": "en-us",
+    "en-GB": "en-us",
+    "en-IN": "en-in",
+    "es-ES": "es",
+    "fr-FR": "fr",
+    "de-DE": "de",
+    "it-IT": "it",
+    "pt-PT": "pt",
+    "ru-RU": "ru",
+    "ja-JP": "ja",
+    "ko-KR": "ko",
+    "zh-CN": "cn",
+    "hi-IN": "hi",
+    "ar-SA": "ar",
+    "nl-NL": "nl",
+    "sv-SE": "sv",
+    "el-GR": "el-gr",
+    "tr-TR": "tr",
+    "pl-PL": "pl",
+    "cs-CZ": "cs",
+    "uk-UA": "uk",
+    "vi-VN": "vn",
+    "te-IN": "te",
+}
+
+def _directory_size(path):
+    """
+    Total size in bytes of the files below a directory.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+class VoskBackend:
+    """
+    Offline recognition backend built on Vosk (Kaldi).
+    """
+    name = "vosk"
+    language_specific = True
+    default_model = None
+    # Locales a model exists for, None for every language
+    languages = tuple(VOSK_MODEL_IDS)
+
+    def __init__(self, language="en-US", model_path=None):
+        """
+        Load the Vosk model for a language.
+
+        Args:
+            language (str): Locale used to pick a model, one of VOSK_MODEL_IDS (default: "en-US")
+            model_path (str): Path to an unpacked Vosk model, overrides language (default: None)
+        """
+        if not model_path and language not in VOSK_MODEL_IDS:
+            raise ValueError(f"No Vosk model for {language}; set a model_path or use the whisper backend")
+        from vosk import Model, SetLogLevel
+
+        SetLogLevel(-1)
+        self.language = language
+        self.model_name = model_path
+        self.model = Model(model_path) if model_path else Model(lang=VOSK_MODEL_IDS[language])
+        self.memory_bytes = _directory_size(model_path) if model_path else VOSK_DEFAULT_MODEL_BYTES
+
+    def recognize(self, audio, language=None):
+        """
+        Recognize a single window of audio.
+
+        Args:
+            audio (sr.AudioData): Audio window to recognize
+            language (str): Ignored, the model is already language specific
+
+        Returns:
+            str: Recognized text
+        """
+        return " ".join(word["word"] for word in self.recognize_words(audio, language))
+
+    def recognize_words(self, audio, language=None):
+        """
+        Recognize a single window of audio with word timings.
+
+        Args:
+            audio (sr.AudioData): Audio window to recognize
+            language (str): Ignored, the model is already language specific
+
+        Returns:
+            list: Word dicts with "word", "start" and "end" in seconds from the window start, and "confidence"
+        """
+        from vosk import KaldiRecognizer
+
+        recognizer = KaldiRecognizer(self.model, TARGET_SAMPLE_RATE)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=TARGET_SAMPLE_RATE,
+                                                     convert_width=TARGET_SAMPLE_WIDTH))
+        result = json.loads(recognizer.FinalResult())
+        return [{"word": w["word"], "start": w["start"], "end": w["end"], "confidence": w.get("conf")}
+                for w in result.get("result", [])]
+
+    def open_stream(self, sample_rate=TARGET_SAMPLE_RATE):
+        """
+        Start incremental recognition of one utterance.
+
+        Args:
+            sample_rate (int): Sample rate of the 16-bit mono PCM that will be fed (default: TARGET_SAMPLE_RATE)
+
+        Returns:
+            VoskStream: Stream accepting audio as it is captured
+        """
+        return VoskStream(self.model, sample_rate)
+
+class VoskStream:
+    """
+    Incremental Vosk recognition of one utterance.
+
+    Audio is decoded as it is accepted, so asking for the partial or final
+    text costs the same however long the utterance has grown.
+    """
+
+    def __init__(self, model, sample_rate=TARGET_SAMPLE_RATE):
+        from vosk import KaldiRecognizer
+
+        self._recognizer = KaldiRecognizer(model, sample_rate)
+        self._finished = []
+
+    def accept(self, frame_data):
+        """
+        Decode the next piece of 16-bit mono PCM.
+        """
+        if self._recognizer.AcceptWaveform(frame_data):
+            # Vosk closed a stretch of speech at a pause of its own
+            self._finished.append(json.loads(self._recognizer.Result()).get("text", ""))
+
+    def partial(self):
+        """
+        Returns:
+            str: Text of the utterance so far
+        """
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(text for text in self._finished + [partial] if text)
+
+    def result(self):
+        """
+        Returns:
+            str: Final text of the utterance
+        """
+        final = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return " ".join(text for text in self._finished + [final] if text)
+
+class WhisperBackend:
+    """
+    Offline recognition backend built on OpenAI Whisper.
+    """
+    name = "whisper"
+    language_specific = False
+    default_model = "base"
+    languages = None
+
+    def __init__(self, language="en-US", model_size="base"):
+        """
+        Load the Whisper model weights.
+
+        Args:
+            language (str): Default language code for recognition (default: "en-US")
+            model_size (str): Whisper model size, e.g. "tiny", "base", "small" (default: "base")
+        """
+        import whisper
+
+        self.language = language
+        self.model_name = model_size
+        self.model = whisper.load_model(model_size)
+        self.memory_bytes = sum(p.numel() * p.element_size() for p in self.model.parameters())
+
+    def recognize(self, audio, language=None):
+        """
+        Recognize a single window of audio.
+
+        Args:
+            audio (sr.AudioData): Audio window to recognize
+            language (str): Language code, falls back to the backend default (default: None)
+
+        Returns:
+            str: Recognized text
+        """
+        return self._transcribe(audio, language)["text"].strip()
+
+    def recognize_words(self, audio, language=None):
+        """
+        Recognize a single window of audio with word timings.
+
+        Args:
+            audio (sr.AudioData): Audio window to recognize
+            language (str): Language code, falls back to the backend default (default: None)
+
+        Returns:
+            list: Word dicts with "word", "start" and "end" in seconds from the window start, and "confidence"
+        """
+        result = self._transcribe(audio, language, word_timestamps=True)
+        return [{"word": w["word"].strip(), "start": w["start"], "end": w["end"], "confidence": w.get("probability")}
+                for segment in result["segments"] for w in segment.get("words", []) if w["word"].strip()]
+
+    def _transcribe(self, audio, language, **options):
+        import numpy as np
+
+        raw = audio.get_raw_data(convert_rate=TARGET_SAMPLE_RATE, convert_width=TARGET_SAMPLE_WIDTH)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        lang_code = (language or self.language).split('-')[0]
+        return self.model.transcribe(samples, language=lang_code, fp16=False, **options)
+
+# Available recognition backends by name
+BACKENDS = {
+    VoskBackend.name: VoskBackend,
+    WhisperBackend.name: WhisperBackend,
+}
+
+def backend_identity(backend, **options):
+    """
+    Name and model of a recognition backend, without loading it.
+
+    Args:
+        backend (str or object): Backend name or instance
+        **options: Backend specific options such as model_size or model_path
+
+    Returns:
+        tuple: (backend name, model or None when the language picks the model)
+    """
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown recognition backend: {backend}")
+        model = options.get("model_size") or options.get("model_path") or BACKENDS[backend].default_model
+        return backend, model
+    return getattr(backend, "name", type(backend).__name__), getattr(backend, "model_name", None)
+
+def create_backend(name, language="en-US", **options):
+    """
+    Create a new recognition backend by name, loading its model.
+
+    Prefer get_backend(), which shares loaded models across callers.
+
+    Args:
+        name (str): Backend name, one of BACKENDS
+        language (str): Language code for the backend (default: "en-US")
+        **options: Backend specific options such as model_size or model_path
+
+    Returns:
+        object: Backend instance exposing recognize(audio, language)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognition backend: {name}")
+    return BACKENDS[name](language=language, **options)
+
+class ModelCache:
+    """
+    Process-wide registry of loaded recognition backends.
+
+    Backends are created lazily on first use and keyed by (backend, model,
+    language). Language is left out of the key for multilingual backends so
+    one model serves every language. The least recently used backends are
+    evicted once the model count or estimated memory exceeds the limits.
+    Models load outside the registry lock, so a slow load only holds up
+    callers waiting for that same model.
+    """
+
+    def __init__(self, max_models=MODEL_CACHE_MAX_MODELS, max_bytes=MODEL_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            max_models (int): Maximum number of loaded backends (default: MODEL_CACHE_MAX_MODELS)
+            max_bytes (int): Maximum estimated model memory in bytes (default: MODEL_CACHE_MAX_MB)
+        """
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._backends = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name, language="en-US", **options):
+        """
+        Build the cache key for a backend request.
+
+        Returns:
+            tuple: (backend name, model, language)
+        """
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown recognition backend: {name}")
+        model = options.get("model_size") or options.get("model_path")
+        if not BACKENDS[name].language_specific:
+            language = None
+        return name, model, language
+
+    def get(self, name, language="en-US", **options):
+        """
+        Return a loaded backend, creating it on first use.
+
+        Args:
+            name (str): Backend name, one of BACKENDS
+            language (str): Language code for the backend (default: "en-US")
+            **options: Backend specific options such as model_size or model_path
+
+        Returns:
+            object: Backend instance exposing recognize(audio, language)
+        """
+        key = self.key(name, language, **options)
+        with self._lock:
+            if key in self._backends:
+                self._backends.move_to_end(key)
+                return self._backends[key]
+
+            # The first caller loads the model; concurrent callers for the same key wait on its future
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = Future()
+                loader = True
+            else:
+                loader = False
+        if not loader:
+            return loading.result()
+
+        try:
+            backend = create_backend(name, language=language, **options)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._backends[key] = backend
+            self._evict()
+        loading.set_result(backend)
+        return backend
+
+    def memory_bytes(self):
+        """
+        Returns:
+            int: Estimated memory held by the loaded backends
+        """
+        return sum(getattr(b, "memory_bytes", 0) for b in self._backends.values())
+
+    def clear(self):
+        """
+        Drop every loaded backend.
+        """
+        with self._lock:
+            self._backends.clear()
+
+    def __len__(self):
+        return len(self._backends)
+
+    def __contains__(self, key):
+        return key in self._backends
+
+    def _evict(self):
+        # The most recently added backend is always kept, even if it alone exceeds the cap
+        while len(self._backends) > 1 and (len(self._backends) > self.max_models
+                                           or self.memory_bytes() > self.max_bytes):
+            self._backends.popitem(last=False)
+
+# Cache shared by every caller in this process
+model_cache = ModelCache()
+
+def get_backend(name, language="en-US", **options):
+    """
+    Return a shared recognition backend from the process-wide model cache.
+
+    Args:
+        name (str): Backend name, one of BACKENDS
+        language (str): Language code for the backend (default: "en-US")
+        **options: Backend specific options such as model_size or model_path
+
+    Returns:
+        object: Backend instance exposing recognize(audio, language)
+    """
+    return model_cache.get(name, language, **options)
@@ -0,0 +1,244 @@
+import os
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import speech_recognition as sr
+import websockets
+from vad import SpeechStream
+from recognizers import get_backend
+from metrics import start_exporters
+from event_log import configure_logging
+from create_test_audio import create_test_audio
+
+logger = logging.getLogger("IntelliControl")
+
+# Listening address and limits, overridable from the environment
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+SERVER_MAX_JOBS = int(os.getenv("SERVER_MAX_JOBS", str(os.cpu_count() or 4)))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "64"))
+
+# Recognition backend used when a client does not ask for one
+STT_BACKEND = os.getenv("STT_BACKEND") or None
+
+# Whisper model size and Vosk model directory, server settings that clients cannot override
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE") or None
+STT_MODEL_PATH = os.getenv("STT_MODEL_PATH") or None
+
+# Whisper model sizes clients may ask for with "model_size", comma separated; none by default
+SERVER_MODEL_SIZES = tuple(size for size in os.getenv("SERVER_MODEL_SIZES", "").split(",") if size)
+
+# Speech segments waiting for recognition per session; when full the server
+# stops reading from the socket, which pushes back on the client
+SEGMENT_QUEUE_SIZE = 4
+
+# Largest accepted message and size of the audio chunks sent back, in bytes
+MAX_MESSAGE_BYTES = 1024 * 1024
+SEND_CHUNK_BYTES = 64 * 1024
+
+def _request_path(websocket):
+    """
+    Path requested by a client, for both the new and legacy websockets APIs.
+    """
+    request = getattr(websocket, "request", None)
+    path = request.path if request is not None else websocket.path
+    return path.split("?")[0]
+
+def session_backend_options(backend_name, config):
+    """
+    Model options for a transcription session.
+
+    Clients never name model files, and only pick model sizes the server
+    allows, so a session can neither load arbitrary paths nor evict the
+    shared model cache with models nobody configured.
+
+    Args:
+        backend_name (str): Recognition backend of the session
+        config (dict): Session config sent by the client
+
+    Returns:
+        dict: Options for get_backend()
+    """
+    if "model_path" in config:
+        raise ValueError("The model path is a server setting, set STT_MODEL_PATH")
+    model_size = config.get("model_size")
+    if model_size is not None and model_size not in SERVER_MODEL_SIZES:
+        raise ValueError(f"Model size not allowed: {model_size}")
+
+    if backend_name == "whisper" and (model_size or STT_MODEL_SIZE):
+        return {"model_size": model_size or STT_MODEL_SIZE}
+    if backend_name == "vosk" and STT_MODEL_PATH:
+        return {"model_path": STT_MODEL_PATH}
+    return {}
+
+class SpeechServer:
+    """
+    WebSocket server exposing streaming transcription and synthesis.
+
+    Endpoints:
+        /transcribe  Send a JSON config, then binary PCM chunks, then {"type": "end"}.
+                     Receives {"type": "partial"} messages per speech segment and a
+                     {"type": "final"} message with the whole transcript.
+        /synthesize  Send {"text": ..., "language": ...}. Receives an {"type": "audio"}
+                     header, the audio file as binary chunks, then {"type": "done"}.
+
+    CPU-bound work runs in a thread pool, and at most max_jobs jobs run at once
+    across all sessions.
+    """
+
+    def __init__(self, max_jobs=SERVER_MAX_JOBS, max_sessions=SERVER_MAX_SESSIONS):
+        """
+        Args:
+            max_jobs (int): Maximum concurrent recognition or synthesis jobs (default: SERVER_MAX_JOBS)
+            max_sessions (int): Maximum open client sessions (default: SERVER_MAX_SESSIONS)
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs)
+        self.jobs = asyncio.Semaphore(max_jobs)
+        self.max_sessions = max_sessions
+        self.sessions = 0
+
+    async def run_job(self, func, *args, **kwargs):
+        """
+        Run a blocking function in the executor, within the job limit.
+        """
+        async with self.jobs:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def handler(self, websocket):
+        path = _request_path(websocket)
+        if self.sessions >= self.max_sessions:
+            await websocket.close(1013, "Server busy, try again later")
+            return
+
+        self.sessions += 1
+        try:
+            if path == "/transcribe":
+                await self.transcribe(websocket)
+            elif path == "/synthesize":
+                await self.synthesize(websocket)
+            else:
+                await websocket.close(1008, f"Unknown endpoint: {path}")
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.exception("Error handling %s", path)
+            await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+        finally:
+            self.sessions -= 1
+
+    async def transcribe(self, websocket):
+        config = json.loads(await websocket.recv())
+        language = config.get("language", "en-US")
+        sample_rate = int(config.get("sample_rate", 16000))
+        sample_width = int(config.get("sample_width", 2))
+        backend_name = config.get("backend") or STT_BACKEND
+        if not backend_name:
+            raise ValueError("No recognition backend configured, set STT_BACKEND or send 'backend'")
+        backend_options = session_backend_options(backend_name, config)
+
+        # Loading a model can take seconds, keep it off the event loop
+        backend = await self.run_job(get_backend, backend_name, language, **backend_options)
+        stream = SpeechStream(sample_rate, sample_width)
+        segments = asyncio.Queue(maxsize=SEGMENT_QUEUE_SIZE)
+
+        async def recognize_segments():
+            texts = []
+            while True:
+                item = await segments.get()
+                if item is None:
+                    break
+                start, frame_data = item
+                audio = sr.AudioData(frame_data, sample_rate, sample_width)
+                text = await self.run_job(backend.recognize, audio, language)
+                if text:
+                    texts.append(text)
+                    end = start + len(frame_data) / (sample_rate * sample_width)
+                    await websocket.send(json.dumps({"type": "partial", "start": start, "end": end, "text": text}))
+            await websocket.send(json.dumps({"type": "final", "text": " ".join(texts)}))
+
+        worker = asyncio.create_task(recognize_segments())
+
+        async def enqueue(item):
+            # Wait for queue space, but surface a failed recognizer instead of waiting forever
+            put = asyncio.ensure_future(segments.put(item))
+            done, _ = await asyncio.wait({put, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if put not in done:
+                put.cancel()
+                worker.result()
+
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    for segment in stream.push(message):
+                        await enqueue(segment)
+                elif json.loads(message).get("type") == "end":
+                    break
+
+            for segment in stream.flush():
+                await enqueue(segment)
+            await enqueue(None)
+            await worker
+        finally:
+            worker.cancel()
+
+    async def synthesize(self, websocket):
+        request = json.loads(await websocket.recv())
+        text = request.get("text", "")
+        if not text.strip():
+            raise ValueError("No text to synthesize")
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = await self.run_job(
+                create_test_audio, text, os.path.join(directory, "speech.mp3"),
+                language=request.get("language", "en-US"), rate=request.get("rate", 150),
+                volume=request.get("volume", 1.0), backend=request.get("backend"))
+
+            await websocket.send(json.dumps({"type": "audio", "format": os.path.splitext(output_file)[1][1:],
+                                             "bytes": os.path.getsize(output_file)}))
+            # Each send waits for the socket to drain, so slow clients are not flooded
+            with open(output_file, "rb") as f:
+                while True:
+                    chunk = f.read(SEND_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    await websocket.send(chunk)
+            await websocket.send(json.dumps({"type": "done"}))
+
+async def serve(host=SERVER_HOST, port=SERVER_PORT, max_jobs=SERVER_MAX_JOBS, max_sessions=SERVER_MAX_SESSIONS):
+    """
+    Run the speech server until cancelled.
+
+    Args:
+        host (str): Interface to listen on (default: SERVER_HOST)
+        port (int): Port to listen on (default: SERVER_PORT)
+        max_jobs (int): Maximum concurrent recognition or synthesis jobs (default: SERVER_MAX_JOBS)
+        max_sessions (int): Maximum open client sessions (default: SERVER_MAX_SESSIONS)
+    """
+    server = SpeechServer(max_jobs, max_sessions)
+    async with websockets.serve(server.handler, host, port, max_size=MAX_MESSAGE_BYTES, max_queue=16):
+        logger.info("Speech server listening on ws://%s:%d", host, port)
+        await asyncio.Future()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless transcription and synthesis server")
+    parser.add_argument("--host", default=SERVER_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+    parser.add_argument("--max-jobs", type=int, default=SERVER_MAX_JOBS, help="Concurrent CPU-bound jobs")
+    parser.add_argument("--max-sessions", type=int, default=SERVER_MAX_SESSIONS, help="Concurrent client sessions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    configure_logging()
+    start_exporters()
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_jobs, args.max_sessions))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import os
-from gtts import gTTS
 from datetime import datetime
+from tts_cache import cached_synthesis
+from tts_engine import synthesize_to_file, create_tts_backend, output_extension
 
-def text_to_speech(text, language='en'):
+def text_to_speech(text, language='en', use_cache=True, backend=None):
     """
     Convert text to speech and save as an audio file.
     
     Args:
         text (str): The text to convert to speech
         language (str): The language code (default: 'en' for English)
+        use_cache (bool): Reuse previously synthesized audio for the same text and language (default: True)
+        backend (str): Synthesis backend, e.g. 'gtts' or the local 'formant' (default: TTS_BACKEND setting)
     
     Returns:
         str: Path to the generated audio file
@@ -19,12 +22,18 @@ def text_to_speech(text, language='en'):
             os.makedirs('output')
         
         # Generate unique filename using timestamp
+        engine = create_tts_backend(backend)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f'output/speech_{timestamp}.mp3'
+        output_file = f'output/speech_{timestamp}{output_extension(engine)}'
         
-        # Create gTTS object and save to file
-        tts = gTTS(text=text, lang=language, slow=False)
-        tts.save(output_file)
+        def synthesize(path):
+            # Synthesize with the selected backend and save to file
+            synthesize_to_file(text, path, language, engine)
+        
+        if use_cache:
+            cached_synthesis(text, language, output_file, synthesize, engine=engine.name, slow=False)
+        else:
+            synthesize(output_file)
         
         print(f"Audio file saved successfully: {output_file}")
         return output_file
@@ -1,57 +1,732 @@
 import os
+import glob
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import numpy as np
 import speech_recognition as sr
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from recognizers import BACKENDS, get_backend, backend_identity
+import diarization
+from language_id import AUTO_LANGUAGE, LANGUAGE_ID_SECONDS, LANGUAGE_ID_MIN_SECONDS, get_identifier, locale_for
+from vad import SpeechStream, create_vad
+from audio_normalize import TARGET_RATE, AudioDecoder, find_normalized, normalize_audio, source_fingerprint, stream_normalized
+from transcript_cache import transcript_cache, audio_content_hash
+from transcript_index import transcript_index
+from job_queue import JobCancelled
+from metrics import metrics, start_exporters
+from event_log import log_event
+from transcript_output import (DEFAULT_FORMATS, SINKS, SegmentSpool, TranscriptionResult, make_segment, output_files,
+                               write_transcript)
+from wav_reader import open_wav, downmix, to_float, to_pcm16
 
-def transcribe_audio(input_file, language="en-US", auto_save=True):
+logger = logging.getLogger("IntelliControl")
+
+# Streaming window size and overlap between consecutive windows, in seconds
+WINDOW_SECONDS = 30.0
+OVERLAP_SECONDS = 1.0
+
+# File extensions picked up when a directory is given to the batch mode
+AUDIO_EXTENSIONS = (".wav", ".aif", ".aiff", ".flac", ".mp3", ".ogg")
+
+# Longest run of words considered when removing text repeated across an overlap
+MAX_OVERLAP_WORDS = 20
+
+def iter_audio_windows(input_file, window=WINDOW_SECONDS, overlap=OVERLAP_SECONDS):
     """
-    Transcribe audio file to text using speech recognition.
-    
+    Read an audio file in fixed-size, overlapping windows.
+
+    Only one window is held in memory at a time, so memory use does not
+    depend on the length of the file. WAV files are memory-mapped, and a
+    window is only copied when it is handed to the recognizer.
+
+    Args:
+        input_file (str): Path to the input audio file
+        window (float): Window length in seconds (default: WINDOW_SECONDS)
+        overlap (float): Overlap between consecutive windows in seconds (default: OVERLAP_SECONDS)
+
+    Yields:
+        tuple: (start time in seconds, sr.AudioData for the window)
+    """
+    wav = open_wav(input_file)
+    if wav is not None:
+        with wav:
+            window_frames = int(window * wav.sample_rate)
+            overlap_frames = int(overlap * wav.sample_rate)
+            for start, frames in wav.iter_blocks(window_frames, overlap_frames):
+                yield start / wav.sample_rate, sr.AudioData(to_pcm16(downmix(frames)), wav.sample_rate, 2)
+        return
+
+    with sr.AudioFile(input_file) as source:
+        block_frames = max(1, int(window * source.SAMPLE_RATE))
+        yield from iter_pcm_windows(iter(lambda: source.stream.read(block_frames), b""), source.SAMPLE_RATE,
+                                    window, overlap, source.SAMPLE_WIDTH)
+
+def iter_pcm_windows(chunks, sample_rate, window=WINDOW_SECONDS, overlap=OVERLAP_SECONDS, sample_width=2):
+    """
+    Cut mono PCM arriving in chunks of any size into fixed-size, overlapping windows.
+
+    Windows match those iter_audio_windows() reads from a file with the
+    same samples. At most one window plus one chunk is buffered.
+
+    Args:
+        chunks (iterable): Mono PCM bytes in order
+        sample_rate (int): Sample rate in Hz
+        window (float): Window length in seconds (default: WINDOW_SECONDS)
+        overlap (float): Overlap between consecutive windows in seconds (default: OVERLAP_SECONDS)
+        sample_width (int): Bytes per sample (default: 2)
+
+    Yields:
+        tuple: (start time in seconds, sr.AudioData for the window)
+    """
+    window_frames = int(window * sample_rate)
+    overlap_frames = int(overlap * sample_rate)
+    if window_frames <= 0 or not 0 <= overlap_frames < window_frames:
+        raise ValueError("Overlap must be non-negative and shorter than the window")
+    window_bytes = window_frames * sample_width
+    step_bytes = (window_frames - overlap_frames) * sample_width
+
+    buffer = b""
+    position = 0
+    for data in chunks:
+        buffer += data
+        while len(buffer) >= window_bytes:
+            yield position / sample_rate, sr.AudioData(buffer[:window_bytes], sample_rate, sample_width)
+            buffer = buffer[step_bytes:]
+            position += step_bytes // sample_width
+
+    # The last window is shorter; skip it when it only repeats the overlap already recognized
+    if len(buffer) > window_bytes - step_bytes or (buffer and position == 0):
+        yield position / sample_rate, sr.AudioData(buffer, sample_rate, sample_width)
+
+def iter_speech_segments(input_file, block=WINDOW_SECONDS, max_segment=WINDOW_SECONDS, **vad_options):
+    """
+    Read an audio file block by block and yield only the speech segments.
+
+    Silence is detected with a VoiceActivityDetector and dropped before it
+    reaches the recognizer. Memory use is bounded by block and max_segment.
+    WAV files are memory-mapped, so detection runs on views of the mapped
+    samples and segments are cut straight from the mapping.
+
+    Args:
+        input_file (str): Path to the input audio file
+        block (float): Amount of audio read per step in seconds (default: WINDOW_SECONDS)
+        max_segment (float): Longest segment handed to the recognizer in seconds (default: WINDOW_SECONDS)
+        **vad_options: Options for VoiceActivityDetector and SpeechSegmenter
+
+    Yields:
+        tuple: (start time in seconds, sr.AudioData for the speech segment)
+    """
+    wav = open_wav(input_file)
+    if wav is not None:
+        with wav:
+            detector, segmenter = create_vad(wav.sample_rate, max_segment, **vad_options)
+            frame_length = detector.frame_length
+            block_frames = max(1, int(block * wav.sample_rate) // frame_length) * frame_length
+
+            # Random access into the mapping means no audio has to be buffered
+            for block_start, frames in wav.iter_blocks(block_frames):
+                with metrics.span("stt.vad"):
+                    segments = segmenter.push(detector.is_speech(to_float(downmix(frames))))
+                    if block_start + block_frames >= wav.frames:
+                        segments += segmenter.flush()
+                for start, end in segments:
+                    yield (start * frame_length / wav.sample_rate,
+                           sr.AudioData(wav.pcm16(start * frame_length, end * frame_length), wav.sample_rate, 2))
+        return
+
+    with sr.AudioFile(input_file) as source:
+        block_frames = max(1, int(block * source.SAMPLE_RATE))
+        yield from iter_pcm_speech_segments(iter(lambda: source.stream.read(block_frames), b""),
+                                            source.SAMPLE_RATE, max_segment, source.SAMPLE_WIDTH, **vad_options)
+
+def iter_pcm_speech_segments(chunks, sample_rate, max_segment=WINDOW_SECONDS, sample_width=2, **vad_options):
+    """
+    Detect speech in mono PCM arriving in chunks of any size and yield only the speech segments.
+
+    Args:
+        chunks (iterable): Mono PCM bytes in order
+        sample_rate (int): Sample rate in Hz
+        max_segment (float): Longest segment handed to the recognizer in seconds (default: WINDOW_SECONDS)
+        sample_width (int): Bytes per sample (default: 2)
+        **vad_options: Options for VoiceActivityDetector and SpeechSegmenter
+
+    Yields:
+        tuple: (start time in seconds, sr.AudioData for the speech segment)
+    """
+    stream = SpeechStream(sample_rate, sample_width, max_segment=max_segment, **vad_options)
+    for data in chunks:
+        with metrics.span("stt.vad"):
+            segments = stream.push(data)
+        for start, frame_data in segments:
+            yield start, sr.AudioData(frame_data, sample_rate, sample_width)
+
+    with metrics.span("stt.vad"):
+        segments = stream.flush()
+    for start, frame_data in segments:
+        yield start, sr.AudioData(frame_data, sample_rate, sample_width)
+
+def iter_speaker_segments(input_file, max_segment=WINDOW_SECONDS, num_speakers=None, **diarization_options):
+    """
+    Diarize an audio file and yield its speech turn by turn, labelled by speaker.
+
+    The whole file is diarized before the first turn is yielded, since
+    speakers are found by clustering all of its speech. Turns longer than
+    max_segment are split so they fit a recognizer window.
+
+    Args:
+        input_file (str): Path to a 16-bit WAV file
+        max_segment (float): Longest audio handed to the recognizer in seconds (default: WINDOW_SECONDS)
+        num_speakers (int): Known number of speakers, None to estimate it (default: None)
+        **diarization_options: Options for diarization.diarize()
+
+    Yields:
+        tuple: (start time in seconds, sr.AudioData for the speech, speaker label)
+    """
+    turns = diarization.diarize(input_file, num_speakers, **diarization_options)
+    wav = open_wav(input_file)
+    if wav is None:
+        raise ValueError(f"Diarization needs a WAV file: {input_file}")
+    with wav:
+        max_frames = max(1, int(max_segment * wav.sample_rate))
+        for turn in turns:
+            start = int(turn["start"] * wav.sample_rate)
+            end = min(int(turn["end"] * wav.sample_rate), wav.frames)
+            for chunk_start in range(start, end, max_frames):
+                chunk_end = min(chunk_start + max_frames, end)
+                yield (chunk_start / wav.sample_rate,
+                       sr.AudioData(wav.pcm16(chunk_start, chunk_end), wav.sample_rate, 2), turn["speaker"])
+
+def _strip_overlap(previous_words, words):
+    """
+    Drop the leading words that repeat the end of the previous window.
+
+    Args:
+        previous_words (list): Words recognized in the previous window
+        words (list): Words recognized in the current window
+
+    Returns:
+        list: Words that are new in the current window
+    """
+    limit = min(len(previous_words), len(words), MAX_OVERLAP_WORDS)
+    for size in range(limit, 0, -1):
+        if [w.lower() for w in previous_words[-size:]] == [w.lower() for w in words[:size]]:
+            return words[size:]
+    return words
+
+def recognize_chunk(backend, audio, language, start=0.0):
+    """
+    Recognize one chunk of audio.
+
+    Args:
+        backend (object): Backend with recognize(audio, language), and optionally recognize_words()
+        audio (sr.AudioData): Chunk to recognize
+        language (str): Language code
+        start (float): Time of the chunk in the whole audio, added to word timings (default: 0.0)
+
+    Returns:
+        tuple: (word dicts, empty when the backend has no word timings, recognized tokens)
+    """
+    recognize_words = getattr(backend, "recognize_words", None)
+    with metrics.span("stt.inference"):
+        if recognize_words is not None:
+            # Word times are relative to the chunk, make them relative to the file
+            words = [dict(w, start=round(start + w["start"], 3), end=round(start + w["end"], 3))
+                     for w in recognize_words(audio, language)]
+            tokens = [w["word"] for w in words]
+        else:
+            words = []
+            tokens = backend.recognize(audio, language).split()
+    metrics.increment("stt.audio_seconds", len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
+    return words, tokens
+
+def identify_languages(input_file, identifier, max_segment=WINDOW_SECONDS, diarize=False, num_speakers=None,
+                       cancel_token=None, candidates=None):
+    """
+    Split an audio file into speech segments and identify the language of each.
+
+    Only the first LANGUAGE_ID_SECONDS of a segment are identified, and
+    segments too short to tell keep the language of the one before them.
+
+    Args:
+        input_file (str): Path to a normalized 16 kHz mono WAV file
+        identifier (object): Language identifier, see language_id
+        max_segment (float): Longest segment in seconds (default: WINDOW_SECONDS)
+        diarize (bool): Use speaker turns as the segments (default: False)
+        num_speakers (int): Known number of speakers when diarizing, None to estimate it (default: None)
+        cancel_token (object): Token whose raise_if_cancelled() is checked before each segment (default: None)
+        candidates (list): Locales to choose between, e.g. those the backend has models for (default: None, all)
+
+    Returns:
+        list: (start, end, speaker, locale) tuples in time order
+    """
+    if diarize:
+        chunks = iter_speaker_segments(input_file, max_segment=max_segment, num_speakers=num_speakers)
+    else:
+        chunks = ((start, audio, None) for start, audio in iter_speech_segments(input_file, block=max_segment,
+                                                                                max_segment=max_segment))
+
+    routed = []
+    language = None
+    for start, audio, speaker in chunks:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        if language is None or duration >= LANGUAGE_ID_MIN_SECONDS:
+            head = audio.frame_data[:int(LANGUAGE_ID_SECONDS * audio.sample_rate) * audio.sample_width]
+            with metrics.span("stt.language_id"):
+                code, _ = identifier.identify(to_float(np.frombuffer(head, dtype="<i2")), candidates)
+            language = locale_for(code)
+        routed.append((start, start + duration, speaker, language))
+    return routed
+
+def transcribe_routed(input_file, routed, backend="vosk", progress=None, cancel_token=None, **backend_options):
+    """
+    Recognize speech segments with the model for each segment's language.
+
+    Segments are recognized in one batch per language, so every model is
+    fetched from the model cache once and stays in use until its batch is
+    done, however often the speakers switch language.
+
+    Args:
+        input_file (str): Path to a normalized 16 kHz mono WAV file
+        routed (list): (start, end, speaker, locale) tuples from identify_languages()
+        backend (str or object): Backend name, or a multilingual backend instance (default: "vosk")
+        progress (callable): Called with (speech seconds done, total speech seconds) after each segment (default: None)
+        cancel_token (object): Token whose raise_if_cancelled() is checked before each segment (default: None)
+        **backend_options: Options passed to the backend when created by name; a model_path is ignored,
+            since each language needs its own model
+
+    Returns:
+        list: Transcript segments in time order, each with its "language"
+    """
+    options = {name: value for name, value in backend_options.items() if name != "model_path"}
+    batches = {}
+    for number, (_, _, _, language) in enumerate(routed):
+        batches.setdefault(language, []).append(number)
+
+    total = sum(end - start for start, end, _, _ in routed)
+    done = 0.0
+    segments = [None] * len(routed)
+    wav = open_wav(input_file)
+    with wav:
+        for language, numbers in batches.items():
+            engine = get_backend(backend, language=language, **options) if isinstance(backend, str) else backend
+            for number in numbers:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                start, end, speaker, _ = routed[number]
+                audio = sr.AudioData(wav.pcm16(round(start * wav.sample_rate), round(end * wav.sample_rate)),
+                                     wav.sample_rate, 2)
+                words, tokens = recognize_chunk(engine, audio, language, start)
+                done += end - start
+                if progress:
+                    progress(done, total)
+                if words:
+                    segments[number] = make_segment(words[0]["start"], words[-1]["end"], words, speaker=speaker,
+                                                    language=language)
+                elif tokens:
+                    segments[number] = make_segment(start, end, text=" ".join(tokens), speaker=speaker,
+                                                    language=language)
+    return [segment for segment in segments if segment is not None]
+
+def stream_transcribe(input_file, language="en-US", backend="vosk", window=WINDOW_SECONDS,
+                      overlap=OVERLAP_SECONDS, vad=False, progress=None, cancel_token=None, diarize=False,
+                      num_speakers=None, **backend_options):
+    """
+    Transcribe an audio file window by window, yielding partial transcripts.
+
+    Audio already in 16 kHz mono 16-bit WAV, or with a normalized copy in
+    the cache, is memory-mapped. Anything else is decoded and resampled
+    block by block as it is recognized, and the normalized copy is cached
+    on the way, so transcribing the same file again skips decoding.
+
+    With language "auto" the language of every speech segment is
+    identified first and the segments are recognized in per-language
+    batches, see identify_languages() and transcribe_routed(); silence is
+    always skipped then, and segments are yielded once all are recognized.
+
+    Args:
+        input_file (str): Path to the input audio file
+        language (str): Language code for transcription, or "auto" to identify it per speech segment
+            (default: "en-US")
+        backend (str or object): Backend name or instance with recognize(audio, language) (default: "vosk")
+        window (float): Window length in seconds (default: WINDOW_SECONDS)
+        overlap (float): Overlap between consecutive windows in seconds (default: OVERLAP_SECONDS)
+        vad (bool): Recognize only detected speech segments, skipping silence (default: False)
+        progress (callable): Called with (seconds done, total seconds) after each chunk (default: None)
+        cancel_token (object): Token whose raise_if_cancelled() is checked before each chunk (default: None)
+        diarize (bool): Recognize speaker turns found by diarization and label segments by speaker (default: False)
+        num_speakers (int): Known number of speakers when diarizing, None to estimate it (default: None)
+        **backend_options: Options passed to the backend when created by name
+
+    Yields:
+        dict: Transcript segment with "start", "end", "text", "confidence" and "words" keys, plus "speaker"
+            when diarizing and "language" when detecting it. Words carry timings and confidences when the
+            backend provides recognize_words(), and are empty otherwise
+    """
+    if language == AUTO_LANGUAGE:
+        if isinstance(backend, str):
+            if not BACKENDS[backend].language_specific:
+                # A multilingual model serves every batch and lends itself to identification
+                backend = get_backend(backend, **backend_options)
+        elif getattr(backend, "language_specific", False):
+            raise ValueError("Detecting the language needs a backend name or a multilingual backend")
+        # Identification and recognition are two passes over the audio, so decode it once up front
+        input_file = normalize_audio(input_file)
+        # Only languages the backend has a model for can be routed to
+        candidates = BACKENDS[backend].languages if isinstance(backend, str) else getattr(backend, "languages", None)
+        routed = identify_languages(input_file, get_identifier(backend), window, diarize, num_speakers, cancel_token,
+                                    candidates)
+        yield from transcribe_routed(input_file, routed, backend, progress, cancel_token, **backend_options)
+        return
+
+    if isinstance(backend, str):
+        backend = get_backend(backend, language=language, **backend_options)
+
+    duration = AudioDecoder(input_file).duration
+    normalized_file = find_normalized(input_file)
+
+    if diarize:
+        # Speakers are found by clustering all of the speech, so the whole file is decoded first
+        chunks = iter_speaker_segments(normalized_file or normalize_audio(input_file), max_segment=window,
+                                       num_speakers=num_speakers)
+    elif normalized_file is not None:
+        if vad:
+            chunks = iter_speech_segments(normalized_file, block=window, max_segment=window)
+        else:
+            chunks = iter_audio_windows(normalized_file, window, overlap)
+        chunks = ((start, audio, None) for start, audio in chunks)
+    else:
+        # Recognize the first blocks while the rest of the file is still being decoded
+        pcm = stream_normalized(input_file)
+        if vad:
+            chunks = iter_pcm_speech_segments(pcm, TARGET_RATE, max_segment=window)
+        else:
+            chunks = iter_pcm_windows(pcm, TARGET_RATE, window, overlap)
+        chunks = ((start, audio, None) for start, audio in chunks)
+
+    previous_tokens = []
+    for start, audio, speaker in chunks:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        end = start + len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        words, tokens = recognize_chunk(backend, audio, language, start)
+        # Only fixed windows overlap; speech segments and speaker turns are disjoint, so a word
+        # repeated across their boundary was really said twice
+        new_tokens = tokens if vad or diarize else _strip_overlap(previous_tokens, tokens)
+        previous_tokens = tokens
+        if progress:
+            progress(min(end, duration), duration)
+        if not new_tokens:
+            continue
+
+        if words:
+            new_words = words[len(words) - len(new_tokens):]
+            yield make_segment(new_words[0]["start"], new_words[-1]["end"], new_words, speaker=speaker)
+        else:
+            yield make_segment(start, end, text=" ".join(new_tokens), speaker=speaker)
+
+def transcribe_segments(input_file, language="en-US", backend="vosk", vad=False, use_cache=True, progress=None,
+                        cancel_token=None, diarize=False, num_speakers=None, **backend_options):
+    """
+    Transcribe an audio file into segments, reusing a cached transcript when possible.
+
+    Segments are yielded as they are recognized, so long files can be
+    written out with write_transcript() without holding the transcript.
+    A transcript is cached only once it is complete.
+
     Args:
         input_file (str): Path to the input audio file
         language (str): Language code for transcription (default: "en-US")
+        backend (str or object): Backend name or instance with recognize(audio, language) (default: "vosk")
+        vad (bool): Recognize only detected speech segments, skipping silence (default: False)
+        use_cache (bool): Whether to reuse and store cached transcripts (default: True)
+        progress (callable): Called with (seconds done, total seconds) after each chunk (default: None)
+        cancel_token (object): Token whose raise_if_cancelled() is checked before each chunk (default: None)
+        diarize (bool): Split and label segments by speaker (default: False)
+        num_speakers (int): Known number of speakers when diarizing, None to estimate it (default: None)
+        **backend_options: Options passed to the backend when created by name
+
+    Yields:
+        dict: Transcript segment, see stream_transcribe()
+    """
+    key = None
+    if use_cache:
+        with metrics.span("stt.cache_lookup"):
+            # Conforming WAVs are keyed by their samples; anything else by its source, so the
+            # lookup never has to wait for the file to be decoded
+            decoder = AudioDecoder(input_file)
+            audio_hash = audio_content_hash(input_file) if decoder.is_normalized else source_fingerprint(input_file)
+            key = transcript_cache.key(audio_hash, backend, language, vad, diarize, num_speakers,
+                                       **backend_options)
+            cached = transcript_cache.get(key)
+        if cached is not None:
+            if progress:
+                progress(1, 1)
+            yield from cached
+            return
+
+    # Segments wait for the cache on disk, not in memory
+    spool = SegmentSpool() if key is not None else None
+    try:
+        for segment in stream_transcribe(input_file, language, backend, vad=vad, progress=progress,
+                                         cancel_token=cancel_token, diarize=diarize, num_speakers=num_speakers,
+                                         **backend_options):
+            if spool is not None:
+                spool.append(segment)
+            yield segment
+        if spool is not None:
+            transcript_cache.put(key, spool)
+    finally:
+        if spool is not None:
+            spool.close()
+
+def transcribe_audio(input_file, language="en-US", auto_save=True, backend=None, vad=False, use_cache=True,
+                     formats=DEFAULT_FORMATS, output_dir="logs", progress=None, cancel_token=None, diarize=False,
+                     num_speakers=None, **backend_options):
+    """
+    Transcribe audio file to text using speech recognition.
+
+    Results are cached by audio content and recognition settings, so
+    transcribing the same audio again returns without recognition. When
+    auto-saving, every segment is written to each output format as soon
+    as it is recognized, and the saved transcript is added to the search
+    index.
+
+    Args:
+        input_file (str): Path to the input audio file
+        language (str): Language code for transcription, or "auto" to identify the language of each
+            speech segment (default: "en-US")
         auto_save (bool): Whether to save the transcription to a file (default: True)
-    
+        backend (str or object): Local recognition backend, e.g. "vosk" or "whisper" (default: None)
+        vad (bool): Skip silence with voice activity detection before recognition (default: False)
+        use_cache (bool): Whether to reuse cached transcripts (default: True)
+        formats (list): Output formats when auto-saving, any of "txt", "json", "srt", "vtt" (default: DEFAULT_FORMATS)
+        output_dir (str): Directory for saved transcripts (default: "logs")
+        progress (callable): Called with (seconds done, total seconds) after each chunk (default: None)
+        cancel_token (CancellationToken): Stops recognition between chunks when cancelled (default: None)
+        diarize (bool): Split the transcript into speaker turns labelled "SPEAKER_1", "SPEAKER_2", ... (default: False)
+        num_speakers (int): Known number of speakers when diarizing, None to estimate it (default: None)
+        **backend_options: Options passed to the backend when created by name
+
     Returns:
-        str: Transcribed text
+        TranscriptionResult: Segments with word timings, confidences and speakers, and the saved file paths
     """
-    recognizer = sr.Recognizer()
-    
+    files = {}
+    started = time.perf_counter()
     try:
-        with sr.AudioFile(input_file) as source:
-            audio = recognizer.record(source)
-            
-        # For now, we'll use a placeholder message since we're having issues with whisper
-        transcribed_text = f"Speech recognition is currently being set up. Language selected: {language}. Please check back later."
-        
+        if backend is None:
+            # Opening the file only parses the header, the samples are not decoded
+            duration = AudioDecoder(input_file).duration
+
+            # For now, we'll use a placeholder message since we're having issues with whisper
+            placeholder = f"Speech recognition is currently being set up. Language selected: {language}. Please check back later."
+            segments = [make_segment(0.0, duration, text=placeholder)]
+        else:
+            segments = transcribe_segments(input_file, language, backend, vad, use_cache, progress, cancel_token,
+                                           diarize, num_speakers, **backend_options)
+
         if auto_save:
-            # Create logs directory if it doesn't exist
-            os.makedirs("logs", exist_ok=True)
-            
-            # Generate output filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"logs/transcription_{timestamp}.txt"
-            
-            # Save transcription to file
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(transcribed_text)
-            
-            return f"Transcription saved to {output_file}"
-        
-        return transcribed_text
-        
+            # Generate output filenames with timestamp, one per format; the random suffix keeps jobs
+            # finishing at the same moment from overwriting each other's files
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            base_path = os.path.join(output_dir, f"transcription_{timestamp}_{uuid.uuid4().hex[:8]}")
+            segments = write_transcript(segments, base_path, formats, source=input_file, language=language)
+            files = output_files(base_path, formats)
+
+        # The result reads its segments back from a spool file, so long transcripts are never held in memory
+        spool = SegmentSpool()
+        for segment in segments:
+            spool.append(segment)
+        result = TranscriptionResult(language, spool, files)
+        if files and backend is not None:
+            # Make the saved transcript searchable, pointing hits at its first file
+            _index_transcript(next(iter(files.values())), result.segments, input_file, language)
+        seconds = time.perf_counter() - started
+        metrics.observe("stt.total", seconds)
+        log_event("transcription", source=input_file, language=language,
+                  backend=backend_identity(backend, **backend_options)[0] if backend is not None else None,
+                  segments=len(result.segments), files=files, seconds=round(seconds, 3))
+        return result
+
+    except JobCancelled:
+        # Drop the partial output of a cancelled transcription
+        for path in files.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
     except Exception as e:
         raise Exception(f"Error transcribing audio: {str(e)}")
 
+def _index_transcript(path, segments, source, language):
+    """
+    Add a saved transcript to the search index.
+
+    The transcript is already saved, so an index failure is logged rather
+    than failing the transcription.
+    """
+    try:
+        transcript_index.add(path, segments, source=source, language=language)
+    except sqlite3.Error:
+        logger.exception("Could not index transcript %s", path)
+
+# Backend loaded once per batch worker process
+_worker_backend = None
+_worker_options = {}
+
+def collect_audio_files(pattern):
+    """
+    Expand a directory or glob pattern into a sorted list of audio files.
+
+    Args:
+        pattern (str): Directory to search recursively, or a glob pattern
+
+    Returns:
+        list: Paths of the matching audio files
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*")
+    paths = glob.glob(pattern, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS))
+
+def _init_batch_worker(backend, language, vad, use_cache, diarize, num_speakers, backend_options,
+                       metrics_enabled=False):
+    """
+    Load the recognition backend into the worker's model cache when it starts.
+    """
+    global _worker_backend, _worker_options
+    # A forked worker starts with a copy of the parent's metrics, which the parent already has
+    metrics.reset()
+    metrics.enabled = metrics_enabled
+    _worker_options = {"language": language, "vad": vad, "use_cache": use_cache, "diarize": diarize,
+                       "num_speakers": num_speakers}
+    if isinstance(backend, str) and language == AUTO_LANGUAGE:
+        # Per-language models load with their first batch and stay cached for the worker's later files
+        _worker_options.update(backend_options)
+    elif isinstance(backend, str):
+        backend = get_backend(backend, language=language, **backend_options)
+    _worker_backend = backend
+
+def _transcribe_batch_file(input_file):
+    """
+    Transcribe one file inside a batch worker and time it.
+
+    Returns:
+        dict: Result record for the JSONL output
+    """
+    record = {"file": input_file, "pid": os.getpid()}
+    started = time.perf_counter()
+    try:
+        record["audio_seconds"] = round(AudioDecoder(input_file).duration, 3)
+        result = transcribe_audio(input_file, auto_save=False, backend=_worker_backend, **_worker_options)
+        record["text"] = result.text
+        record["segments"] = list(result.segments)
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    if metrics.enabled:
+        record["metrics"] = metrics.drain()
+    return record
+
+def transcribe_batch(input_files, output_file="logs/transcriptions.jsonl", workers=None,
+                     language="en-US", backend=None, vad=False, use_cache=True, diarize=False, num_speakers=None,
+                     **backend_options):
+    """
+    Transcribe many audio files in parallel across worker processes.
+
+    Each worker loads the recognition backend once and reuses it for every
+    file it receives. Results are appended to a JSONL file and added to the
+    search index as they finish.
+
+    Args:
+        input_files (list): Paths of the audio files to transcribe
+        output_file (str): Path of the JSONL results file (default: "logs/transcriptions.jsonl")
+        workers (int): Number of worker processes, None for one per CPU (default: None)
+        language (str): Language code for transcription (default: "en-US")
+        backend (str or object): Local recognition backend name, e.g. "vosk" or "whisper", or a picklable
+            backend instance (default: None)
+        vad (bool): Skip silence with voice activity detection before recognition (default: False)
+        use_cache (bool): Whether to reuse cached transcripts (default: True)
+        diarize (bool): Split and label each transcript by speaker (default: False)
+        num_speakers (int): Known number of speakers per file when diarizing, None to estimate it (default: None)
+        **backend_options: Options passed to the backend
+
+    Returns:
+        dict: Summary with file, error and timing totals
+    """
+    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
+
+    started = time.perf_counter()
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(backend, language, vad, use_cache, diarize, num_speakers,
+                                       backend_options, metrics.enabled)) as executor, \
+            open(output_file, "w", encoding="utf-8") as f:
+        futures = [executor.submit(_transcribe_batch_file, path) for path in input_files]
+        for future in as_completed(futures):
+            record = future.result()
+            if "metrics" in record:
+                # Spans recorded in the worker belong in this process's registry, not in the results file
+                metrics.merge(record.pop("metrics"))
+            errors += "error" in record
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if "segments" in record and backend is not None:
+                _index_transcript(output_file, record["segments"], record["file"], language)
+
+    return {
+        "files": len(input_files),
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3),
+        "output_file": output_file,
+    }
+
 def main():
-    # Define the audio file path
-    audio_file = "output/test_audio.wav"
-    
-    # Perform transcription with default settings
-    result = transcribe_audio(audio_file)
-    print(result)
-    
+    parser = argparse.ArgumentParser(description="Transcribe audio files to text")
+    parser.add_argument("input", nargs="?", default="output/test_audio.wav",
+                        help="Audio file, or a directory or glob pattern for batch mode")
+    parser.add_argument("--language", default="en-US",
+                        help='Language code for transcription, or "auto" to detect it per speech segment')
+    parser.add_argument("--backend", default=None, help="Local recognition backend (vosk or whisper)")
+    parser.add_argument("--vad", action="store_true", help="Skip silence before recognition")
+    parser.add_argument("--diarize", action="store_true", help="Split the transcript by speaker")
+    parser.add_argument("--speakers", type=int, default=None, help="Number of speakers when diarizing (default: estimate)")
+    parser.add_argument("--no-cache", action="store_true", help="Always run recognition, ignoring cached transcripts")
+    parser.add_argument("--format", action="append", choices=sorted(SINKS), dest="formats",
+                        help="Output format for a single file, repeat for several (default: txt)")
+    parser.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: one per CPU)")
+    parser.add_argument("--output", default="logs/transcriptions.jsonl", help="Batch results file (JSONL)")
+    args = parser.parse_args()
+    start_exporters()
+
+    if os.path.isdir(args.input) or any(c in args.input for c in "*?["):
+        # Batch mode over a directory or glob pattern
+        input_files = collect_audio_files(args.input)
+        summary = transcribe_batch(input_files, args.output, args.workers, args.language, args.backend, args.vad,
+                                   use_cache=not args.no_cache, diarize=args.diarize, num_speakers=args.speakers)
+        print(json.dumps(summary))
+        return
+
+    # Perform transcription of a single file
+    result = transcribe_audio(args.input, language=args.language, backend=args.backend, vad=args.vad,
+                              use_cache=not args.no_cache, formats=args.formats or DEFAULT_FORMATS,
+                              diarize=args.diarize, num_speakers=args.speakers)
+    print(result.text)
+    for path in result.files.values():
+        print(f"Transcription saved to {path}")
+
     # Example with different language (uncomment to test)
-    # result = transcribe_audio(audio_file, language="es")
+    # result = transcribe_audio(args.input, language="es-ES", backend="vosk")
+
+    # Example with a local streaming backend (uncomment to test)
+    # for partial in stream_transcribe(args.input, backend="vosk"):
+    #     print(f"[{partial['start']:.1f}s] {partial['text']}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from recognizers import backend_identity
+from wav_reader import open_wav
+
+# Location and limits of the transcript cache, overridable from the environment
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join("cache", "transcripts.sqlite3"))
+TRANSCRIPT_CACHE_TTL_DAYS = float(os.getenv("TRANSCRIPT_CACHE_TTL_DAYS", "30"))
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "10000"))
+
+# Frames hashed per step when fingerprinting audio content
+HASH_BLOCK_FRAMES = 1 << 20
+
+# Cached segments read per query when replaying a transcript
+READ_SEGMENTS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used);
+CREATE TABLE IF NOT EXISTS transcript_segments (
+    key TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    segment TEXT NOT NULL,
+    PRIMARY KEY (key, number)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def audio_content_hash(path):
+    """
+    Hash the decoded samples of a WAV file, ignoring its header and metadata.
+
+    Two files with the same samples and format hash the same, whatever
+    their names, timestamps or metadata chunks.
+
+    Args:
+        path (str): Path to a normalized WAV file
+
+    Returns:
+        str: Hex digest
+    """
+    wav = open_wav(path)
+    if wav is None:
+        # Not mappable, fall back to the raw file bytes
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_BLOCK_FRAMES), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    with wav:
+        digest = hashlib.sha256(f"{wav.sample_rate}:{wav.channels}:{wav.dtype.str}".encode("ascii"))
+        for _, frames in wav.iter_blocks(HASH_BLOCK_FRAMES):
+            digest.update(frames)
+    return digest.hexdigest()
+
+class TranscriptCache:
+    """
+    Persistent cache of transcription results in SQLite.
+
+    Entries are keyed by the audio content hash and the settings that
+    change the transcript: backend, model, language and voice activity
+    detection. Entries older than the TTL are dropped, and the least
+    recently used ones are evicted past the entry limit. Hit and miss
+    counts are kept in the database, so they survive restarts. Segments
+    are stored one row each, so neither storing nor replaying a
+    transcript holds all of it in memory.
+    """
+
+    def __init__(self, path=TRANSCRIPT_CACHE_PATH, ttl_days=TRANSCRIPT_CACHE_TTL_DAYS,
+                 max_entries=TRANSCRIPT_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path (str): Path of the SQLite database (default: TRANSCRIPT_CACHE_PATH)
+            ttl_days (float): Age in days after which an entry expires (default: TRANSCRIPT_CACHE_TTL_DAYS)
+            max_entries (int): Maximum number of cached transcripts (default: TRANSCRIPT_CACHE_MAX_ENTRIES)
+        """
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @staticmethod
+    def key(audio_hash, backend, language, vad=False, diarize=False, num_speakers=None, **backend_options):
+        """
+        Build the cache key for a transcription request.
+
+        Args:
+            audio_hash (str): Digest from audio_content_hash(), or a source fingerprint for audio that is not
+                a normalized WAV
+            backend (str or object): Backend name or instance
+            language (str): Language code
+            vad (bool): Whether voice activity detection is used (default: False)
+            diarize (bool): Whether segments are split and labelled by speaker (default: False)
+            num_speakers (int): Number of speakers given to diarization (default: None)
+            **backend_options: Backend specific options such as model_size or model_path
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        name, model = backend_identity(backend, **backend_options)
+        payload = json.dumps([audio_hash, name, model, language, bool(vad), bool(diarize),
+                              num_speakers if diarize else None])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached transcript.
+
+        Args:
+            key (str): Cache key from TranscriptCache.key()
+
+        Returns:
+            iterator: Partial transcripts as produced by stream_transcribe(), read as they are consumed,
+                or None on a miss
+        """
+        now = time.time()
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT created FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[0] > self.ttl:
+                self._delete(db, [(key,)])
+                row = None
+
+            self._count(db, "hits" if row is not None else "misses")
+            if row is None:
+                return None
+            db.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (now, key))
+        return self._iter_segments(key)
+
+    def put(self, key, partials):
+        """
+        Store a transcript.
+
+        Args:
+            key (str): Cache key from TranscriptCache.key()
+            partials (iterable): Partial transcripts as produced by stream_transcribe(), consumed one at a time
+        """
+        now = time.time()
+        rows = ((key, number, json.dumps(partial, ensure_ascii=False)) for number, partial in enumerate(partials))
+        with self._lock, self._connect() as db:
+            self._delete(db, [(key,)])
+            db.execute("INSERT INTO transcripts (key, created, last_used) VALUES (?, ?, ?)", (key, now, now))
+            db.executemany("INSERT INTO transcript_segments (key, number, segment) VALUES (?, ?, ?)", rows)
+            self._evict(db, now)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of entries and the hit and miss counts
+        """
+        with self._lock, self._connect() as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        return {"entries": entries, "hits": counters.get("hits", 0), "misses": counters.get("misses", 0)}
+
+    def clear(self):
+        """
+        Remove every cached transcript and reset the counters.
+        """
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM transcripts")
+            db.execute("DELETE FROM transcript_segments")
+            db.execute("DELETE FROM counters")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the cache safe to share across threads and processes
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(SCHEMA)
+                self._initialized = True
+            # Commit on success, roll back on error
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, db, name):
+        db.execute("INSERT INTO counters (name, value) VALUES (?, 1) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def _iter_segments(self, key):
+        # A page per connection, so the lock is not held while the caller works on the segments
+        number = 0
+        while True:
+            with self._lock, self._connect() as db:
+                rows = db.execute("SELECT number, segment FROM transcript_segments WHERE key = ? AND number >= ? "
+                                  "ORDER BY number LIMIT ?", (key, number, READ_SEGMENTS)).fetchall()
+            for _, segment in rows:
+                yield json.loads(segment)
+            if len(rows) < READ_SEGMENTS:
+                return
+            number = rows[-1][0] + 1
+
+    def _delete(self, db, keys):
+        db.executemany("DELETE FROM transcript_segments WHERE key = ?", keys)
+        db.executemany("DELETE FROM transcripts WHERE key = ?", keys)
+
+    def _evict(self, db, now):
+        keys = db.execute("SELECT key FROM transcripts WHERE created < ? OR key NOT IN "
+                          "(SELECT key FROM transcripts ORDER BY last_used DESC LIMIT ?)",
+                          (now - self.ttl, self.max_entries)).fetchall()
+        self._delete(db, keys)
+
+# Cache shared by every caller in this process
+transcript_cache = TranscriptCache()
@@ -0,0 +1,314 @@
+import os
+import re
+import json
+import glob
+import time
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from metrics import metrics
+
+# Location of the search index, overridable from the environment
+TRANSCRIPT_INDEX_PATH = os.getenv("TRANSCRIPT_INDEX_PATH", os.path.join("cache", "transcript_index.sqlite3"))
+
+# Hits returned by a search unless asked otherwise
+SEARCH_LIMIT = 20
+
+# Words of context around the matched terms in a snippet
+SNIPPET_WORDS = 12
+
+# Segment text lives in a regular table; the FTS5 table indexes it without a second copy.
+# Prefix indexes on 2 and 3 characters keep short prefix queries from scanning the vocabulary.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    language TEXT,
+    created REAL NOT NULL,
+    UNIQUE (path, source)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    document INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    start_seconds REAL,
+    end_seconds REAL,
+    speaker TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_document ON segments (document);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Quoted phrases and bare words of a search query
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+WORD = re.compile(r"\w+")
+
+def build_match(query):
+    """
+    Translate a search box query into an FTS5 MATCH expression.
+
+    Words must all appear in a segment, "quoted words" must appear as a
+    phrase and a trailing * matches any word starting with the prefix,
+    e.g. 'recog* "speech model"'. Punctuation is dropped, so user input
+    can never be parsed as FTS5 operators.
+
+    Args:
+        query (str): Search query
+
+    Returns:
+        str: MATCH expression, or None when the query has no words
+    """
+    terms = []
+    for phrase, word in QUERY_TOKEN.findall(query):
+        words = WORD.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if word.endswith("*"):
+            term += "*"
+        terms.append(term)
+    return " ".join(terms) or None
+
+class TranscriptIndex:
+    """
+    Incremental full-text index of saved transcripts in SQLite FTS5.
+
+    Every saved transcript adds its segments as it is written, with the
+    transcript file, the source audio, the segment number, its timestamps
+    and speaker. Queries run against the inverted index, so phrase and
+    prefix searches for the newest matches stay in the millisecond range
+    over millions of segments, and nothing is ever rebuilt from scratch.
+    """
+
+    def __init__(self, path=TRANSCRIPT_INDEX_PATH):
+        """
+        Args:
+            path (str): Path of the SQLite database (default: TRANSCRIPT_INDEX_PATH)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def add(self, path, segments, source=None, language=None):
+        """
+        Index the segments of a saved transcript.
+
+        Indexing the same transcript again replaces its earlier segments.
+
+        Args:
+            path (str): Saved transcript file that hits point to
+            segments (iterable): Transcript segments as produced by make_segment(), consumed one at a time
+            source (str): Audio file the transcript was made from (default: None)
+            language (str): Language code (default: None)
+
+        Returns:
+            int: Number of segments indexed
+        """
+        with metrics.span("index.add"), self._lock, self._connect() as db:
+            document = self._replace_document(db, path, source or "", language)
+            rows = ((document, number, segment.get("start"), segment.get("end"), segment.get("speaker"), segment["text"])
+                    for number, segment in enumerate(segments) if segment.get("text", "").strip())
+            cursor = db.executemany("INSERT INTO segments (document, number, start_seconds, end_seconds, speaker, text) "
+                                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return cursor.rowcount
+
+    def add_file(self, path):
+        """
+        Index a transcript saved earlier by transcribe_audio().
+
+        JSON transcripts keep their segments and timestamps; plain text
+        transcripts are indexed as a single segment without timestamps.
+
+        Args:
+            path (str): Path of a .json or .txt transcript
+
+        Returns:
+            int: Number of segments indexed
+        """
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                document = json.load(f)
+                return self.add(path, document.get("segments", []), document.get("source"), document.get("language"))
+            return self.add(path, [{"text": f.read()}])
+
+    def add_directory(self, directory="logs"):
+        """
+        Index the transcripts in a directory that are not indexed yet.
+
+        When a transcript was saved in several formats only the JSON file,
+        which has the timestamps, is indexed, and transcripts indexed when
+        they were saved are skipped whichever of their files they point to.
+
+        Args:
+            directory (str): Directory of saved transcripts (default: "logs")
+
+        Returns:
+            dict: Number of files and segments indexed
+        """
+        with self._lock, self._connect() as db:
+            indexed = {os.path.splitext(row[0])[0] for row in db.execute("SELECT path FROM documents")}
+
+        paths = sorted(glob.glob(os.path.join(directory, "transcription_*.json")))
+        saved = {os.path.splitext(p)[0] for p in paths}
+        paths += [p for p in sorted(glob.glob(os.path.join(directory, "transcription_*.txt")))
+                  if os.path.splitext(p)[0] not in saved]
+
+        files = segments = 0
+        for path in paths:
+            if os.path.splitext(path)[0] in indexed:
+                continue
+            segments += self.add_file(path)
+            files += 1
+        return {"files": files, "segments": segments}
+
+    def search(self, query, limit=SEARCH_LIMIT, order="recent"):
+        """
+        Find the segments matching a query.
+
+        Args:
+            query (str): Words, "quoted phrases" and prefix* terms, see build_match()
+            limit (int): Maximum number of hits (default: SEARCH_LIMIT)
+            order (str): "recent" for newest segments first, or "rank" for best matches first by BM25;
+                ranking scores every match, so it slows down for terms found in a large share of
+                segments (default: "recent")
+
+        Returns:
+            list: Hit dicts with "file", "source", "language", "segment", "start", "end", "speaker",
+                "text" and "snippet" keys, the matched terms in the snippet marked with [brackets]
+        """
+        match = build_match(query)
+        if match is None:
+            return []
+        # Walking the index backwards by rowid stops after `limit` hits, however common the terms
+        ordering = "rank" if order == "rank" else "segments_fts.rowid DESC"
+
+        with metrics.span("index.search"), self._lock, self._connect() as db:
+            rows = db.execute(
+                "SELECT d.path, d.source, d.language, s.number, s.start_seconds, s.end_seconds, s.speaker, s.text, "
+                f"snippet(segments_fts, 0, '[', ']', '...', {SNIPPET_WORDS}) "
+                "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+                "JOIN documents d ON d.id = s.document "
+                f"WHERE segments_fts MATCH ? ORDER BY {ordering} LIMIT ?", (match, limit)).fetchall()
+
+        keys = ("file", "source", "language", "segment", "start", "end", "speaker", "text", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def remove(self, path):
+        """
+        Drop every transcript indexed under a file path.
+        """
+        with self._lock, self._connect() as db:
+            for (document,) in db.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchall():
+                self._delete_document(db, document)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of indexed transcripts and segments
+        """
+        with self._lock, self._connect() as db:
+            documents = db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            segments = db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"transcripts": documents, "segments": segments}
+
+    def optimize(self):
+        """
+        Merge the index b-trees into one, which speeds up queries after many small inserts.
+        """
+        with self._lock, self._connect() as db:
+            db.execute("INSERT INTO segments_fts (segments_fts) VALUES ('optimize')")
+
+    def clear(self):
+        """
+        Remove every indexed transcript.
+        """
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM segments")
+            db.execute("DELETE FROM documents")
+            db.execute("INSERT INTO segments_fts (segments_fts) VALUES ('delete-all')")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the index safe to share across threads and processes
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(SCHEMA)
+                self._initialized = True
+            # Commit on success, roll back on error
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _replace_document(self, db, path, source, language):
+        row = db.execute("SELECT id FROM documents WHERE path = ? AND source = ?", (path, source)).fetchone()
+        if row is not None:
+            self._delete_document(db, row[0])
+        return db.execute("INSERT INTO documents (path, source, language, created) VALUES (?, ?, ?, ?)",
+                          (path, source, language, time.time())).lastrowid
+
+    def _delete_document(self, db, document):
+        # Deleting row by row lets the trigger remove each segment from the FTS index
+        db.execute("DELETE FROM segments WHERE document = ?", (document,))
+        db.execute("DELETE FROM documents WHERE id = ?", (document,))
+
+# Index shared by every caller in this process
+transcript_index = TranscriptIndex()
+
+def format_hit(hit):
+    """
+    One-line description of a search hit, e.g. "logs/transcription_1.json #3 [00:01:02] SPEAKER_1: ...".
+    """
+    location = f"{hit['file']} #{hit['segment'] + 1}"
+    if hit["start"] is not None:
+        minutes, seconds = divmod(int(hit["start"]), 60)
+        hours, minutes = divmod(minutes, 60)
+        location += f" [{hours:02d}:{minutes:02d}:{seconds:02d}]"
+    speaker = f"{hit['speaker']}: " if hit["speaker"] else ""
+    return f"{location} {speaker}{hit['snippet']}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Search saved transcripts")
+    parser.add_argument("query", nargs="?", help='Words, "quoted phrases" and prefix* terms')
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="Maximum number of hits")
+    parser.add_argument("--rank", action="store_true", help="Best matches first instead of newest segments")
+    parser.add_argument("--json", action="store_true", help="Print hits as JSON lines")
+    parser.add_argument("--reindex", metavar="DIR", help="Index the transcripts saved in a directory first")
+    parser.add_argument("--stats", action="store_true", help="Print the number of indexed transcripts and segments")
+    args = parser.parse_args()
+
+    if args.reindex:
+        print(json.dumps(transcript_index.add_directory(args.reindex)))
+    if args.stats:
+        print(json.dumps(transcript_index.stats()))
+    if not args.query:
+        if not (args.reindex or args.stats):
+            parser.error("a query is required")
+        return
+
+    started = time.perf_counter()
+    hits = transcript_index.search(args.query, args.limit, "rank" if args.rank else "recent")
+    for hit in hits:
+        print(json.dumps(hit, ensure_ascii=False) if args.json else format_hit(hit))
+    if not args.json:
+        print(f"{len(hits)} hits in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import os
+import json
+import tempfile
+from metrics import metrics
+
+# Longest subtitle cue, in seconds and characters, when word timings allow splitting a segment
+SUBTITLE_MAX_SECONDS = 7.0
+SUBTITLE_MAX_CHARS = 84
+
+# Output formats written when auto-saving a transcription
+DEFAULT_FORMATS = ("txt",)
+
+def make_segment(start, end, words=None, text=None, speaker=None, language=None):
+    """
+    Build a transcript segment.
+
+    Args:
+        start (float): Start time in seconds
+        end (float): End time in seconds
+        words (list): Word dicts with "word", "start", "end" and "confidence" keys (default: None)
+        text (str): Segment text, joined from the words when omitted (default: None)
+        speaker (str): Speaker label from diarization, e.g. "SPEAKER_1" (default: None)
+        language (str): Identified locale when the language was detected per segment (default: None)
+
+    Returns:
+        dict: Segment with "start", "end", "text", "confidence" and "words" keys, and "speaker" and
+            "language" when given
+    """
+    words = words or []
+    confidences = [w["confidence"] for w in words if w.get("confidence") is not None]
+    segment = {
+        "start": round(start, 3),
+        "end": round(end, 3),
+        "text": text if text is not None else " ".join(w["word"] for w in words),
+        "confidence": round(sum(confidences) / len(confidences), 4) if confidences else None,
+        "words": words,
+    }
+    if speaker is not None:
+        segment["speaker"] = speaker
+    if language is not None:
+        segment["language"] = language
+    return segment
+
+def speaker_prefix(segment, template="{}: "):
+    """
+    Label put in front of a segment's text, empty when the segment has no speaker.
+    """
+    speaker = segment.get("speaker")
+    return template.format(speaker) if speaker else ""
+
+def format_timestamp(seconds, separator="."):
+    """
+    Format seconds as HH:MM:SS.mmm for subtitles.
+
+    Args:
+        seconds (float): Time in seconds
+        separator (str): Separator before the milliseconds, "," for SRT (default: ".")
+
+    Returns:
+        str: Formatted timestamp
+    """
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+def subtitle_cues(segment, max_seconds=SUBTITLE_MAX_SECONDS, max_chars=SUBTITLE_MAX_CHARS):
+    """
+    Split a segment into subtitle cues of readable length.
+
+    Segments without word timings become a single cue.
+
+    Args:
+        segment (dict): Transcript segment
+        max_seconds (float): Longest cue in seconds (default: SUBTITLE_MAX_SECONDS)
+        max_chars (int): Longest cue in characters (default: SUBTITLE_MAX_CHARS)
+
+    Yields:
+        tuple: (start, end, text)
+    """
+    words = segment.get("words") or []
+    if not words:
+        yield segment["start"], segment["end"], segment["text"]
+        return
+
+    cue = []
+    for word in words:
+        if cue:
+            length = sum(len(w["word"]) + 1 for w in cue) + len(word["word"])
+            if word["end"] - cue[0]["start"] > max_seconds or length > max_chars:
+                yield cue[0]["start"], cue[-1]["end"], " ".join(w["word"] for w in cue)
+                cue = []
+        cue.append(word)
+    yield cue[0]["start"], cue[-1]["end"], " ".join(w["word"] for w in cue)
+
+class TranscriptSink:
+    """
+    Base for writers that receive transcript segments as they are produced.
+
+    Every segment is written and flushed immediately, so the file is
+    usable while transcription is still running and the transcript is
+    never held in memory by the sink.
+    """
+    extension = None
+
+    def __init__(self, path, **metadata):
+        """
+        Args:
+            path (str): Output file path
+            **metadata: Transcript details such as source and language, used by formats that store them
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.metadata = metadata
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+        self.begin()
+
+    def begin(self):
+        pass
+
+    def format(self, segment):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+    def write(self, segment):
+        """
+        Append a segment to the output.
+
+        Args:
+            segment (dict): Transcript segment
+        """
+        self._file.write(self.format(segment))
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self.end()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TextSink(TranscriptSink):
+    """
+    Plain text, segments separated by spaces; each change of speaker starts a labelled line.
+    """
+    extension = "txt"
+
+    def __init__(self, path, **metadata):
+        self.speaker = None
+        super().__init__(path, **metadata)
+
+    def format(self, segment):
+        speaker = segment.get("speaker")
+        if speaker != self.speaker:
+            self.speaker = speaker
+            return ("\n" if self.count else "") + speaker_prefix(segment) + segment["text"]
+        return (" " if self.count else "") + segment["text"]
+
+class JSONSink(TranscriptSink):
+    """
+    JSON document with the metadata and a "segments" array.
+    """
+    extension = "json"
+
+    def begin(self):
+        header = json.dumps(self.metadata, ensure_ascii=False)
+        # Leave the object open so segments can be appended one at a time
+        self._file.write(header[:-1] + (", " if self.metadata else "") + '"segments": [')
+
+    def format(self, segment):
+        return ("," if self.count else "") + "\n  " + json.dumps(segment, ensure_ascii=False)
+
+    def end(self):
+        self._file.write("\n]}\n")
+
+class SRTSink(TranscriptSink):
+    """
+    SubRip subtitles.
+    """
+    extension = "srt"
+
+    def __init__(self, path, **metadata):
+        self.cue_number = 0
+        super().__init__(path, **metadata)
+
+    def format(self, segment):
+        lines = []
+        for start, end, text in subtitle_cues(segment):
+            self.cue_number += 1
+            lines.append(f"{self.cue_number}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n"
+                         f"{speaker_prefix(segment)}{text}\n\n")
+        return "".join(lines)
+
+class WebVTTSink(TranscriptSink):
+    """
+    WebVTT subtitles.
+    """
+    extension = "vtt"
+
+    def begin(self):
+        self._file.write("WEBVTT\n\n")
+
+    def format(self, segment):
+        # Speakers use WebVTT voice spans
+        voice = speaker_prefix(segment, "<v {}>")
+        return "".join(f"{format_timestamp(start)} --> {format_timestamp(end)}\n{voice}{text}\n\n"
+                       for start, end, text in subtitle_cues(segment))
+
+# Transcript output formats by name
+SINKS = {
+    TextSink.extension: TextSink,
+    JSONSink.extension: JSONSink,
+    SRTSink.extension: SRTSink,
+    WebVTTSink.extension: WebVTTSink,
+}
+
+def open_sinks(formats, base_path, **metadata):
+    """
+    Open one sink per output format.
+
+    Args:
+        formats (list): Format names, any of SINKS
+        base_path (str): Output path without extension
+        **metadata: Transcript details passed to every sink
+
+    Returns:
+        list: Open sinks, to be closed by the caller
+    """
+    unknown = [f for f in formats if f not in SINKS]
+    if unknown:
+        raise ValueError(f"Unknown transcript format: {', '.join(unknown)}")
+    sinks = []
+    try:
+        for name in formats:
+            sinks.append(SINKS[name](f"{base_path}.{name}", **metadata))
+    except Exception:
+        for sink in sinks:
+            sink.close()
+        raise
+    return sinks
+
+def write_transcript(segments, base_path, formats=DEFAULT_FORMATS, **metadata):
+    """
+    Stream segments into one file per output format.
+
+    Args:
+        segments (iterable): Transcript segments, consumed one at a time
+        base_path (str): Output path without extension
+        formats (list): Format names, any of SINKS (default: DEFAULT_FORMATS)
+        **metadata: Transcript details passed to every sink
+
+    Yields:
+        dict: Each segment after it has been written
+    """
+    sinks = open_sinks(formats, base_path, **metadata)
+    try:
+        for segment in segments:
+            with metrics.span("stt.write"):
+                for sink in sinks:
+                    sink.write(segment)
+            yield segment
+    finally:
+        for sink in sinks:
+            sink.close()
+
+def output_files(base_path, formats=DEFAULT_FORMATS):
+    """
+    Paths written by write_transcript() for a base path.
+
+    Returns:
+        dict: Output path by format
+    """
+    return {name: f"{base_path}.{name}" for name in formats}
+
+class SegmentSpool:
+    """
+    Transcript segments kept in an anonymous temporary file instead of in memory.
+
+    Segments are appended as JSON lines while they are recognized and read
+    back one at a time, as often as needed, so a long transcript can be
+    passed on without holding it. The file is deleted when closed.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile("w+b")
+        self._end = 0
+        self.count = 0
+
+    def append(self, segment):
+        """
+        Add a segment after the ones already spooled.
+
+        Args:
+            segment (dict): Transcript segment
+        """
+        self._file.seek(self._end)
+        self._file.write(json.dumps(segment, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._end = self._file.tell()
+        self.count += 1
+
+    def __iter__(self):
+        # Keep our own position, so appending or another iteration in between does not disturb it
+        position = 0
+        while position < self._end:
+            self._file.seek(position)
+            line = self._file.readline()
+            position = self._file.tell()
+            yield json.loads(line)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._file.close()
+
+class TranscriptionResult:
+    """
+    Structured transcription: segments with word timings and confidences.
+    """
+
+    def __init__(self, language, segments, files=None):
+        """
+        Args:
+            language (str): Language code used for recognition
+            segments (list or SegmentSpool): Transcript segments
+            files (dict): Saved output paths by format (default: None)
+        """
+        self.language = language
+        self.segments = segments
+        self.files = files or {}
+
+    @property
+    def text(self):
+        return " ".join(segment["text"] for segment in self.segments)
+
+    def to_dict(self):
+        return {"language": self.language, "text": self.text, "segments": list(self.segments), "files": self.files}
+
+    def __str__(self):
+        return self.text
@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+import unicodedata
+from file_cache import FileCache
+
+# Location and size limit of the synthesis cache, overridable from the environment
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+def normalize_text(text):
+    """
+    Normalize text so trivially different inputs share a cache entry.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        str: NFC-normalized text with runs of whitespace collapsed
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class TTSCache(FileCache):
+    """
+    Content-addressed on-disk cache of synthesized audio.
+
+    Entries are keyed by a hash of the normalized text, language and voice
+    parameters, and evicted least recently used first past the size limit.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            cache_dir (str): Directory holding cached audio and the index (default: TTS_CACHE_DIR)
+            max_bytes (int): Maximum total size of cached audio in bytes (default: TTS_CACHE_MAX_MB)
+        """
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(text, language, **voice):
+        """
+        Build the cache key for a synthesis request.
+
+        Args:
+            text (str): Text to synthesize
+            language (str): Language code
+            **voice: Voice parameters that change the rendered audio
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps([normalize_text(text), language, voice], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Cache shared by every caller in this process
+tts_cache = TTSCache()
+
+def cached_synthesis(text, language, output_file, synthesize, postprocess=None, **voice):
+    """
+    Return cached audio for a request, synthesizing and caching it on a miss.
+
+    The cache holds the audio as synthesized; postprocess is applied to a
+    copy, so changing post-processing settings never requires synthesis.
+
+    Args:
+        text (str): Text to synthesize
+        language (str): Language code
+        output_file (str): Path to save the audio file
+        synthesize (callable): Called with output_file to render the audio on a miss
+        postprocess (callable): Called with (source, destination) to transform the audio (default: None)
+        **voice: Voice parameters that change the rendered audio
+
+    Returns:
+        bool: True if the audio came from the cache
+    """
+    key = tts_cache.key(text, language, **voice)
+    if tts_cache.fetch(key, output_file, postprocess):
+        return True
+
+    # The output may be a hard link into the cache; unlink it so synthesis cannot overwrite a cached entry
+    if os.path.lexists(output_file):
+        os.remove(output_file)
+    synthesize(output_file)
+    tts_cache.store(key, output_file)
+    if postprocess:
+        postprocess(output_file, output_file)
+    return False
@@ -0,0 +1,321 @@
+import io
+import os
+import re
+import wave
+import threading
+import numpy as np
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+from formant_synth import FormantBackend
+
+# Number of sentences synthesized concurrently
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+
+# Backend used when none is given, "gtts" needs network access, "formant" is fully local
+DEFAULT_TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+
+# Sentences shorter than this are merged with the next one to avoid tiny requests
+MIN_SENTENCE_CHARS = 40
+
+# Sentence boundaries: terminal punctuation followed by whitespace, or CJK terminal punctuation
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|(?<=[。！？；])")
+
+# Longest first piece of a streamed text, so playback starts after a short synthesis
+STREAM_LEAD_CHARS = 60
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Split text into sentences for independent synthesis.
+
+    Args:
+        text (str): Text to split
+        min_chars (int): Sentences shorter than this are merged with the next (default: MIN_SENTENCE_CHARS)
+
+    Returns:
+        list: Non-empty sentences in order
+    """
+    sentences = []
+    current = ""
+    for part in SENTENCE_BOUNDARY.split(text):
+        part = " ".join(part.split())
+        if not part:
+            continue
+        current = f"{current} {part}" if current else part
+        if len(current) >= min_chars:
+            sentences.append(current)
+            current = ""
+    if current:
+        sentences.append(current)
+    return sentences
+
+def split_lead(sentences, max_chars=STREAM_LEAD_CHARS):
+    """
+    Split a short lead off the first sentence, at a comma or else a space.
+
+    Args:
+        sentences (list): Sentences from split_sentences()
+        max_chars (int): Longest lead in characters (default: STREAM_LEAD_CHARS)
+
+    Returns:
+        list: Sentences whose first item is at most max_chars long where it could be split
+    """
+    if not sentences or len(sentences[0]) <= max_chars:
+        return sentences
+    first = sentences[0]
+    cut = first.rfind(",", 0, max_chars) + 1 or first.rfind(" ", 0, max_chars)
+    if cut <= 0:
+        return sentences
+    return [first[:cut].strip(), first[cut:].strip()] + sentences[1:]
+
+# A synthesis backend is any class with these attributes:
+#   name          registry name of the backend
+#   audio_format  "pcm" for raw little-endian mono samples, "mp3" for encoded audio
+#   sample_rate   sample rate in Hz (PCM backends only)
+#   sample_width  bytes per sample (PCM backends only)
+#   synthesize(text, language) -> bytes of audio for one sentence
+
+class GTTSBackend:
+    """
+    Google Text-to-Speech backend producing MP3 segments.
+    """
+    name = "gtts"
+    audio_format = "mp3"
+    sample_rate = None
+    sample_width = None
+
+    def synthesize(self, text, language):
+        """
+        Synthesize one sentence.
+
+        Args:
+            text (str): Sentence to synthesize
+            language (str): Language code, e.g. "en"
+
+        Returns:
+            bytes: MP3 data
+        """
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class StubBackend:
+    """
+    Offline stand-in backend producing 16-bit mono PCM.
+
+    Each word becomes a short tone followed by a pause, so the output length
+    tracks the text and the pipeline can be exercised without a network.
+    """
+    name = "stub"
+    audio_format = "pcm"
+    sample_rate = 16000
+    sample_width = 2
+
+    def __init__(self, word_seconds=0.25, pause_seconds=0.05, frequency=220.0):
+        self.word_seconds = word_seconds
+        self.pause_seconds = pause_seconds
+        self.frequency = frequency
+
+    def synthesize(self, text, language):
+        """
+        Synthesize one sentence.
+
+        Args:
+            text (str): Sentence to synthesize
+            language (str): Ignored
+
+        Returns:
+            bytes: 16-bit little-endian mono PCM
+        """
+        t = np.arange(int(self.word_seconds * self.sample_rate)) / self.sample_rate
+        tone = (8000 * np.sin(2 * np.pi * self.frequency * t)).astype("<i2").tobytes()
+        pause = bytes(2 * int(self.pause_seconds * self.sample_rate))
+        return (tone + pause) * len(text.split())
+
+# Available synthesis backends by name
+TTS_BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    StubBackend.name: StubBackend,
+    FormantBackend.name: FormantBackend,
+}
+
+# Backend instances shared by every caller in this process
+_tts_backends = {}
+_tts_backends_lock = threading.Lock()
+
+def register_tts_backend(backend_class):
+    """
+    Make a synthesis backend class selectable by its name.
+
+    Args:
+        backend_class (type): Class implementing the backend protocol
+    """
+    TTS_BACKENDS[backend_class.name] = backend_class
+
+def create_tts_backend(name=None):
+    """
+    Return the shared synthesis backend for a name, creating it on first use.
+
+    Args:
+        name (str): Backend name, one of TTS_BACKENDS (default: DEFAULT_TTS_BACKEND)
+
+    Returns:
+        object: Backend instance exposing synthesize(text, language)
+    """
+    name = name or DEFAULT_TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown synthesis backend: {name}")
+    with _tts_backends_lock:
+        if name not in _tts_backends:
+            _tts_backends[name] = TTS_BACKENDS[name]()
+        return _tts_backends[name]
+
+def output_extension(backend=None):
+    """
+    File extension matching the audio a backend produces.
+
+    Args:
+        backend (str or object): Backend name or instance (default: DEFAULT_TTS_BACKEND)
+
+    Returns:
+        str: ".wav" for PCM backends, ".mp3" otherwise
+    """
+    if backend is None or isinstance(backend, str):
+        backend = TTS_BACKENDS.get(backend or DEFAULT_TTS_BACKEND, GTTSBackend)
+    return ".wav" if backend.audio_format == "pcm" else ".mp3"
+
+def iter_synthesized_segments(sentences, language, backend, workers=TTS_WORKERS):
+    """
+    Synthesize sentences concurrently and yield the audio in sentence order.
+
+    At most 2 * workers sentences are in flight, so memory stays bounded on
+    long texts, and the first segment is yielded as soon as it is ready.
+
+    Args:
+        sentences (list): Sentences to synthesize
+        language (str): Language code
+        backend (object): Backend exposing synthesize(text, language)
+        workers (int): Number of synthesis threads (default: TTS_WORKERS)
+
+    Yields:
+        bytes: Audio of each sentence in the backend's format
+    """
+    def synthesize(sentence):
+        with metrics.span("tts.synthesis"):
+            return backend.synthesize(sentence, language)
+
+    remaining = iter(sentences)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(synthesize, sentence) for sentence in islice(remaining, 2 * workers))
+        try:
+            while pending:
+                data = pending.popleft().result()
+                for sentence in islice(remaining, 1):
+                    pending.append(executor.submit(synthesize, sentence))
+                yield data
+        finally:
+            # Abandon queued work if the consumer stops early or a sentence fails
+            for future in pending:
+                future.cancel()
+
+def stream_synthesis(text, language="en", backend=None, workers=TTS_WORKERS, speed=1.0, volume=1.0,
+                     cancel_token=None):
+    """
+    Synthesize text and yield the audio as each piece is ready.
+
+    The first sentence is cut down to a short lead, so the first chunk
+    arrives after synthesizing a few words however long the text is.
+    Speed and volume are applied to each piece as it is produced, after
+    decoding it when the backend produces MP3.
+
+    Args:
+        text (str): Text to synthesize
+        language (str): Language code, e.g. "en" (default: "en")
+        backend (str or object): Backend name or instance (default: DEFAULT_TTS_BACKEND)
+        workers (int): Number of synthesis threads (default: TTS_WORKERS)
+        speed (float): Speed factor (default: 1.0)
+        volume (float): Linear gain (default: 1.0)
+        cancel_token (object): Token whose raise_if_cancelled() is checked between pieces (default: None)
+
+    Yields:
+        bytes: Audio in the backend's format; 16-bit PCM when speed or volume are applied, at
+            audio_dsp.DECODE_RATE for MP3 backends
+    """
+    from audio_dsp import DECODE_RATE, decode_mp3, process_pcm
+
+    if backend is None or isinstance(backend, str):
+        backend = create_tts_backend(backend)
+    postprocess = speed != 1.0 or volume != 1.0
+    decode = postprocess and backend.audio_format != "pcm"
+
+    sentences = split_lead(split_sentences(text))
+    if not sentences:
+        raise ValueError("No text to synthesize")
+
+    for data in iter_synthesized_segments(sentences, language, backend, workers):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        if decode:
+            with metrics.span("tts.postprocess"):
+                data = process_pcm(decode_mp3(data), DECODE_RATE, 2, speed, volume)
+        elif postprocess:
+            with metrics.span("tts.postprocess"):
+                data = process_pcm(data, backend.sample_rate, backend.sample_width, speed, volume)
+        yield data
+
+def synthesize_to_file(text, output_file, language="en", backend=None, workers=TTS_WORKERS, progress=None,
+                       cancel_token=None):
+    """
+    Synthesize text sentence by sentence and write the segments in order.
+
+    Segments are appended as soon as they arrive, so the beginning of the
+    file is playable while later sentences are still being synthesized.
+
+    Args:
+        text (str): Text to synthesize
+        output_file (str): Path to save the audio file
+        language (str): Language code, e.g. "en" (default: "en")
+        backend (str or object): Backend name or instance (default: DEFAULT_TTS_BACKEND)
+        workers (int): Number of synthesis threads (default: TTS_WORKERS)
+        progress (callable): Called with (done, total) after each segment (default: None)
+        cancel_token (object): Token whose raise_if_cancelled() is checked between segments (default: None)
+
+    Returns:
+        str: Path to the created audio file
+    """
+    if backend is None or isinstance(backend, str):
+        backend = create_tts_backend(backend)
+
+    sentences = split_sentences(text)
+    if not sentences:
+        raise ValueError("No text to synthesize")
+
+    segments = iter_synthesized_segments(sentences, language, backend, workers)
+    if backend.audio_format == "pcm":
+        with wave.open(output_file, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(backend.sample_width)
+            writer.setframerate(backend.sample_rate)
+            for done, data in enumerate(segments, 1):
+                with metrics.span("tts.write"):
+                    writer.writeframes(data)
+                if progress:
+                    progress(done, len(sentences))
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+    else:
+        # MP3 streams can be joined frame-wise by simple concatenation
+        with open(output_file, "wb") as f:
+            for done, data in enumerate(segments, 1):
+                with metrics.span("tts.write"):
+                    f.write(data)
+                    f.flush()
+                if progress:
+                    progress(done, len(sentences))
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+
+    return output_file
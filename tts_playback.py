@@ -0,0 +1,262 @@
+import os
+import wave
+import time
+import queue
+import threading
+from metrics import metrics
+from audio_dsp import DECODE_RATE, decode_mp3
+from job_queue import CancellationToken, JobCancelled
+from tts_engine import stream_synthesis, create_tts_backend, TTS_WORKERS
+
+# Chunks buffered between synthesis and playback; synthesis waits when the queue is full
+PLAYBACK_QUEUE_CHUNKS = int(os.getenv("PLAYBACK_QUEUE_CHUNKS", "32"))
+
+# Audio handed to the sink per write, in milliseconds, so stopping takes effect quickly
+PLAYBACK_BLOCK_MS = 100
+
+# A playback sink is any class with these methods:
+#   open(sample_rate, sample_width)  prepare for 16-bit or wider mono PCM
+#   write(data)                      play or store PCM, may block to pace playback
+#   close()                          finish playback
+
+class DeviceSink:
+    """
+    Playback on the default output device through PyAudio.
+
+    Writes block until the device has room, which paces the whole
+    pipeline at playback speed.
+    """
+
+    def __init__(self, device_index=None):
+        self.device_index = device_index
+        self._audio = None
+        self._stream = None
+
+    def open(self, sample_rate, sample_width):
+        import pyaudio
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=self._audio.get_format_from_width(sample_width), channels=1,
+                                        rate=sample_rate, output=True, output_device_index=self.device_index)
+
+    def write(self, data):
+        self._stream.write(data)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+class WavSink:
+    """
+    Null playback sink that writes what would be played to a WAV file.
+
+    Used for tests and headless machines. With realtime set, writes are
+    paced like a sound card so the queueing behaves as it would on a device.
+    """
+
+    def __init__(self, path=None, realtime=False):
+        """
+        Args:
+            path (str): WAV file to write, None to discard the audio (default: None)
+            realtime (bool): Pace writes at playback speed (default: False)
+        """
+        self.path = path
+        self.realtime = realtime
+        self.frames = 0
+        self._writer = None
+
+    def open(self, sample_rate, sample_width):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frames = 0
+        self._started = time.perf_counter()
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = wave.open(self.path, "wb")
+            self._writer.setnchannels(1)
+            self._writer.setsampwidth(sample_width)
+            self._writer.setframerate(sample_rate)
+
+    def write(self, data):
+        if self._writer is not None:
+            self._writer.writeframes(data)
+        self.frames += len(data) // self.sample_width
+        if self.realtime:
+            delay = self._started + self.frames / self.sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.frames else 0.0
+
+# Marks the end of the chunk stream in the playback queue
+_END = object()
+
+class SpeechPlayer:
+    """
+    Speaks text while it is still being synthesized.
+
+    A producer thread streams synthesized chunks into a bounded queue and
+    a playback thread drains it into the sink, so speech starts with the
+    first short piece of text and synthesis never runs more than the
+    queue's worth of audio ahead of playback.
+    """
+
+    def __init__(self, sink=None, queue_chunks=PLAYBACK_QUEUE_CHUNKS, synthesize=stream_synthesis):
+        """
+        Args:
+            sink (object): Playback sink, see DeviceSink and WavSink (default: None, a DeviceSink)
+            queue_chunks (int): Chunks buffered between synthesis and playback (default: PLAYBACK_QUEUE_CHUNKS)
+            synthesize (callable): Chunk generator with the signature of tts_engine.stream_synthesis(), e.g.
+                AudioProcessPool.stream_synthesis to synthesize in a worker process (default: stream_synthesis)
+        """
+        self.sink = sink if sink is not None else DeviceSink()
+        self.queue_chunks = queue_chunks
+        self.synthesize = synthesize
+        self.first_audio = None
+        self.error = None
+        self._token = None
+        self._threads = []
+        self._done = threading.Event()
+        self._done.set()
+
+    @property
+    def playing(self):
+        return not self._done.is_set()
+
+    def play(self, text, language="en-US", backend=None, rate=150, volume=1.0, workers=TTS_WORKERS,
+             on_finished=None):
+        """
+        Start speaking text and return immediately.
+
+        Args:
+            text (str): Text to speak
+            language (str): Language code, e.g. "en-US" (default: "en-US")
+            backend (str): Synthesis backend (default: TTS_BACKEND setting)
+            rate (int): Speech rate in words per minute (default: 150)
+            volume (float): Volume between 0.0 and 1.0 (default: 1.0)
+            workers (int): Number of synthesis threads (default: TTS_WORKERS)
+            on_finished (callable): Called from the playback thread with the error, or None, when
+                playback ends or is stopped (default: None)
+        """
+        from audio_dsp import rate_to_speed
+
+        if self.playing:
+            raise RuntimeError("Already playing")
+        engine = create_tts_backend(backend)
+        speed = rate_to_speed(rate)
+
+        self.first_audio = None
+        self.error = None
+        self._token = CancellationToken()
+        self._done.clear()
+        chunks = queue.Queue(maxsize=self.queue_chunks)
+
+        # Encoded chunks are decoded to 16-bit PCM, and speed or volume processing outputs 16-bit PCM;
+        # with speed or volume the stream decodes encoded chunks itself
+        postprocess = speed != 1.0 or volume != 1.0
+        if engine.audio_format != "pcm":
+            audio_format = (DECODE_RATE, 2)
+        elif postprocess:
+            audio_format = (engine.sample_rate, 2)
+        else:
+            audio_format = (engine.sample_rate, engine.sample_width)
+        decode = engine.audio_format != "pcm" and not postprocess
+        stream = self.synthesize(text, language.split("-")[0], engine, workers, speed, volume, self._token)
+
+        self._threads = [
+            threading.Thread(target=self._produce, args=(chunks, stream, audio_format, decode), daemon=True),
+            threading.Thread(target=self._consume, args=(chunks, time.perf_counter(), on_finished), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop synthesis and playback at the next chunk boundary.
+        """
+        if self._token is not None:
+            self._token.cancel()
+
+    def wait(self, timeout=None):
+        """
+        Wait for playback to end.
+
+        Returns:
+            bool: True if playback ended within the timeout
+        """
+        return self._done.wait(timeout)
+
+    def _put(self, chunks, item):
+        # Wait for room in the queue, giving up once playback is stopped
+        while not self._token.cancelled:
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, chunks, stream, audio_format, decode):
+        try:
+            # The first item tells the playback thread how to open the sink
+            sample_rate, sample_width = audio_format
+            block_bytes = int(sample_rate * PLAYBACK_BLOCK_MS / 1000) * sample_width
+            if not self._put(chunks, audio_format):
+                return
+
+            for data in stream:
+                if decode:
+                    data = decode_mp3(data)
+                for start in range(0, len(data), block_bytes):
+                    if not self._put(chunks, data[start:start + block_bytes]):
+                        return
+        except JobCancelled:
+            return
+        except Exception as e:
+            self.error = e
+        finally:
+            # Abandons the sentences still being synthesized when playback was stopped
+            stream.close()
+        self._put(chunks, _END)
+
+    def _consume(self, chunks, started, on_finished):
+        opened = False
+        try:
+            while not self._token.cancelled:
+                try:
+                    item = chunks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    break
+                if not opened:
+                    self.sink.open(*item)
+                    opened = True
+                    continue
+                self.sink.write(item)
+                if self.first_audio is None:
+                    self.first_audio = time.perf_counter() - started
+                    metrics.observe("tts.first_audio", self.first_audio)
+        except Exception as e:
+            self.error = self.error or e
+            self._token.cancel()
+        finally:
+            if opened:
+                self.sink.close()
+            self._done.set()
+            if on_finished:
+                on_finished(self.error)
@@ -0,0 +1,311 @@
+import numpy as np
+
+# Analysis frame length in milliseconds
+FRAME_MS = 30
+
+# Speech must be this far above the estimated noise floor, in dB
+ENERGY_MARGIN_DB = 12.0
+
+# Frames quieter than this are never speech, in dBFS
+MIN_ENERGY_DB = -50.0
+
+# Zero-crossing rate above which quiet frames count as unvoiced speech (fricatives)
+ZCR_THRESHOLD = 0.25
+
+# Percentile of frame energies used as the noise floor estimate of a block
+NOISE_FLOOR_PERCENTILE = 10
+
+# How fast the noise floor may rise, in dB per second of audio
+NOISE_FLOOR_RISE_DB_PER_SECOND = 0.5
+
+# Options that configure the VoiceActivityDetector rather than the SpeechSegmenter
+DETECTOR_OPTIONS = ("frame_ms", "energy_margin_db", "min_energy_db", "zcr_threshold")
+
+def pcm_to_float(frame_data, sample_width):
+    """
+    Convert little-endian PCM bytes to float samples in [-1.0, 1.0].
+
+    Args:
+        frame_data (bytes): Raw mono PCM data
+        sample_width (int): Bytes per sample (1, 2, 3 or 4)
+
+    Returns:
+        np.ndarray: float32 samples
+    """
+    if sample_width == 3:
+        # Widen 24-bit samples to 32-bit by placing them in the upper three bytes
+        raw = np.frombuffer(frame_data, dtype=np.uint8)
+        raw = raw[:len(raw) // 3 * 3].reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view("<i4").ravel()
+        sample_width = 4
+    else:
+        dtypes = {1: np.int8, 2: "<i2", 4: "<i4"}
+        if sample_width not in dtypes:
+            raise ValueError(f"Unsupported sample width: {sample_width}")
+        samples = np.frombuffer(frame_data, dtype=dtypes[sample_width],
+                                count=len(frame_data) // sample_width)
+    return samples.astype(np.float32) / float(1 << (8 * sample_width - 1))
+
+def frame_features(samples, frame_length):
+    """
+    Compute per-frame energy and zero-crossing rate.
+
+    Trailing samples that do not fill a whole frame are ignored.
+
+    Args:
+        samples (np.ndarray): float samples in [-1.0, 1.0]
+        frame_length (int): Samples per frame
+
+    Returns:
+        tuple: (energy in dBFS, zero-crossing rate) arrays, one value per frame
+    """
+    frame_count = len(samples) // frame_length
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+
+    energy_db = 10.0 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(frame_length - 1, 1)
+    return energy_db, zcr
+
+def speech_runs(mask, offset=0):
+    """
+    Find contiguous runs of speech frames.
+
+    Args:
+        mask (np.ndarray): Boolean speech flag per frame
+        offset (int): Index added to every returned frame position (default: 0)
+
+    Returns:
+        np.ndarray: (N, 2) array of [start, end) frame indices
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.column_stack((starts, ends)) + offset
+
+class VoiceActivityDetector:
+    """
+    Energy and zero-crossing based voice activity detector.
+
+    The noise floor is tracked across calls, so audio can be fed block by
+    block as long as every block is a whole number of frames.
+    """
+
+    def __init__(self, sample_rate, frame_ms=FRAME_MS, energy_margin_db=ENERGY_MARGIN_DB,
+                 min_energy_db=MIN_ENERGY_DB, zcr_threshold=ZCR_THRESHOLD):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio in Hz
+            frame_ms (int): Analysis frame length in milliseconds (default: FRAME_MS)
+            energy_margin_db (float): Required margin above the noise floor (default: ENERGY_MARGIN_DB)
+            min_energy_db (float): Absolute energy floor for speech (default: MIN_ENERGY_DB)
+            zcr_threshold (float): Zero-crossing rate for unvoiced speech (default: ZCR_THRESHOLD)
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.zcr_threshold = zcr_threshold
+        self.noise_floor = None
+
+    @property
+    def frame_seconds(self):
+        return self.frame_length / self.sample_rate
+
+    def is_speech(self, samples):
+        """
+        Classify each frame of a block of samples.
+
+        Args:
+            samples (np.ndarray): float samples in [-1.0, 1.0]
+
+        Returns:
+            np.ndarray: Boolean speech flag per frame
+        """
+        energy_db, zcr = frame_features(samples, self.frame_length)
+        if not len(energy_db):
+            return np.zeros(0, dtype=bool)
+
+        # Follow drops in the noise floor immediately but rises only slowly,
+        # so a block full of speech does not become the new floor
+        block_floor = float(np.percentile(energy_db, NOISE_FLOOR_PERCENTILE))
+        if self.noise_floor is None:
+            self.noise_floor = block_floor
+        else:
+            rise = NOISE_FLOOR_RISE_DB_PER_SECOND * len(energy_db) * self.frame_seconds
+            self.noise_floor = min(block_floor, self.noise_floor + rise)
+
+        threshold = max(self.noise_floor + self.energy_margin_db, self.min_energy_db)
+        voiced = energy_db > threshold
+        unvoiced = (energy_db > threshold - self.energy_margin_db / 2) & (zcr > self.zcr_threshold)
+        return voiced | unvoiced
+
+class SpeechSegmenter:
+    """
+    Turn per-frame speech flags into padded speech segments.
+
+    Short pauses are bridged, very short bursts are dropped, and segments
+    longer than max_segment are split so they fit a recognizer window.
+    """
+
+    def __init__(self, frame_seconds, min_silence=0.3, min_speech=0.25, padding=0.2, max_segment=30.0):
+        """
+        Args:
+            frame_seconds (float): Duration of one frame in seconds
+            min_silence (float): Pauses shorter than this are bridged, in seconds (default: 0.3)
+            min_speech (float): Segments shorter than this are dropped, in seconds (default: 0.25)
+            padding (float): Audio kept on each side of a segment, in seconds (default: 0.2)
+            max_segment (float): Longest segment before it is split, in seconds (default: 30.0)
+        """
+        self.pad_frames = int(round(padding / frame_seconds))
+        # The gap must cover the padding so a closed segment's trailing audio has been read
+        self.gap_frames = max(int(round(min_silence / frame_seconds)), self.pad_frames)
+        self.min_frames = max(1, int(round(min_speech / frame_seconds)))
+        self.max_frames = max(self.min_frames, int(max_segment / frame_seconds))
+        self.frames_seen = 0
+        self._open = None
+
+    def push(self, mask):
+        """
+        Feed the speech flags of the next block of frames.
+
+        Args:
+            mask (np.ndarray): Boolean speech flag per frame
+
+        Returns:
+            list: Finished (start, end) segments in frame indices, padding included
+        """
+        finished = []
+        offset = self.frames_seen
+        self.frames_seen += len(mask)
+
+        for start, end in speech_runs(mask, offset).tolist():
+            if self._open is not None and start - self._open[1] <= self.gap_frames:
+                self._open[1] = end
+            else:
+                self._close(finished)
+                self._open = [start, end]
+
+            while self._open[1] - self._open[0] > self.max_frames:
+                split = self._open[0] + self.max_frames
+                finished.append(self._padded(self._open[0], split))
+                self._open[0] = split
+
+        if self._open is not None and self.frames_seen - self._open[1] >= self.gap_frames:
+            self._close(finished)
+        return finished
+
+    def flush(self):
+        """
+        Close any segment still open at the end of the audio.
+
+        Returns:
+            list: Finished (start, end) segments in frame indices
+        """
+        finished = []
+        self._close(finished)
+        return finished
+
+    def retain_from(self):
+        """
+        Returns:
+            int: Earliest frame index whose audio may still be part of a segment
+        """
+        start = self._open[0] if self._open is not None else self.frames_seen
+        return max(0, start - self.pad_frames)
+
+    def _padded(self, start, end):
+        return max(0, start - self.pad_frames), min(end + self.pad_frames, self.frames_seen)
+
+    def _close(self, finished):
+        if self._open is not None and self._open[1] - self._open[0] >= self.min_frames:
+            finished.append(self._padded(*self._open))
+        self._open = None
+
+def create_vad(sample_rate, max_segment=30.0, **vad_options):
+    """
+    Create a detector and segmenter pair from combined options.
+
+    Args:
+        sample_rate (int): Sample rate of the audio in Hz
+        max_segment (float): Longest segment before it is split, in seconds (default: 30.0)
+        **vad_options: Options for VoiceActivityDetector and SpeechSegmenter
+
+    Returns:
+        tuple: (VoiceActivityDetector, SpeechSegmenter)
+    """
+    detector_options = {k: v for k, v in vad_options.items() if k in DETECTOR_OPTIONS}
+    segmenter_options = {k: v for k, v in vad_options.items() if k not in DETECTOR_OPTIONS}
+    detector = VoiceActivityDetector(sample_rate, **detector_options)
+    segmenter = SpeechSegmenter(detector.frame_seconds, max_segment=max_segment, **segmenter_options)
+    return detector, segmenter
+
+class SpeechStream:
+    """
+    Push-based speech segmentation of raw PCM.
+
+    Audio can be pushed in chunks of any size; finished speech segments are
+    returned as soon as they are complete. Only audio that may still belong
+    to a segment is kept, so memory is bounded by max_segment.
+    """
+
+    def __init__(self, sample_rate, sample_width, max_segment=30.0, **vad_options):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio in Hz
+            sample_width (int): Bytes per sample
+            max_segment (float): Longest segment before it is split, in seconds (default: 30.0)
+            **vad_options: Options for VoiceActivityDetector and SpeechSegmenter
+        """
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.detector, self.segmenter = create_vad(sample_rate, max_segment, **vad_options)
+        self._frame_bytes = self.detector.frame_length * sample_width
+        self._pending = b""
+        self._buffer = bytearray()
+        self._buffer_start = 0
+
+    def push(self, data):
+        """
+        Feed the next chunk of audio.
+
+        Args:
+            data (bytes): Raw mono PCM data
+
+        Returns:
+            list: Finished (start time in seconds, PCM bytes) speech segments
+        """
+        # Classify whole frames only, carrying a partial frame to the next call
+        data = self._pending + data
+        usable = len(data) // self._frame_bytes * self._frame_bytes
+        self._pending = data[usable:]
+        data = data[:usable]
+
+        self._buffer += data
+        mask = self.detector.is_speech(pcm_to_float(data, self.sample_width))
+        return self._extract(self.segmenter.push(mask))
+
+    def flush(self):
+        """
+        Finish the stream and return any segment still in progress.
+
+        Returns:
+            list: Finished (start time in seconds, PCM bytes) speech segments
+        """
+        return self._extract(self.segmenter.flush())
+
+    def _extract(self, segments):
+        frame_length = self.detector.frame_length
+        results = []
+        for start, end in segments:
+            first = (start * frame_length - self._buffer_start) * self.sample_width
+            last = (end * frame_length - self._buffer_start) * self.sample_width
+            results.append((start * frame_length / self.sample_rate, bytes(self._buffer[first:last])))
+
+        # Discard audio that can no longer belong to a segment
+        keep_from = self.segmenter.retain_from() * frame_length
+        del self._buffer[:(keep_from - self._buffer_start) * self.sample_width]
+        self._buffer_start = keep_from
+        return results
@@ -0,0 +1,228 @@
+import struct
+import numpy as np
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Sample dtypes by (format tag, bits per sample)
+SAMPLE_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+}
+
+class WavFormatError(ValueError):
+    """
+    Raised when a file is not a WAV file that can be memory-mapped.
+    """
+
+def parse_wav_header(path):
+    """
+    Parse the RIFF chunks of a WAV file up to its data chunk.
+
+    Args:
+        path (str): Path to the WAV file
+
+    Returns:
+        dict: format_tag, channels, sample_rate, block_align, bits, data_offset and data_size
+    """
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise WavFormatError(f"Not a RIFF WAVE file: {path}")
+        file_size = f.seek(0, 2)
+        f.seek(12)
+
+        header = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise WavFormatError(f"No data chunk in {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                if len(fmt) < 16:
+                    raise WavFormatError(f"Truncated fmt chunk in {path}")
+                format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE:
+                    if len(fmt) < 26:
+                        raise WavFormatError(f"Truncated extensible fmt chunk in {path}")
+                    format_tag = struct.unpack("<H", fmt[24:26])[0]
+                header = {"format_tag": format_tag, "channels": channels, "sample_rate": sample_rate,
+                          "block_align": block_align, "bits": bits}
+                if chunk_size & 1:
+                    f.seek(1, 1)
+            elif chunk_id == b"data":
+                if header is None:
+                    raise WavFormatError(f"Data chunk before fmt chunk in {path}")
+                # Streaming writers may leave the size unset; trust the file length then
+                header["data_offset"] = f.tell()
+                header["data_size"] = min(chunk_size, file_size - f.tell())
+                return header
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+class MappedWav:
+    """
+    WAV file whose samples are memory-mapped instead of read into memory.
+
+    The PCM payload is exposed as a read-only numpy.memmap of shape
+    (frames, channels). Slices of it are views backed by the page cache, so
+    files larger than RAM can be processed and nothing is copied until a
+    stage actually needs its own buffer.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to a PCM or IEEE float WAV file
+        """
+        header = parse_wav_header(path)
+        key = (header["format_tag"], header["bits"])
+        if key not in SAMPLE_DTYPES:
+            raise WavFormatError(f"Unsupported WAV encoding (format {key[0]}, {key[1]} bits): {path}")
+
+        self.path = path
+        self.dtype = SAMPLE_DTYPES[key]
+        self.channels = header["channels"]
+        self.sample_rate = header["sample_rate"]
+        self.sample_width = self.dtype.itemsize
+        self.frames = header["data_size"] // (self.sample_width * self.channels)
+
+        if self.frames:
+            self.samples = np.memmap(path, dtype=self.dtype, mode="r", offset=header["data_offset"],
+                                     shape=(self.frames, self.channels))
+        else:
+            self.samples = np.zeros((0, self.channels), dtype=self.dtype)
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    def view(self, start=0, stop=None):
+        """
+        Zero-copy view of a range of frames.
+
+        Args:
+            start (int): First frame (default: 0)
+            stop (int): Frame after the last one (default: None, end of file)
+
+        Returns:
+            np.ndarray: (frames, channels) view into the mapped file
+        """
+        return self.samples[start:stop]
+
+    def mono(self, start=0, stop=None):
+        """
+        Mono samples for a range of frames.
+
+        Mono files return a zero-copy view; multichannel files are averaged,
+        which necessarily allocates.
+
+        Returns:
+            np.ndarray: 1-D array of samples in the file's dtype
+        """
+        return downmix(self.samples[start:stop])
+
+    def iter_blocks(self, block_frames, overlap_frames=0):
+        """
+        Iterate over the file in fixed-size, optionally overlapping blocks.
+
+        Args:
+            block_frames (int): Frames per block
+            overlap_frames (int): Frames shared by consecutive blocks (default: 0)
+
+        Yields:
+            tuple: (start frame, (frames, channels) view)
+        """
+        step = block_frames - overlap_frames
+        if block_frames <= 0 or step <= 0:
+            raise ValueError("Overlap must be non-negative and shorter than the block")
+        start = 0
+        while start < self.frames:
+            yield start, self.samples[start:start + block_frames]
+            if start + block_frames >= self.frames:
+                break
+            start += step
+
+    def pcm16(self, start=0, stop=None):
+        """
+        16-bit little-endian mono PCM for a range of frames, for recognizers that need bytes.
+
+        Returns:
+            bytes: Raw PCM data
+        """
+        return to_pcm16(self.mono(start, stop))
+
+    def close(self):
+        """
+        Drop this reader's reference to the mapping.
+
+        The file is unmapped once no views into it remain, so views handed
+        out earlier stay valid.
+        """
+        self.samples = np.zeros((0, self.channels), dtype=self.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def downmix(frames):
+    """
+    Mono samples from a (frames, channels) block.
+
+    Mono blocks return a zero-copy view; multichannel blocks are averaged
+    into a new array of the same dtype.
+    """
+    if frames.shape[1] == 1:
+        return frames[:, 0]
+    mixed = frames.mean(axis=1)
+    if frames.dtype.kind in "iu":
+        mixed = np.round(mixed)
+    return mixed.astype(frames.dtype)
+
+def to_float(samples):
+    """
+    Convert samples of any WAV dtype to float32 in [-1.0, 1.0].
+
+    Args:
+        samples (np.ndarray): Samples as stored in the file, or already float
+
+    Returns:
+        np.ndarray: float32 samples
+    """
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    if samples.dtype.kind == "i":
+        return samples.astype(np.float32) / float(1 << (8 * samples.dtype.itemsize - 1))
+    return samples.astype(np.float32, copy=False)
+
+def to_pcm16(samples):
+    """
+    Convert samples of any WAV dtype to 16-bit little-endian PCM bytes.
+    """
+    if samples.dtype == np.dtype("<i2"):
+        return samples.tobytes()
+    return (np.clip(to_float(samples), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def open_wav(path):
+    """
+    Memory-map a WAV file, or return None if it cannot be mapped.
+
+    Args:
+        path (str): Path to the audio file
+
+    Returns:
+        MappedWav: Mapped file, or None for other formats such as AIFF, FLAC or 24-bit WAV
+    """
+    try:
+        return MappedWav(path)
+    except (WavFormatError, OSError):
+        return None